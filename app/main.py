@@ -2,8 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from .db import engine
-from .models import Base
-from .services.http import http_client
+from .models import Base, upgrade_schema
+from .services.http import http_client, httpx_clients
+from .services import blob_aio
 from .routers import health, upload, jobs
 from .routers import oauth
 from app.routers.repair import router as repair_router
@@ -21,10 +22,13 @@ app.add_middleware(
 async def on_startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
 
 @app.on_event("shutdown")
 async def on_shutdown():
     await http_client.close()
+    await httpx_clients.aclose()
+    await blob_aio.close()
 
 
 @app.get("/healthz")
@@ -1,7 +1,7 @@
 # app/models.py
 from __future__ import annotations
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, Text, BigInteger, TIMESTAMP
+from sqlalchemy import String, Text, BigInteger, Integer, TIMESTAMP, inspect, text
 from app.db import Base  # <-- pakai Base dari app/db.py yang sudah kamu buat
 
 class Job(Base):
@@ -28,6 +28,9 @@ class Job(Base):
     created_at: Mapped[int]     = mapped_column(BigInteger, default=0)
     updated_at: Mapped[int]     = mapped_column(BigInteger, default=0)
 
+    # upload langsung: semua job (satu per bahasa target) dari satu /upload/init berbagi id ini
+    upload_group: Mapped[str | None] = mapped_column(String(64), default=None, index=True)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -40,3 +43,32 @@ class User(Base):
     token_json:  Mapped[str | None]    = mapped_column(Text,        default=None)   # untuk Graph tokens
     expires_at:  Mapped[int | None]    = mapped_column(BigInteger,  default=None)   # epoch detik UTC
     updated_at:  Mapped[str | None]    = mapped_column(TIMESTAMP,   default=None)
+
+
+class GlossaryCacheEntry(Base):
+    """Term pairs hasil LLM per (bahasa, SimHash sampel). band0..3 = potongan 16 bit untuk cari near-duplicate."""
+    __tablename__ = "glossary_cache"
+
+    id:          Mapped[str]  = mapped_column(String(64), primary_key=True)
+    source_lang: Mapped[str]  = mapped_column(String(16), index=True)
+    target_lang: Mapped[str]  = mapped_column(String(16), index=True)
+    simhash:     Mapped[str]  = mapped_column(String(16))           # hex 64 bit
+    band0:       Mapped[int]  = mapped_column(Integer, index=True)
+    band1:       Mapped[int]  = mapped_column(Integer, index=True)
+    band2:       Mapped[int]  = mapped_column(Integer, index=True)
+    band3:       Mapped[int]  = mapped_column(Integer, index=True)
+    pairs_json:  Mapped[str]  = mapped_column(Text, default="[]")
+    hits:        Mapped[int]  = mapped_column(Integer, default=0)
+    created_at:  Mapped[int]  = mapped_column(BigInteger, default=0)
+    last_hit:    Mapped[int]  = mapped_column(BigInteger, default=0, index=True)
+
+
+def upgrade_schema(conn) -> None:
+    """
+    Tambah kolom baru ke tabel lama (create_all tidak meng-ALTER tabel yang sudah ada).
+    Jalankan lewat `await conn.run_sync(upgrade_schema)` setelah create_all; idempoten.
+    """
+    cols = {c["name"] for c in inspect(conn).get_columns("jobs")}
+    if "upload_group" not in cols:
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN upload_group VARCHAR(64)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jobs_upload_group ON jobs (upload_group)"))
@@ -5,11 +5,15 @@ import json
 from typing import Optional
 
 import aiohttp
-from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, Request, UploadFile, File, Form, HTTPException
 from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_400_BAD_REQUEST, HTTP_413_REQUEST_ENTITY_TOO_LARGE
 import jwt
 from jwt import InvalidTokenError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_session
+from app.services.direct_upload import DirectUploadError, finalize_direct_upload, init_direct_upload
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -37,6 +41,26 @@ def verify_repair_token(token: str) -> dict:
         raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail=f"Invalid token: {e}")
 
 
+def _request_token(request: Request) -> str:
+    # Ambil token dari header / cookie / query (fleksibel)
+    auth = request.headers.get("Authorization", "")
+    return (
+        request.headers.get("X-Repair-Token")
+        or (auth[7:] if auth.lower().startswith("bearer ") else None)
+        or request.cookies.get("repair_token")
+        or request.query_params.get("token")
+        or ""
+    )
+
+
+def _claims_user(request: Request) -> tuple:
+    claims = verify_repair_token(_request_token(request))
+    user_id = claims.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Token has no 'sub' (user_id).")
+    return claims, user_id
+
+
 # ===== HTML + JS =====
 _REPAIR_HTML = r"""
 <!doctype html>
@@ -109,7 +133,7 @@ _REPAIR_HTML = r"""
               &nbsp;&nbsp;
               <label>Target: <input id="tgt" class="kbd" value="id" size="4" /></label>
             </div>
-            <div class="muted" style="margin-top:8px">We will upload to the server and let the backend handle OneDrive/Blob.</div>
+            <div class="muted" style="margin-top:8px">The file is uploaded directly to storage; the backend handles translation and OneDrive.</div>
           </div>
         </div>
       </div>
@@ -227,17 +251,69 @@ _REPAIR_HTML = r"""
     }
   }
 
-  btn.addEventListener("click", ()=>{
-    if(!fileInput.files.length || !token) return;
+  const postForm = async (url, fields)=>{
+    const fd = new FormData();
+    for(const k in fields){ if(fields[k] !== undefined && fields[k] !== null) fd.append(k, fields[k]); }
+    const r = await fetch(url, {method:"POST", body:fd, headers:{"X-Repair-Token": token, "Accept":"application/json", "Cache-Control":"no-store"}});
+    let js = null;
+    try { js = await r.json(); } catch(e){}
+    return {status: r.status, js};
+  };
 
-    const src = el("src").value || "en";
-    const tgt = el("tgt").value || "id";
-    const f = fileInput.files[0];
+  // PUT langsung ke Blob Storage (SAS write-only); butuh CORS PUT di storage account
+  const putBlob = (url, body, headers, onProgress)=> new Promise((resolve, reject)=>{
+    const x = new XMLHttpRequest();
+    x.open("PUT", url);
+    for(const k in headers){ x.setRequestHeader(k, headers[k]); }
+    if(onProgress){ x.upload.onprogress = (e)=>{ if(e.lengthComputable) onProgress(e.loaded); }; }
+    x.onerror = ()=> reject(new Error("storage network/CORS error"));
+    x.onload = ()=> (x.status >= 200 && x.status < 300) ? resolve() : reject(new Error("storage " + x.status + ": " + (x.responseText || "").slice(0, 200)));
+    x.send(body);
+  });
 
-    setUpload(0,"Starting…");
-    setProc(0,"Waiting for upload…");
-    btn.disabled = true;
+  const blockId = (i)=> btoa(String(i).padStart(8, "0"));
 
+  async function directUpload(f, src, tgt){
+    const init = await postForm("/repair/init", {filename: f.name, size: f.size, source_lang: src, target_lang: tgt});
+    if(init.status === 404 || init.status === 405) return false;  // backend lama → jalur legacy
+    if(!init.js || !init.js.ok){
+      const err = new Error((init.js && (init.js.error || init.js.detail)) || ("init failed (" + init.status + ")"));
+      err.fatal = true;
+      throw err;
+    }
+    const upload_url = init.js.upload_url, block_size = init.js.block_size, job_id = init.js.job_id;
+    log("Job created: " + job_id + " — uploading directly to storage…");
+
+    const n = Math.max(1, Math.ceil(f.size / block_size));
+    const ids = [];
+    let sent = 0;
+    for(let i = 0; i < n; i++){
+      const chunk = f.slice(i * block_size, Math.min((i + 1) * block_size, f.size));
+      const id = blockId(i);
+      ids.push(id);
+      await putBlob(upload_url + "&comp=block&blockid=" + encodeURIComponent(id), chunk, {}, (loaded)=>{
+        setUpload(((sent + loaded) / Math.max(1, f.size)) * 100, `${bytes(sent + loaded)} / ${bytes(f.size)}`);
+      });
+      sent += chunk.size;
+    }
+    const xml = '<?xml version="1.0" encoding="utf-8"?><BlockList>' + ids.map((b)=>"<Latest>" + b + "</Latest>").join("") + "</BlockList>";
+    await putBlob(upload_url + "&comp=blocklist", xml, {"Content-Type": "application/xml", "x-ms-blob-content-type": f.type || "application/octet-stream"});
+    setUpload(100, "Uploaded");
+
+    const fin = await postForm("/repair/finalize", {job_id: job_id});
+    if(!fin.js || !fin.js.ok){
+      const err = new Error((fin.js && (fin.js.error || fin.js.detail)) || ("finalize failed (" + fin.status + ")"));
+      err.fatal = true;
+      throw err;
+    }
+    log("Response: " + JSON.stringify(fin.js, null, 2));
+    setProc(15, "Submitted…");
+    pollJob(fin.js.check_status || ("/jobs/" + job_id));
+    return true;
+  }
+
+  // Jalur lama: multipart lewat server (/repair/upload)
+  function legacyUpload(f, src, tgt){
     const form = new FormData();
     form.append("file", f, f.name);
     form.append("source_lang", src);
@@ -284,6 +360,28 @@ _REPAIR_HTML = r"""
       }
     };
     xhr.send(form);
+  }
+
+  btn.addEventListener("click", async ()=>{
+    if(!fileInput.files.length || !token) return;
+
+    const src = el("src").value || "en";
+    const tgt = el("tgt").value || "id";
+    const f = fileInput.files[0];
+
+    setUpload(0,"Starting…");
+    setProc(0,"Waiting for upload…");
+    btn.disabled = true;
+
+    try {
+      if(await directUpload(f, src, tgt)) return;
+    } catch(e){
+      log("Direct upload failed: " + e.message);
+      if(e.fatal){ btn.disabled = false; return; }
+      log("Falling back to server upload…");
+      setUpload(0, "Retrying…");
+    }
+    legacyUpload(f, src, tgt);
   });
 
   // initial enable state
@@ -333,20 +431,7 @@ async def repair_upload(
     source_lang: str = Form(...),
     target_lang: str = Form(...),
 ):
-    # Ambil token dari header / cookie / query (fleksibel)
-    auth = request.headers.get("Authorization", "")
-    token = (
-        request.headers.get("X-Repair-Token")
-        or (auth[7:] if auth.lower().startswith("bearer ") else None)
-        or request.cookies.get("repair_token")
-        or request.query_params.get("token")
-        or ""
-    )
-
-    claims = verify_repair_token(token)
-    user_id = claims.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Token has no 'sub' (user_id).")
+    claims, user_id = _claims_user(request)
 
     src = (source_lang or claims.get("src") or "").strip() or "en"
     tgt = (target_lang or claims.get("tgt") or "").strip() or "id"
@@ -412,3 +497,47 @@ async def repair_upload(
     if "job_id" in js and "check_status" not in js:
         out["check_status"] = f"/jobs/{js['job_id']}"
     return JSONResponse(out, headers={"Cache-Control": "no-store"})
+
+
+@router.post("/repair/init")
+async def repair_init(
+    request: Request,
+    filename: str = Form(...),
+    size: Optional[int] = Form(None),
+    source_lang: str = Form(""),
+    target_lang: str = Form(""),
+    session: AsyncSession = Depends(get_session),
+):
+    """Upload langsung browser → storage: buat job + SAS write-only (lihat /upload/init)."""
+    claims, user_id = _claims_user(request)
+    src = (source_lang or claims.get("src") or "").strip() or "en"
+    tgt = (target_lang or claims.get("tgt") or "").strip() or "id"
+    try:
+        out = await init_direct_upload(
+            session,
+            filename=filename,
+            size=size,
+            source_lang=src,
+            targets=[tgt],
+            user_id=user_id,
+            max_bytes=MAX_REPAIR_UPLOAD_MB * 1024 * 1024,
+        )
+    except DirectUploadError as e:
+        return JSONResponse(status_code=e.status_code, content={"ok": False, "error": e.detail})
+    return JSONResponse({"ok": True, **out}, headers={"Cache-Control": "no-store"})
+
+
+@router.post("/repair/finalize")
+async def repair_finalize(
+    request: Request,
+    job_id: str = Form(...),
+    session: AsyncSession = Depends(get_session),
+):
+    _, user_id = _claims_user(request)
+    try:
+        out = await finalize_direct_upload(
+            session, job_id, user_id=user_id, max_bytes=MAX_REPAIR_UPLOAD_MB * 1024 * 1024,
+        )
+    except DirectUploadError as e:
+        return JSONResponse(status_code=e.status_code, content={"ok": False, "error": e.detail})
+    return JSONResponse({"ok": True, **out}, headers={"Cache-Control": "no-store"})
@@ -12,7 +12,7 @@ from sqlalchemy import select, insert, update
 
 from ..db import get_session
 from ..models import Job, User
-from ..services.blob import upload_bytes_with_prefix
+from ..services.blob import put_stream, UploadTooLargeError
 from ..services.queue import enqueue_job
 from ..config import settings
 
@@ -57,21 +57,25 @@ async def create_jobs(
                 )
             )
 
-    data = await file.read()
-    size_mb = len(data) / (1024 * 1024)
-    if size_mb > settings.MAX_UPLOAD_MB:
+    max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
+    if (getattr(file, "size", None) or 0) > max_bytes:
         raise HTTPException(status_code=413, detail=f"File too large: {file.filename}")
 
     job_id = await _gen_unique_job_id(session)
 
     # simpan source ke blob input
     prefix = f"jobs/{job_id}/input"
-    _url, blob_name = await upload_bytes_with_prefix(
-        data=data,
-        content_type=file.content_type or "application/octet-stream",
-        filename=file.filename,
-        prefix=prefix,
-    )
+    try:
+        put = await put_stream(
+            settings.AZURE_INPUT_CONTAINER,
+            f"{prefix}/{file.filename}",
+            file,
+            content_type=file.content_type or "application/octet-stream",
+            max_bytes=max_bytes,
+        )
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail=f"File too large: {file.filename}")
+    blob_name = put["blob_name"]
 
     # detail job: simpan action & meta (mode/prompt) → fallback untuk worker
     detail = {
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from typing import List, Optional
+import asyncio
 import json
+import os
 import time
 from uuid import uuid4
 
@@ -11,11 +13,17 @@ from sqlalchemy import select, insert, update
 
 from ..db import get_session
 from ..models import Job, User
-from ..services.blob import upload_bytes_with_prefix
+from ..services import blob_aio
+from ..services.blob import put_stream, UploadTooLargeError
 from ..services.queue import enqueue_job
 from ..config import settings
 
-from ..services.path_sanitize import sanitize_blob_path
+from ..services.direct_upload import (
+    DirectUploadError,
+    finalize_direct_upload,
+    init_direct_upload,
+    input_blob_path,
+)
 try:
     from ..services.resize import guess_mime
 except Exception:
@@ -25,26 +33,26 @@ except Exception:
 router = APIRouter(prefix="/upload", tags=["upload"])
 
 
-async def _gen_unique_job_id(session: AsyncSession, max_tries: int = 5) -> str:
-    for _ in range(max_tries):
-        jid = str(uuid4())
-        exists = await session.scalar(select(Job.id).where(Job.id == jid))
-        if not exists:
-            return jid
-    return f"{int(time.time() * 1000)}-{uuid4()}"
+# jumlah file yang di-stream ke blob bersamaan per request
+UPLOAD_PARALLEL = max(1, int(os.getenv("UPLOAD_PARALLEL", "4")))
 
 
-@router.post("/create")
-async def create_jobs(
-    request: Request,
-    files: Optional[List[UploadFile]] = File(default=None),
-    file: Optional[UploadFile] = File(default=None),
-    target_lang: str = Form(settings.DEFAULT_TARGET_LANG),
-    source_lang: str = Form("auto"),
-    user_id: Optional[str] = Form(None),
-    session: AsyncSession = Depends(get_session),
-):
-    # (A) simpan token user (kalau dikirim via Authorization)
+def _parse_target_langs(target_lang: str, target_langs: Optional[List[str]]) -> List[str]:
+    """
+    target_langs boleh field berulang (target_langs=en&target_langs=ja) atau dipisah koma ("en,ja,zh").
+    Kosong → [target_lang]. Urutan dipertahankan, duplikat dibuang.
+    """
+    out: List[str] = []
+    for raw in (target_langs or []):
+        for t in (raw or "").split(","):
+            t = t.strip()
+            if t and t.lower() not in (x.lower() for x in out):
+                out.append(t)
+    return out or [target_lang or settings.DEFAULT_TARGET_LANG]
+
+
+async def _save_user_token(session: AsyncSession, request: Request, user_id: Optional[str]) -> None:
+    """Simpan token user (kalau dikirim via Authorization) untuk upload OneDrive oleh worker."""
     auth = request.headers.get("Authorization") or ""
     bearer = auth.split(" ", 1)[1] if auth.lower().startswith("bearer ") else ""
     if user_id and bearer:
@@ -69,6 +77,21 @@ async def create_jobs(
                 )
             )
 
+
+@router.post("/create")
+async def create_jobs(
+    request: Request,
+    files: Optional[List[UploadFile]] = File(default=None),
+    file: Optional[UploadFile] = File(default=None),
+    target_lang: str = Form(settings.DEFAULT_TARGET_LANG),
+    target_langs: Optional[List[str]] = Form(default=None),
+    source_lang: str = Form("auto"),
+    user_id: Optional[str] = Form(None),
+    session: AsyncSession = Depends(get_session),
+):
+    # (A) simpan token user (kalau dikirim via Authorization)
+    await _save_user_token(session, request, user_id)
+
     # (B) kumpulkan files
     all_files: List[UploadFile] = []
     if files:
@@ -78,50 +101,130 @@ async def create_jobs(
     if not all_files:
         raise HTTPException(status_code=422, detail="Field required: files (or file)")
 
-    job_ids: List[str] = []
+    targets = _parse_target_langs(target_lang, target_langs)
+    max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
 
-    # 1) Upload & buat row job
+    # size dari parser multipart (kalau ada) → tolak sebelum menyentuh storage. Body multipart sudah
+    # diterima utuh (spool disk Starlette) saat handler jalan; upload tanpa lewat API: /upload/init
     for f in all_files:
-        data = await f.read()
-        size_mb = len(data) / (1024 * 1024)
-        if size_mb > settings.MAX_UPLOAD_MB:
+        if (getattr(f, "size", None) or 0) > max_bytes:
             raise HTTPException(status_code=413, detail=f"File too large: {f.filename}")
 
-        job_id = await _gen_unique_job_id(session)
-        job_ids.append(job_id)
-
-        prefix = f"jobs/{job_id}/input"
-        desired_path = f"{prefix}/{f.filename or 'file'}"
-        sanitized_path = sanitize_blob_path(desired_path)
-        if not sanitized_path or not sanitized_path.startswith(prefix):
-            sanitized_path = sanitize_blob_path(f"{prefix}/file")
-        filename_sanitized = sanitized_path.split("/", 3)[-1] if "/" in sanitized_path else sanitized_path
-
-        _url, _blobname = await upload_bytes_with_prefix(
-            data=data,
-            content_type=(f.content_type or guess_mime(f.filename) or "application/octet-stream"),
-            filename=filename_sanitized,
-            prefix=prefix,
-        )
-
-        job = Job(
-            id=job_id,
-            filename=f.filename,
-            status="QUEUED",
-            detail="",
-            batch_id="",
-            result_blob=_blobname,   # <- path sumber yang akan dipakai worker/translator
-            source_lang=source_lang or "auto",
-            target_lang=target_lang or settings.DEFAULT_TARGET_LANG,
-            user_id=user_id or None,
+    # satu job per target language per file; input blob dipakai bersama (di bawah prefix job pertama).
+    # uuid4 tidak perlu dicek ke DB — primary key tetap jadi pengaman terakhir.
+    groups = [[str(uuid4()) for _ in targets] for _ in all_files]
+
+    # 1) Upload semua file paralel (dibatasi), masing-masing dibaca per chunk dari file spool
+    sem = asyncio.Semaphore(UPLOAD_PARALLEL)
+
+    async def _upload(f: UploadFile, job_id: str) -> str:
+        async with sem:
+            put = await put_stream(
+                settings.AZURE_INPUT_CONTAINER,
+                input_blob_path(job_id, f.filename),
+                f,
+                content_type=(f.content_type or guess_mime(f.filename) or "application/octet-stream"),
+                max_bytes=max_bytes,
+            )
+            return put["blob_name"]
+
+    async def _discard_uploaded(names: List[str]) -> None:
+        """Request gagal → blob input yang sudah terlanjur ter-commit dihapus (tidak ada row job-nya)."""
+        async def _one(name: str) -> None:
+            try:
+                await blob_aio.delete_blob(settings.AZURE_INPUT_CONTAINER, name)
+            except Exception:
+                pass
+        await asyncio.gather(*(_one(n) for n in names))
+
+    results = await asyncio.gather(
+        *(_upload(f, ids[0]) for f, ids in zip(all_files, groups)), return_exceptions=True
+    )
+    failed = [(f, res) for f, res in zip(all_files, results) if isinstance(res, BaseException)]
+    if failed:
+        await _discard_uploaded([res for res in results if not isinstance(res, BaseException)])
+        f, res = failed[0]
+        if isinstance(res, UploadTooLargeError):
+            raise HTTPException(status_code=413, detail=f"File too large: {f.filename}")
+        raise res
+
+    # 2) satu INSERT untuk semua row job, lalu commit supaya worker bisa baca
+    now = int(time.time())
+    rows = [
+        {
+            "id": jid,
+            "filename": f.filename,
+            "status": "QUEUED",
+            "detail": "",
+            "batch_id": "",
+            "result_blob": blob_name,   # <- path sumber yang akan dipakai worker/translator
+            "source_lang": source_lang or "auto",
+            "target_lang": tgt,
+            "user_id": user_id or None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for f, ids, blob_name in zip(all_files, groups, results)
+        for jid, tgt in zip(ids, targets)
+    ]
+    try:
+        await session.execute(insert(Job), rows)
+        await session.commit()
+    except BaseException:
+        await _discard_uploaded(results)
+        raise
+
+    # 3) enqueue paralel (satu pesan per file; worker submit semua bahasa sekaligus)
+    await asyncio.gather(*(
+        enqueue_job({"job_id": ids[0], "job_ids": ids} if len(ids) > 1 else {"job_id": ids[0]}, visibility_timeout=5)
+        for ids in groups
+    ))
+
+    job_ids = [jid for ids in groups for jid in ids]
+    return {"job_ids": job_ids, "count": len(job_ids), "target_langs": targets, "status": "QUEUED"}
+
+
+@router.post("/init")
+async def init_upload(
+    request: Request,
+    filename: str = Form(...),
+    size: Optional[int] = Form(None),
+    target_lang: str = Form(settings.DEFAULT_TARGET_LANG),
+    target_langs: Optional[List[str]] = Form(default=None),
+    source_lang: str = Form("auto"),
+    user_id: Optional[str] = Form(None),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Fase 1 upload langsung ke storage: buat job (UPLOADING) + SAS write-only untuk blob input.
+    Client lalu PUT block (`&comp=block&blockid=...`) + Put Block List ke `upload_url`,
+    kemudian panggil /upload/finalize.
+    """
+    await _save_user_token(session, request, user_id)
+    try:
+        return await init_direct_upload(
+            session,
+            filename=filename,
+            size=size,
+            source_lang=source_lang,
+            targets=_parse_target_langs(target_lang, target_langs),
+            user_id=user_id,
+            max_bytes=settings.MAX_UPLOAD_MB * 1024 * 1024,
         )
-        session.add(job)
+    except DirectUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-    # 2) commit supaya worker bisa baca
-    await session.commit()
 
-    # 3) enqueue
-    for jid in job_ids:
-        await enqueue_job({"job_id": jid}, visibility_timeout=5)
-
-    return {"job_ids": job_ids, "count": len(job_ids), "status": "QUEUED"}
+@router.post("/finalize")
+async def finalize_upload(
+    job_id: str = Form(...),
+    user_id: Optional[str] = Form(None),
+    session: AsyncSession = Depends(get_session),
+):
+    """Fase 2: verifikasi blob sudah di-commit & ukurannya valid → job QUEUED + enqueue."""
+    try:
+        return await finalize_direct_upload(
+            session, job_id, user_id=user_id, max_bytes=settings.MAX_UPLOAD_MB * 1024 * 1024,
+        )
+    except DirectUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
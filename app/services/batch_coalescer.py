@@ -0,0 +1,191 @@
+# app/services/batch_coalescer.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+
+logger = logging.getLogger("worker.coalescer")
+
+# (key, source_blob_path, target_lang) – satu dokumen hasil yang ditunggu oleh satu job
+Member = Tuple[str, str, str]
+
+
+class _Group:
+    def __init__(self, signature: Hashable):
+        self.signature = signature
+        self.inputs: List[dict] = []
+        self.sizes: List[int] = []
+        self.members: List[Member] = []
+        self.futures: List[Tuple[asyncio.Future, List[Member]]] = []
+        self.bytes = 0
+        self.opened = time.monotonic()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class BatchCoalescer:
+    """
+    Gabungkan beberapa job dengan signature sama (mis. source+target language) yang datang
+    dalam window pendek menjadi SATU batch Document Translation (beberapa entry `inputs`).
+    Setelah batch terminal, status per dokumen dibagikan balik ke masing-masing job.
+    Submit gabungan gagal (mis. 400 karena satu dokumen invalid) → tiap entry di-submit ulang
+    sendiri-sendiri, sehingga hanya job penyebab error yang gagal.
+
+    submit(inputs)            -> batch_id / operation-location
+    wait(batch_id)            -> JSON status batch (terminal)
+    documents(batch_id)       -> list status dokumen (sourcePath, path, to, status, error)
+    """
+
+    def __init__(
+        self,
+        *,
+        submit: Callable[[List[dict]], Awaitable[str]],
+        wait: Callable[[str], Awaitable[dict]],
+        documents: Callable[[str], Awaitable[List[dict]]],
+        source_container: str,
+        window_s: float = 1.5,
+        max_docs: int = 25,
+        max_bytes: int = 200 * 1024 * 1024,
+    ):
+        self._submit = submit
+        self._wait = wait
+        self._documents = documents
+        self._source_container = source_container
+        self.window_s = window_s
+        self.max_docs = max(1, max_docs)
+        self.max_bytes = max_bytes
+        self._groups: Dict[Hashable, _Group] = {}
+        self._tasks: set = set()
+        self.metrics: Dict[str, int] = {"batches": 0, "documents": 0, "coalesced": 0, "submit_errors": 0, "split_retries": 0}
+
+    # ------------------------------------------------------------------
+    async def translate(
+        self,
+        signature: Hashable,
+        entry: dict,
+        members: Sequence[Member],
+        *,
+        size: int = 0,
+    ) -> dict:
+        """
+        Daftarkan satu entry `inputs` dan tunggu hasilnya.
+        Return {"batch_id", "status": <json batch>, "documents": {key: doc|None}}.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        members = list(members)
+
+        grp = self._groups.get(signature)
+        if grp is not None and (
+            len(grp.members) + len(members) > self.max_docs or grp.bytes + size > self.max_bytes
+        ):
+            self._flush(grp)
+            grp = None
+        if grp is None:
+            grp = _Group(signature)
+            self._groups[signature] = grp
+            if self.window_s > 0:
+                grp.timer = asyncio.get_running_loop().call_later(self.window_s, self._flush, grp)
+
+        grp.inputs.append(entry)
+        grp.sizes.append(size)
+        grp.members.extend(members)
+        grp.futures.append((fut, members))
+        grp.bytes += size
+        if self.window_s <= 0 or len(grp.members) >= self.max_docs:
+            self._flush(grp)
+        return await fut
+
+    def stats(self) -> dict:
+        return {**self.metrics, "pending_groups": len(self._groups)}
+
+    # ------------------------------------------------------------------
+    def _flush(self, grp: _Group) -> None:
+        if self._groups.get(grp.signature) is grp:
+            del self._groups[grp.signature]
+        if grp.timer is not None:
+            grp.timer.cancel()
+            grp.timer = None
+        if not grp.futures:
+            return
+        self._spawn(self._run(grp))
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        t = asyncio.ensure_future(coro)
+        self._tasks.add(t)
+        t.add_done_callback(self._tasks.discard)
+
+    def _split(self, grp: _Group, error: Exception) -> None:
+        """Submit gabungan gagal → satu grup per entry; error hanya jatuh ke job yang memang gagal."""
+        self.metrics["split_retries"] += 1
+        logger.warning("coalesced_submit_split", extra={
+            "inputs": len(grp.inputs), "job_ids": [m[0] for m in grp.members], "error": str(error),
+        })
+        for entry, size, (fut, members) in zip(grp.inputs, grp.sizes, grp.futures):
+            if fut.done():
+                continue
+            one = _Group(grp.signature)
+            one.inputs, one.sizes, one.members, one.futures = [entry], [size], list(members), [(fut, members)]
+            one.bytes = size
+            self._spawn(self._run(one))
+
+    async def _run(self, grp: _Group) -> None:
+        try:
+            batch_id = await self._submit(grp.inputs)
+            if not batch_id:
+                raise RuntimeError("Failed to start document translation (no batch id)")
+        except Exception as e:
+            self.metrics["submit_errors"] += 1
+            if len(grp.inputs) > 1:
+                self._split(grp, e)
+                return
+            for fut, _ in grp.futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self.metrics["batches"] += 1
+        self.metrics["documents"] += len(grp.members)
+        if len(grp.inputs) > 1:
+            self.metrics["coalesced"] += len(grp.inputs)
+        logger.info("coalesced_batch_submitted", extra={
+            "batch_id": batch_id,
+            "inputs": len(grp.inputs),
+            "documents": len(grp.members),
+            "bytes": grp.bytes,
+            "window_ms": round((time.monotonic() - grp.opened) * 1000),
+            "job_ids": [m[0] for m in grp.members],
+        })
+
+        try:
+            status = await self._wait(batch_id)
+            docs: List[dict] = []
+            if int(((status.get("summary") or {}).get("total")) or 0) > 0:
+                docs = await self._documents(batch_id)
+        except Exception as e:
+            for fut, _ in grp.futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for fut, members in grp.futures:
+            if fut.done():
+                continue
+            fut.set_result({
+                "batch_id": batch_id,
+                "status": status,
+                "documents": {key: self._match(docs, src, lang) for key, src, lang in members},
+            })
+
+    def _match(self, docs: List[dict], src_blob: str, lang: str) -> Optional[dict]:
+        suffix = f"/{self._source_container}/{src_blob}".lower()
+        lang = (lang or "").lower()
+        for d in docs:
+            path = unquote(urlparse(d.get("sourcePath") or "").path).lower()
+            if not path.endswith(suffix):
+                continue
+            if lang and (d.get("to") or "").lower() not in ("", lang):
+                continue
+            return d
+        return None
@@ -0,0 +1,249 @@
+# app/services/batch_tracker.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger("worker.batch_tracker")
+
+TERMINAL_STATES = ("succeeded", "failed", "validationfailed", "cancelled")
+
+
+class _Tracked:
+    def __init__(self, url: str, fut: asyncio.Future, timeout_s: float, min_interval: float):
+        now = time.monotonic()
+        self.url = url
+        self.fut = fut
+        self.started = now
+        self.deadline = now + timeout_s
+        self.next_at = now + min_interval
+        self.step = 0
+        self.errors = 0
+        self.polls = 0
+        self.waiters = 0
+        self.last_done = -1
+        self.last_status = ""
+        self.first_progress_at: Optional[float] = None
+        self.last: dict = {}
+
+
+class BatchTracker:
+    """
+    Satu poller bersama untuk semua batch Document Translation yang sedang berjalan.
+    Job cukup `await tracker.wait(batch_id)`; tracker yang menjadwalkan GET status
+    secara adaptif (progress dokumen + waktu berjalan, backoff eksponensial + jitter).
+    """
+
+    def __init__(
+        self,
+        *,
+        status_url: Callable[[str], str],
+        headers: Callable[[], Dict[str, str]],
+        min_interval: float = 2.0,
+        max_interval: float = 30.0,
+        backoff: float = 1.6,
+        max_parallel: int = 8,
+        max_errors: int = 10,
+        governor=None,
+        client: Optional[Callable[[], httpx.AsyncClient]] = None,
+    ):
+        self._status_url = status_url
+        self._headers = headers
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_errors = max_errors
+        self._governor = governor  # RateGovernor bersama (opsional): GET status ikut antre & throttle global
+        self._sem = asyncio.Semaphore(max_parallel)
+        self._items: Dict[str, _Tracked] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._shared_client = client  # client milik registry bersama → tidak ditutup di close()
+        self.metrics: Dict[str, int] = {"tracked": 0, "polls": 0, "poll_errors": 0, "resolved": 0, "timeouts": 0, "throttled": 0}
+
+    # ------------------------------------------------------------------
+    def track(self, batch_id_or_loc: str, *, timeout_s: float = 3600) -> asyncio.Future:
+        return self._register(batch_id_or_loc, timeout_s).fut
+
+    def _register(self, batch_id_or_loc: str, timeout_s: float) -> _Tracked:
+        url = self._status_url(batch_id_or_loc)
+        item = self._items.get(url)
+        if item is None:
+            fut = asyncio.get_running_loop().create_future()
+            item = _Tracked(url, fut, timeout_s, self.min_interval)
+            self._items[url] = item
+            self.metrics["tracked"] += 1
+        self._kick()
+        return item
+
+    async def wait(self, batch_id_or_loc: str, *, timeout_s: float = 3600) -> dict:
+        """
+        Tunggu sampai batch terminal. Return JSON status terakhir dari Translator.
+        Future dipakai bersama beberapa waiter (shield); waiter yang dibatalkan (lease hilang,
+        shutdown) melepas diri, dan batch tanpa waiter berhenti di-poll.
+        """
+        item = self._register(batch_id_or_loc, timeout_s)
+        item.waiters += 1
+        try:
+            return await asyncio.shield(item.fut)
+        except asyncio.CancelledError:
+            item.waiters -= 1
+            if item.waiters <= 0 and not item.fut.done():
+                self._items.pop(item.url, None)
+                item.fut.cancel()
+            raise
+
+    def stats(self) -> dict:
+        return {**self.metrics, "outstanding": len(self._items)}
+
+    async def close(self) -> None:
+        if self._runner and not self._runner.done():
+            self._runner.cancel()
+            try:
+                await self._runner
+            except BaseException:
+                pass
+        for item in self._items.values():
+            if not item.fut.done():
+                item.fut.cancel()
+        self._items.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ------------------------------------------------------------------
+    def _kick(self) -> None:
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        self._wake.set()
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        if self._shared_client is not None:
+            return self._shared_client()
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30.0)
+        return self._client
+
+    async def _run(self) -> None:
+        while self._items:
+            self._wake.clear()
+            now = time.monotonic()
+            due = [it for it in self._items.values() if it.next_at <= now]
+            if due:
+                await asyncio.gather(*(self._poll(it) for it in due))
+                continue
+            nxt = min(it.next_at for it in self._items.values())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.05, nxt - now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, item: _Tracked) -> None:
+        if item.fut.done():  # semua waiter batal
+            self._items.pop(item.url, None)
+            return
+        retry_after: Optional[float] = None
+        async with self._sem:
+            try:
+                client = await self._get_client()
+                if self._governor is not None:
+                    await self._governor.acquire()
+                r = await client.get(item.url, headers=self._headers())
+                self.metrics["polls"] += 1
+                item.polls += 1
+                if r.status_code in (429, 503):
+                    retry_after = _retry_after_s(r)
+                    if self._governor is None:
+                        raise httpx.HTTPStatusError("throttled", request=r.request, response=r)
+                    # throttle bukan error batch: antre lebih lama (deadline tetap berlaku), tidak dihitung max_errors
+                    self._governor.note_throttle(retry_after or self.min_interval)
+                    self.metrics["throttled"] += 1
+                    data = None
+                else:
+                    r.raise_for_status()
+                    data = r.json()
+                    item.errors = 0
+            except Exception as e:
+                item.errors += 1
+                self.metrics["poll_errors"] += 1
+                logger.warning("batch_poll_error", extra={"url": item.url.split("?")[0], "errors": item.errors, "error": str(e)})
+                if item.errors >= self.max_errors:
+                    self._resolve(item, exc=RuntimeError(f"Translator status polling failed: {e}"))
+                    return
+                data = None
+
+        now = time.monotonic()
+        if data is not None:
+            item.last = data
+            if (data.get("status") or "").lower() in TERMINAL_STATES:
+                self._resolve(item, result=data)
+                return
+        if now >= item.deadline:
+            self.metrics["timeouts"] += 1
+            self._resolve(item, exc=TimeoutError("Translator polling timeout"))
+            return
+        item.next_at = now + self._next_interval(item, data, now, retry_after)
+
+    def _next_interval(self, item: _Tracked, data: Optional[dict], now: float, retry_after: Optional[float]) -> float:
+        elapsed = now - item.started
+        estimate: Optional[float] = None
+        if data is not None:
+            summary = data.get("summary") or {}
+            total = int(summary.get("total") or 0)
+            done = sum(int(summary.get(k) or 0) for k in ("success", "failed", "cancelled"))
+            status = (data.get("status") or "").lower()
+            if done > item.last_done or status != item.last_status:
+                item.last_status = status
+                if item.first_progress_at is None and done > 0:
+                    item.first_progress_at = now
+                item.last_done = done
+                item.step = 0  # ada progress / status berubah → kembali ke interval rapat
+            else:
+                item.step += 1
+            if total and 0 < done < total and item.first_progress_at is not None:
+                # perkiraan sisa waktu dari laju dokumen yang sudah selesai
+                rate = done / max(1.0, now - item.started)
+                estimate = (total - done) / rate / 2
+        else:
+            item.step += 1
+
+        if estimate is not None:
+            interval = estimate
+        else:
+            interval = self.min_interval * (self.backoff ** item.step)
+        interval = max(interval, elapsed / 20)  # job panjang → poll lebih jarang
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        if retry_after is not None:
+            interval = max(interval, retry_after)
+        return interval * random.uniform(0.8, 1.2)
+
+    def _resolve(self, item: _Tracked, *, result: Optional[dict] = None, exc: Optional[BaseException] = None) -> None:
+        self._items.pop(item.url, None)
+        if item.fut.done():
+            return
+        self.metrics["resolved"] += 1
+        if exc is not None:
+            item.fut.set_exception(exc)
+        else:
+            item.fut.set_result(result)
+        logger.info("batch_resolved", extra={
+            "url": item.url.split("?")[0],
+            "status": (result or {}).get("status") if exc is None else "error",
+            "polls": item.polls,
+            "elapsed_s": round(time.monotonic() - item.started, 1),
+        })
+
+
+def _retry_after_s(resp) -> Optional[float]:
+    try:
+        return float(resp.headers.get("Retry-After") or "")
+    except ValueError:
+        return None
@@ -1,6 +1,9 @@
 # app/services/blob.py
 from __future__ import annotations
 
+import asyncio
+import base64
+import hashlib
 import os
 from datetime import datetime, timedelta
 import datetime as dt
@@ -8,6 +11,7 @@ from typing import Optional
 from urllib.parse import quote
 
 from azure.storage.blob import (
+    BlobBlock,
     BlobServiceClient,
     ContentSettings,
     generate_blob_sas,
@@ -77,6 +81,7 @@ _ensure_container(_OUTPUT_CONTAINER)
 
 
 # ----------------------------- Utilities -------------------------------
+# Shim sync untuk caller sync (skrip/CLI/thread). Kode async: pakai app.services.blob_aio.
 def put_bytes(
     container: str,
     name: str,
@@ -95,6 +100,74 @@ def put_bytes(
     return name
 
 
+class UploadTooLargeError(RuntimeError):
+    """Stream melewati batas ukuran; blok yang sudah di-stage tidak pernah di-commit."""
+
+    def __init__(self, name: str, limit: int):
+        super().__init__(f"Upload melebihi {limit} bytes: {name}")
+        self.name = name
+        self.limit = limit
+
+
+async def put_stream(
+    container: str,
+    name: str,
+    reader,
+    *,
+    content_type: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    block_size: int = 4 * 1024 * 1024,
+    max_concurrency: int = 2,
+) -> dict:
+    """
+    Upload streaming ke block blob: `await reader.read(n)` per chunk → stage_block,
+    lalu commit_block_list sekali di akhir. Memori puncak ≈ (max_concurrency + 1) × block_size.
+    Size & SHA-256 dihitung sambil jalan (sha256 disimpan sebagai metadata blob, informatif saja).
+    Lewat `max_bytes` → UploadTooLargeError saat chunk itu terbaca (blok tidak pernah di-commit).
+    Catatan: untuk UploadFile FastAPI, Starlette sudah menerima seluruh body multipart ke
+    SpooledTemporaryFile (RAM kecil, sisanya disk) sebelum handler jalan — di sini hanya file temp
+    itu yang dibaca ulang, dan batas ukuran baru berlaku setelah upload client selesai.
+    Return {"blob_name", "size", "sha256"}.
+    """
+    await blob_aio.ensure_container(container)
+    bc = blob_aio.client().get_blob_client(container, name)
+    sha = hashlib.sha256()
+    size = 0
+    blocks: list = []
+    inflight: set = set()
+
+    try:
+        while True:
+            chunk = await reader.read(block_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise UploadTooLargeError(name, max_bytes)
+            sha.update(chunk)
+            block_id = base64.b64encode(f"{len(blocks):08d}".encode()).decode()
+            blocks.append(BlobBlock(block_id=block_id))
+            if len(inflight) >= max_concurrency:
+                done, inflight = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    t.result()
+            inflight.add(asyncio.create_task(bc.stage_block(block_id, chunk)))
+        if inflight:
+            await asyncio.gather(*inflight)
+            inflight = set()
+    finally:
+        for t in inflight:
+            t.cancel()
+
+    digest = sha.hexdigest()
+    await bc.commit_block_list(
+        blocks,
+        content_settings=ContentSettings(content_type=content_type) if content_type else None,
+        metadata={"sha256": digest},
+    )
+    return {"blob_name": name, "size": size, "sha256": digest}
+
+
 # ----------------------------- SAS makers ------------------------------
 def _expiry(minutes: Optional[int]) -> dt.datetime:
     if minutes is None:
@@ -106,6 +179,7 @@ def generate_blob_sas_url(
     name: str,
     *,
     minutes: Optional[int] = None,
+    permission: Optional[BlobSasPermissions] = None,
 ) -> str:
     if not _AZ_KEY:
         raise RuntimeError("AZURE_STORAGE_ACCOUNT_KEY tidak tersedia untuk generate SAS.")
@@ -114,7 +188,7 @@ def generate_blob_sas_url(
         container_name=container,
         blob_name=name,
         account_key=_AZ_KEY,
-        permission=BlobSasPermissions(read=True),
+        permission=permission or BlobSasPermissions(read=True),
         expiry=_expiry(minutes),
     )
     encoded_path = quote(name, safe="/-_.()")
@@ -139,14 +213,23 @@ def generate_container_sas_url(
     return f"https://{_ACCOUNT_NAME}.blob.core.windows.net/{container}?{sas}"
 
 def clear_prefix(container: str, prefix: str) -> int:
-    """Hapus semua blob di container yang diawali prefix. Return jumlah yang dihapus."""
-    bsc = BlobServiceClient.from_connection_string(_AZ_CONN_STR)
-    cont = bsc.get_container_client(container)
+    """Hapus semua blob di container yang diawali prefix. Return jumlah yang dihapus.
+    Shim sync (client bersama, Blob Batch 256/permintaan); kode async pakai blob_aio.delete_prefix."""
+    cont = _blob.get_container_client(container)
+    names = [b.name for b in cont.list_blobs(name_starts_with=prefix)]
     n = 0
-    for blob in cont.list_blobs(name_starts_with=prefix):
-        # kalau ada snapshot, aman-kan:
-        cont.delete_blob(blob.name, delete_snapshots="include")
-        n += 1
+    for i in range(0, len(names), 256):
+        chunk = names[i:i + 256]
+        try:
+            for r in cont.delete_blobs(*chunk, delete_snapshots="include", raise_on_any_failure=False):
+                n += 200 <= r.status_code < 300
+        except Exception:
+            for name in chunk:  # batch tidak didukung → satu-satu
+                try:
+                    cont.delete_blob(name, delete_snapshots="include")
+                    n += 1
+                except Exception:
+                    pass
     return n
 
 # ---------------- upload wrapper (kompat lama) -------------------------
@@ -183,6 +266,10 @@ async def upload_bytes_with_prefix(*args, **kwargs):
     prefix = (prefix or "").strip().strip("/")
     blob_name = f"{prefix}/{filename}" if prefix else filename
 
-    put_bytes(container, blob_name, data, content_type=content_type)
+    await blob_aio.put_bytes(container, blob_name, data, content_type=content_type)
     sas_url = generate_blob_sas_url(container, blob_name)
     return sas_url, blob_name
+
+
+# blob_aio meng-import helper ENV/SAS dari modul ini → import di akhir modul (setelah semua definisi)
+from app.services import blob_aio  # noqa: E402
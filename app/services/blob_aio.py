@@ -0,0 +1,269 @@
+# app/services/blob_aio.py
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Tuple, Union
+
+import aiohttp
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob import ContentSettings
+from azure.storage.blob.aio import BlobServiceClient
+
+from app.services.blob import _ACCOUNT_NAME, _AZ_CONN_STR, _AZ_KEY, generate_blob_sas_url
+from app.services.http import close_stale
+
+# Satu BlobServiceClient async bersama (per event loop) dengan pool koneksi aiohttp sendiri.
+# Semua kode async (API & worker) pakai modul ini; app.services.blob tinggal SAS + shim sync.
+BLOB_POOL_SIZE = int(os.getenv("BLOB_POOL_SIZE", "64"))
+BLOB_CHUNK_SIZE = int(os.getenv("BLOB_CHUNK_SIZE_MB", "4")) * 1024 * 1024
+BLOB_SPILL_BYTES = int(os.getenv("BLOB_SPILL_MB", "16")) * 1024 * 1024   # di atas ini → file temp di disk
+BLOB_RANGE_PARALLEL = int(os.getenv("BLOB_RANGE_PARALLEL", "4"))        # range GET paralel per blob
+DELETE_BATCH_SIZE = 256  # batas Blob Batch API per permintaan
+DELETE_BATCH_PARALLEL = int(os.getenv("BLOB_DELETE_PARALLEL", "4"))
+
+_client: Optional[BlobServiceClient] = None
+_session: Optional[aiohttp.ClientSession] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_ready_containers: set = set()
+
+
+def client() -> BlobServiceClient:
+    global _client, _session, _loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _loop is not loop:
+        if _client is not None:
+            close_stale(_close_pair(_client, _session), _loop)
+        _session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=BLOB_POOL_SIZE))
+        transport = AioHttpTransport(session=_session, session_owner=False)
+        opts = dict(transport=transport, max_single_get_size=BLOB_CHUNK_SIZE, max_chunk_get_size=BLOB_CHUNK_SIZE)
+        if _AZ_CONN_STR:
+            _client = BlobServiceClient.from_connection_string(_AZ_CONN_STR, **opts)
+        else:
+            _client = BlobServiceClient(
+                account_url=f"https://{_ACCOUNT_NAME}.blob.core.windows.net",
+                credential=_AZ_KEY,
+                **opts,
+            )
+        _loop = loop
+        _ready_containers.clear()
+    return _client
+
+
+async def _close_pair(c: Optional[BlobServiceClient], s: Optional[aiohttp.ClientSession]) -> None:
+    if c is not None:
+        try:
+            await c.close()
+        except Exception:
+            pass
+    if s is not None and not s.closed:
+        await s.close()
+
+
+async def close() -> None:
+    global _client, _session, _loop
+    c, s = _client, _session
+    _client = _session = _loop = None
+    await _close_pair(c, s)
+
+
+async def ensure_container(name: str) -> None:
+    if name in _ready_containers:
+        return
+    try:
+        await client().create_container(name)
+    except ResourceExistsError:
+        pass
+    except Exception:
+        return  # tidak fatal; operasi berikutnya yang akan gagal dengan pesan jelas
+    _ready_containers.add(name)
+
+
+# ----------------------------- read / write -----------------------------
+async def put_bytes(
+    container: str,
+    name: str,
+    data: Union[bytes, BinaryIO],
+    *,
+    content_type: Optional[str] = None,
+    metadata: Optional[Dict[str, str]] = None,
+    max_concurrency: int = 4,
+) -> str:
+    await ensure_container(container)
+    await client().get_blob_client(container, name).upload_blob(
+        data,
+        overwrite=True,
+        content_settings=ContentSettings(content_type=content_type) if content_type else None,
+        metadata=metadata,
+        max_concurrency=max_concurrency,
+    )
+    return name
+
+
+async def get_bytes(container: str, name: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """(data, content_type); (None, None) kalau blob tidak ada."""
+    try:
+        dl = await client().get_blob_client(container, name).download_blob(max_concurrency=4)
+        data = await dl.readall()
+    except ResourceNotFoundError:
+        return None, None
+    return data, dl.properties.content_settings.content_type
+
+
+async def open_spooled(
+    container: str,
+    name: str,
+    *,
+    spill_bytes: int = BLOB_SPILL_BYTES,
+    parallel: int = BLOB_RANGE_PARALLEL,
+) -> Tuple[Optional[BinaryIO], Optional[dict]]:
+    """
+    Download ke SpooledTemporaryFile (RAM ≤ spill_bytes, sisanya di disk), posisi 0.
+    Blob > 1 chunk di-download dengan range GET paralel (`parallel`) langsung ke file.
+    Return (file, {"size", "content_type", "metadata"}) atau (None, None) kalau tidak ada.
+    Caller wajib close() file-nya.
+    """
+    try:
+        dl = await client().get_blob_client(container, name).download_blob(max_concurrency=max(1, parallel))
+    except ResourceNotFoundError:
+        return None, None
+    fp = SpooledTemporaryFile(max_size=spill_bytes)
+    try:
+        await dl.readinto(fp)
+    except BaseException:
+        fp.close()
+        raise
+    fp.seek(0)
+    p = dl.properties
+    return fp, {
+        "size": p.size,
+        "content_type": p.content_settings.content_type if p.content_settings else None,
+        "metadata": dict(p.metadata or {}),
+    }
+
+
+async def stream(container: str, name: str) -> AsyncIterator[bytes]:
+    """Iterasi isi blob per chunk (BLOB_CHUNK_SIZE_MB) tanpa menampung seluruh file."""
+    dl = await client().get_blob_client(container, name).download_blob()
+    async for chunk in dl.chunks():
+        yield chunk
+
+
+async def properties(container: str, name: str) -> Optional[dict]:
+    try:
+        p = await client().get_blob_client(container, name).get_blob_properties()
+    except ResourceNotFoundError:
+        return None
+    return {
+        "size": p.size,
+        "content_type": p.content_settings.content_type if p.content_settings else None,
+        "metadata": dict(p.metadata or {}),
+        "etag": p.etag,
+        "last_modified": p.last_modified,
+    }
+
+
+async def set_metadata(container: str, name: str, metadata: Dict[str, str]) -> None:
+    await client().get_blob_client(container, name).set_blob_metadata(metadata)
+
+
+# ----------------------------- listing / delete -------------------------
+async def list_blobs(container: str, prefix: str, *, metadata: bool = False) -> List:
+    cc = client().get_container_client(container)
+    include = ["metadata"] if metadata else None
+    return [b async for b in cc.list_blobs(name_starts_with=prefix, include=include)]
+
+
+async def delete_blob(container: str, name: str) -> bool:
+    try:
+        await client().get_blob_client(container, name).delete_blob(delete_snapshots="include")
+        return True
+    except ResourceNotFoundError:
+        return False
+
+
+async def delete_prefix(
+    container: str,
+    prefix: str,
+    *,
+    batch_size: int = DELETE_BATCH_SIZE,
+    concurrency: int = DELETE_BATCH_PARALLEL,
+) -> dict:
+    """
+    Hapus semua blob berawalan `prefix` dengan Blob Batch (`delete_blobs`, maks 256/permintaan),
+    beberapa batch jalan paralel. Batch yang ditolak service (mis. akun HNS) → fallback hapus satu-satu.
+    Return {"listed", "deleted", "missing", "failed", "batches", "ms"}.
+    """
+    t0 = time.perf_counter()
+    cc = client().get_container_client(container)
+    names = [b.name async for b in cc.list_blobs(name_starts_with=prefix)]
+    step = max(1, min(batch_size, DELETE_BATCH_SIZE))
+    chunks = [names[i:i + step] for i in range(0, len(names), step)]
+    sem = asyncio.Semaphore(max(1, concurrency))
+    stats = {"listed": len(names), "deleted": 0, "missing": 0, "failed": 0, "batches": len(chunks)}
+
+    async def _batch(chunk: List[str]) -> None:
+        async with sem:
+            try:
+                responses = await cc.delete_blobs(*chunk, delete_snapshots="include", raise_on_any_failure=False)
+                async for r in responses:
+                    _count(stats, r.status_code)
+                return
+            except Exception:
+                pass
+            for n in chunk:
+                try:
+                    stats["deleted" if await delete_blob(container, n) else "missing"] += 1
+                except Exception:
+                    stats["failed"] += 1
+
+    await asyncio.gather(*(_batch(c) for c in chunks))
+    stats["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return stats
+
+
+def _count(stats: dict, status: int) -> None:
+    if 200 <= status < 300:
+        stats["deleted"] += 1
+    elif status == 404:
+        stats["missing"] += 1
+    else:
+        stats["failed"] += 1
+
+
+# ----------------------------- copy ------------------------------------
+async def copy(
+    src_container: str,
+    src_name: str,
+    dst_container: str,
+    dst_name: str,
+    *,
+    metadata: Optional[Dict[str, str]] = None,
+    timeout_s: float = 120.0,
+    overwrite: bool = True,
+) -> str:
+    """
+    Copy server-side (akun yang sama) tanpa download/upload lewat proses ini.
+    Tunggu sampai copy status 'success'. Return dst_name.
+    overwrite=False → tujuan yang sudah ada tidak ditimpa (ResourceExistsError / ResourceModifiedError).
+    """
+    await ensure_container(dst_container)
+    src_url = generate_blob_sas_url(src_container, src_name, minutes=60)
+    dst = client().get_blob_client(dst_container, dst_name)
+    cond = {} if overwrite else {"etag": "*", "match_condition": MatchConditions.IfMissing}
+    props = await dst.start_copy_from_url(src_url, metadata=metadata, **cond)
+    status = (props or {}).get("copy_status")
+    deadline = time.monotonic() + timeout_s
+    while status == "pending":
+        if time.monotonic() > deadline:
+            await dst.abort_copy(props.get("copy_id"))
+            raise TimeoutError(f"Copy {src_name} -> {dst_name} timeout")
+        await asyncio.sleep(0.5)
+        status = (await dst.get_blob_properties()).copy.status
+    if status != "success":
+        raise RuntimeError(f"Copy {src_name} -> {dst_name} failed: {status}")
+    return dst_name
@@ -0,0 +1,202 @@
+# app/services/direct_upload.py
+from __future__ import annotations
+
+import os
+import time
+from typing import List, Optional
+from uuid import uuid4
+
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+from azure.storage.blob import BlobSasPermissions
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import Job
+from . import blob_aio
+from .blob import generate_blob_sas_url
+from .path_sanitize import sanitize_blob_path
+from .queue import enqueue_job
+
+# Upload 2 fase: init (job UPLOADING + SAS write-only) → client PUT block langsung ke storage
+# → finalize (verifikasi blob, job QUEUED, enqueue). API tidak menyentuh byte file sama sekali.
+# SAS hanya untuk blob staging (uploads/...); finalize meng-copy server-side ke path job dan
+# semua cek dilakukan pada salinan itu → client tidak bisa mengubah input setelah finalize.
+UPLOAD_SAS_MINUTES = int(os.getenv("UPLOAD_SAS_MINUTES", "30"))
+UPLOAD_STAGING_PREFIX = "uploads/"
+UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE_MB", "8")) * 1024 * 1024
+# job UPLOADING yang tidak pernah di-finalize → FAILED + blob staging dihapus (default: 2× umur SAS)
+UPLOAD_EXPIRE_MINUTES = int(os.getenv("UPLOAD_EXPIRE_MINUTES", str(UPLOAD_SAS_MINUTES * 2)))
+UPLOAD_EXPIRED = "Upload expired (not finalized)"
+
+
+class DirectUploadError(RuntimeError):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def input_blob_path(job_id: str, filename: Optional[str]) -> str:
+    """jobs/<job_id>/input/<filename tersanitasi> (fallback 'file')."""
+    prefix = f"jobs/{job_id}/input"
+    path = sanitize_blob_path(f"{prefix}/{filename or 'file'}")
+    if not path or not path.startswith(prefix):
+        path = sanitize_blob_path(f"{prefix}/file")
+    return path
+
+
+def staging_blob_path(blob_name: str) -> str:
+    """Blob yang boleh ditulis client (SAS) untuk input `blob_name`: uploads/jobs/<job_id>/input/<file>."""
+    return f"{UPLOAD_STAGING_PREFIX}{blob_name}"
+
+
+async def _discard(*names: str) -> None:
+    for name in names:
+        try:
+            await blob_aio.delete_blob(settings.AZURE_INPUT_CONTAINER, name)
+        except Exception:
+            pass
+
+
+async def init_direct_upload(
+    session: AsyncSession,
+    *,
+    filename: str,
+    size: Optional[int],
+    source_lang: str,
+    targets: List[str],
+    user_id: Optional[str],
+    max_bytes: int,
+) -> dict:
+    if size is not None and size > max_bytes:
+        raise DirectUploadError(413, f"File too large: {filename}")
+
+    group_ids = [str(uuid4()) for _ in targets]
+    blob_name = input_blob_path(group_ids[0], filename)
+    upload_url = generate_blob_sas_url(
+        settings.AZURE_INPUT_CONTAINER, staging_blob_path(blob_name),
+        minutes=UPLOAD_SAS_MINUTES,
+        permission=BlobSasPermissions(create=True, write=True),
+    )
+
+    now = int(time.time())
+    for jid, tgt in zip(group_ids, targets):
+        session.add(Job(
+            id=jid,
+            filename=filename,
+            status="UPLOADING",
+            detail="",
+            batch_id="",
+            result_blob=blob_name,
+            source_lang=source_lang or "auto",
+            target_lang=tgt,
+            user_id=user_id or None,
+            upload_group=group_ids[0],
+            created_at=now,
+            updated_at=now,
+        ))
+    await session.commit()
+
+    return {
+        "job_id": group_ids[0],
+        "job_ids": group_ids,
+        "blob_name": blob_name,
+        "upload_url": upload_url,
+        "block_size": UPLOAD_BLOCK_SIZE,
+        "max_bytes": max_bytes,
+        "expires_in": UPLOAD_SAS_MINUTES * 60,
+        "target_langs": targets,
+        "status": "UPLOADING",
+    }
+
+
+async def finalize_direct_upload(
+    session: AsyncSession,
+    job_id: str,
+    *,
+    max_bytes: int,
+    user_id: Optional[str] = None,
+) -> dict:
+    job = await session.get(Job, job_id)
+    if not job:
+        raise DirectUploadError(404, "Job not found")
+    if user_id and job.user_id and job.user_id != user_id:
+        raise DirectUploadError(403, "Job belongs to another user")
+
+    res = await session.execute(select(Job.id).where(or_(
+        Job.upload_group == (job.upload_group or job.id), Job.id == job.id,
+    )))
+    group_ids = sorted(res.scalars(), key=lambda x: x != job_id)
+    out = {"job_id": job_id, "job_ids": group_ids, "check_status": f"/jobs/{job_id}"}
+    if job.status != "UPLOADING":
+        return {**out, "status": job.status}  # finalize ulang → idempotent
+
+    container = settings.AZURE_INPUT_CONTAINER
+    staging = staging_blob_path(job.result_blob)
+    props = await blob_aio.properties(container, staging)
+    if props is None:
+        raise DirectUploadError(409, "Upload not committed yet (Put Block List missing)")
+    size = props["size"] or 0
+    if 0 < size <= max_bytes:
+        # snapshot: salinan di path job (tidak tercakup SAS client) yang dibaca worker; finalize
+        # bersamaan tidak menimpa salinan yang sudah ada
+        try:
+            await blob_aio.copy(container, staging, container, job.result_blob, overwrite=False)
+        except (ResourceExistsError, ResourceModifiedError):
+            pass
+        props = await blob_aio.properties(container, job.result_blob)
+        size = (props or {}).get("size") or 0
+    if size <= 0 or size > max_bytes:
+        detail = "Empty file" if size <= 0 else f"File too large: {job.filename}"
+        await _discard(staging, job.result_blob)
+        await session.execute(
+            update(Job).where(Job.id.in_(group_ids))
+            .values(status="FAILED", detail=detail, updated_at=int(time.time()))
+        )
+        await session.commit()
+        raise DirectUploadError(400 if size <= 0 else 413, detail)
+
+    # hanya satu finalize yang menang (UPDATE bersyarat) → pesan tidak pernah dobel
+    upd = await session.execute(
+        update(Job)
+        .where(Job.id.in_(group_ids), Job.status == "UPLOADING")
+        .values(status="QUEUED", updated_at=int(time.time()))
+    )
+    await session.commit()
+    await _discard(staging)
+    if upd.rowcount:
+        await enqueue_job(
+            {"job_id": job_id, "job_ids": group_ids} if len(group_ids) > 1 else {"job_id": job_id},
+            visibility_timeout=5,
+        )
+    return {**out, "status": "QUEUED", "size": size}
+
+
+async def expire_direct_uploads(session: AsyncSession, *, max_age_s: Optional[int] = None) -> int:
+    """
+    Sweep job UPLOADING yang client-nya tidak pernah memanggil finalize (lebih tua dari
+    UPLOAD_EXPIRE_MINUTES): status → FAILED, blob staging (dan salinan input, kalau ada) dihapus.
+    Return jumlah job yang di-expire.
+    """
+    cutoff = int(time.time()) - (UPLOAD_EXPIRE_MINUTES * 60 if max_age_s is None else max_age_s)
+    res = await session.execute(
+        select(Job.id, Job.result_blob).where(Job.status == "UPLOADING", Job.created_at < cutoff)
+    )
+    ids = [r.id for r in res.all()]
+    if not ids:
+        return 0
+    # UPDATE bersyarat: finalize yang menang duluan (QUEUED) tidak ikut di-expire, blob-nya tidak disentuh
+    await session.execute(
+        update(Job)
+        .where(Job.id.in_(ids), Job.status == "UPLOADING")
+        .values(status="FAILED", detail=UPLOAD_EXPIRED, updated_at=int(time.time()))
+    )
+    await session.commit()
+    res = await session.execute(
+        select(Job.id, Job.result_blob).where(Job.id.in_(ids), Job.status == "FAILED", Job.detail == UPLOAD_EXPIRED)
+    )
+    expired = res.all()
+    for blob_name in {r.result_blob for r in expired if r.result_blob}:
+        await _discard(staging_blob_path(blob_name), blob_name)
+    return len(expired)
@@ -0,0 +1,186 @@
+# app/services/font_policy.py
+"""
+Kebijakan font per bahasa target × slot script × jenis dokumen, dipakai font pass (ooxml_fonts).
+- slot: latin (w:ascii/w:hAnsi, a:latin), ea (w:eastAsia, a:ea), cs (w:cs, a:cs); None → slot dibiarkan
+- `lang`: tag bahasa untuk segmen script target saat run campuran dipecah (split=True)
+- override lewat JSON (FONT_POLICY_FILE) dengan struktur yang sama dengan DEFAULT_POLICY
+Tabel di-compile sekali saat import; resolve() hanya lookup dict.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger("worker.font_policy")
+
+DOC_TYPES = ("docx", "pptx", "xlsx")
+
+DEFAULT_POLICY: dict = {
+    "languages": {
+        "*": {"latin": "Calibri"},
+        "ja": {"latin": "Calibri", "ea": "Meiryo UI", "lang": "ja-JP", "split": True},
+        "zh-hans": {"latin": "Calibri", "ea": "Microsoft YaHei", "lang": "zh-CN", "split": True},
+        "zh-hant": {"latin": "Calibri", "ea": "Microsoft JhengHei", "lang": "zh-TW", "split": True},
+        "ko": {"latin": "Calibri", "ea": "Malgun Gothic", "lang": "ko-KR", "split": True},
+        "ar": {"latin": "Calibri", "cs": "Arial", "lang": "ar-SA", "split": True},
+        "fa": {"latin": "Calibri", "cs": "Arial", "lang": "fa-IR", "split": True},
+        "ur": {"latin": "Calibri", "cs": "Arial", "lang": "ur-PK", "split": True},
+        "he": {"latin": "Calibri", "cs": "Arial", "lang": "he-IL", "split": True},
+        "th": {"latin": "Calibri", "cs": "Leelawadee UI", "lang": "th-TH", "split": True},
+        "hi": {"latin": "Calibri", "cs": "Nirmala UI", "lang": "hi-IN", "split": True},
+        "bn": {"latin": "Calibri", "cs": "Nirmala UI", "lang": "bn-IN", "split": True},
+        "ta": {"latin": "Calibri", "cs": "Nirmala UI", "lang": "ta-IN", "split": True},
+    },
+    "aliases": {
+        "jp": "ja",
+        "zh": "zh-hans", "zh-cn": "zh-hans", "zh-sg": "zh-hans", "zh-chs": "zh-hans",
+        "zh-tw": "zh-hant", "zh-hk": "zh-hant", "zh-mo": "zh-hant", "zh-cht": "zh-hant",
+        "iw": "he",
+    },
+    # override per jenis dokumen: {"docx": {"ja": {"ea": "..."}}, "pptx": {"*": {...}}}
+    "doc_types": {},
+}
+
+# Segmen non-target (Latin) saat run campuran dipecah
+LATIN_LANG = os.getenv("FONT_POLICY_LATIN_LANG", "en-US")
+
+
+class FontSpec(NamedTuple):
+    latin: Optional[str]
+    ea: Optional[str]
+    cs: Optional[str]
+    lang: Optional[str] = None
+    split: bool = False
+
+    @property
+    def script(self) -> str:
+        """Script target: 'ea' / 'cs' / 'latin' (menentukan tag lang segmen saat split)."""
+        return "ea" if self.ea else "cs" if self.cs else "latin"
+
+    @property
+    def primary(self) -> str:
+        """Satu font untuk jalur yang hanya kenal satu typeface (fallback object model)."""
+        return self.ea or self.cs or self.latin or "Calibri"
+
+    @classmethod
+    def uniform(cls, font: str) -> "FontSpec":
+        return cls(font, font, font)
+
+
+# ----------------------------- script → segmen -----------------------------
+_EA_RANGES = (
+    "\u1100-\u11ff\u2e80-\u2fdf\u2ff0-\u303f\u3040-\u30ff\u3100-\u31ff\u3200-\u4dbf"
+    "\u4e00-\u9fff\ua960-\ua97f\uac00-\ud7ff\uf900-\ufaff\ufe30-\ufe4f\uff00-\uffef"
+    "\U00020000-\U0003134f"
+)
+_CS_RANGES = "\u0590-\u08ff\u0900-\u0dff\u0e00-\u0e7f\ufb1d-\ufdff\ufe70-\ufefc"
+# netral: ikut segmen di sebelahnya supaya spasi/angka/tanda baca tidak memecah run
+_NEUTRAL = r"\s\d!-/:-@\[-`{-~\u00a0-\u00bf\u2000-\u206f"
+_SEGMENT_RX = re.compile(rf"[{_EA_RANGES}]+|[{_CS_RANGES}]+|[^{_EA_RANGES}{_CS_RANGES}]+")
+_EA_RX = re.compile(rf"[{_EA_RANGES}]")
+_CS_RX = re.compile(rf"[{_CS_RANGES}]")
+_NEUTRAL_ONLY_RX = re.compile(rf"[{_NEUTRAL}]*")
+
+
+def _script_of(seg: str) -> Optional[str]:
+    if _EA_RX.match(seg):
+        return "ea"
+    if _CS_RX.match(seg):
+        return "cs"
+    return None if _NEUTRAL_ONLY_RX.fullmatch(seg) else "latin"
+
+
+def split_scripts(text: str) -> list:
+    """
+    "Hello 世界 2024" → [("latin", "Hello "), ("ea", "世界 2024")]. Segmen netral (spasi, angka,
+    tanda baca) menempel ke segmen sebelumnya (atau sesudahnya kalau di awal).
+    """
+    out: list = []
+    lead = ""
+    for m in _SEGMENT_RX.finditer(text):
+        seg = m.group(0)
+        script = _script_of(seg)
+        if script is None or (out and out[-1][0] == script):
+            if out:
+                out[-1] = (out[-1][0], out[-1][1] + seg)
+            else:
+                lead += seg
+            continue
+        out.append((script, lead + seg))
+        lead = ""
+    if lead:
+        out.append(("latin", lead))
+    return out
+
+
+def is_mixed(text: str) -> bool:
+    return bool(_EA_RX.search(text) or _CS_RX.search(text)) and len(split_scripts(text)) > 1
+
+
+# ----------------------------- compile -----------------------------
+def _load_policy() -> dict:
+    policy = json.loads(json.dumps(DEFAULT_POLICY))
+    path = os.getenv("FONT_POLICY_FILE", "")
+    if not path:
+        return policy
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            override = json.load(f)
+    except Exception as e:
+        logger.warning("font_policy_load_error", extra={"path": path, "error": str(e)})
+        return policy
+    for key in ("languages", "aliases"):
+        for k, v in (override.get(key) or {}).items():
+            if key == "languages" and isinstance(v, dict):
+                policy[key].setdefault(k.lower(), {}).update(v)
+            else:
+                policy[key][k.lower()] = v
+    for doc, langs in (override.get("doc_types") or {}).items():
+        for k, v in (langs or {}).items():
+            policy["doc_types"].setdefault(doc.lower(), {}).setdefault(k.lower(), {}).update(v)
+    return policy
+
+
+def _compile(policy: dict) -> Tuple[Dict[Tuple[str, str], FontSpec], Dict[str, str]]:
+    langs = {k.lower(): v for k, v in policy["languages"].items()}
+    doc_types = policy.get("doc_types") or {}
+    table: Dict[Tuple[str, str], FontSpec] = {}
+    for lang in set(langs) | {k for d in doc_types.values() for k in d}:
+        for doc in DOC_TYPES:
+            merged: dict = {}
+            for layer in (
+                langs.get("*"), langs.get(lang),
+                doc_types.get(doc, {}).get("*"), doc_types.get(doc, {}).get(lang),
+            ):
+                merged.update(layer or {})
+            table[(lang, doc)] = FontSpec(
+                merged.get("latin"), merged.get("ea"), merged.get("cs"),
+                merged.get("lang"), bool(merged.get("split")),
+            )
+    return table, {k.lower(): v.lower() for k, v in (policy.get("aliases") or {}).items()}
+
+
+_POLICY = _load_policy()
+_TABLE, _ALIASES = _compile(_POLICY)
+POLICY_FINGERPRINT = hashlib.sha1(json.dumps(_POLICY, sort_keys=True).encode()).hexdigest()[:8]
+
+
+@lru_cache(maxsize=512)
+def resolve(target_lang: str, doc_type: str = "docx") -> FontSpec:
+    """Bahasa (BCP-47 longgar: 'zh-Hant-TW', 'ja_JP', 'JP') + jenis dokumen → FontSpec."""
+    doc = doc_type if doc_type in DOC_TYPES else "docx"
+    tag = (target_lang or "").strip().lower().replace("_", "-")
+    parts = tag.split("-") if tag else []
+    while parts:
+        key = "-".join(parts)
+        key = _ALIASES.get(key, key)
+        spec = _TABLE.get((key, doc))
+        if spec is not None:
+            return spec
+        parts.pop()
+    return _TABLE[("*", doc)]
@@ -101,8 +101,6 @@ async def auto_glossary_pairs_from_text(
     Gunakan Azure OpenAI untuk ekstraksi istilah → target (default EN).
     Aman bila ENV tidak di-set; akan mengembalikan [].
     """
-    import httpx
-
     _AZ_OAI_KEY = os.getenv("AZURE_OPENAI_API_KEY")
     _AZ_OAI_BASE = (
         os.getenv("AZURE_OPENAI_ENDPOINT")
@@ -126,25 +124,26 @@ async def auto_glossary_pairs_from_text(
         "Avoid currencies, stock tickers, numbers, dates, or items that should remain untranslated."
     )
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        url = f"{_AZ_OAI_BASE}/openai/deployments/{_AZ_OAI_DEPLOYMENT}/chat/completions?api-version={_AZ_OAI_API_VERSION}"
-        headers = {"api-key": _AZ_OAI_KEY, "Content-Type": "application/json"}
-        payload = {
-            "messages": [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": (sample_text or "")[:8000]},
-            ],
-            "temperature": 0.2,
-            "max_tokens": 1000,
-        }
-        r = await client.post(url, headers=headers, json=payload)
-        r.raise_for_status()
-        data = r.json()
-        content = data["choices"][0]["message"]["content"]
-        try:
-            arr = json.loads(content)
-        except Exception:
-            return []
+    from .http import httpx_clients
+
+    url = f"{_AZ_OAI_BASE}/openai/deployments/{_AZ_OAI_DEPLOYMENT}/chat/completions?api-version={_AZ_OAI_API_VERSION}"
+    headers = {"api-key": _AZ_OAI_KEY, "Content-Type": "application/json"}
+    payload = {
+        "messages": [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": (sample_text or "")[:8000]},
+        ],
+        "temperature": 0.2,
+        "max_tokens": 1000,
+    }
+    r = await httpx_clients.get("openai").post(url, headers=headers, json=payload, timeout=timeout)
+    r.raise_for_status()
+    data = r.json()
+    content = data["choices"][0]["message"]["content"]
+    try:
+        arr = json.loads(content)
+    except Exception:
+        return []
 
     pairs: list[tuple[str, str]] = []
     for it in arr:
@@ -235,12 +234,21 @@ def _to_tsv(pairs: list[Tuple[str, str]]) -> bytes:
         rows.append(f"{s}\t{t}")
     return ("\n".join(rows)).encode("utf-8")
 
+GLOSSARY_VERSION = "1"
+
+def glossary_fingerprint(source_lang: str, target_lang: str) -> str:
+    """Hash bagian statis glossary (+ versi prompt) untuk key cache hasil terjemahan."""
+    import hashlib
+    h = hashlib.sha256(GLOSSARY_VERSION.encode())
+    h.update(_to_tsv(_always_pairs(source_lang, target_lang)))
+    return h.hexdigest()[:16]
+
 async def build_auto_pairs_with_openai(sample_text: str, target_lang: str) -> list[Tuple[str, str]]:
     """
     Versi lain (langsung target_lang), kompatibel dengan compose_glossary_tsv().
     Mengembalikan (source, target) sesuai target_lang. Jika OpenAI tidak tersedia -> [].
     """
-    import httpx
+    from .http import httpx_clients
 
     api_key = os.getenv("AZURE_OPENAI_API_KEY")
     base = os.getenv("AZURE_OPENAI_ENDPOINT") or os.getenv("AZURE_OPENAI_BASE") or os.getenv("AZURE_OPENAI_API_BASE")
@@ -256,23 +264,23 @@ async def build_auto_pairs_with_openai(sample_text: str, target_lang: str) -> li
         "Avoid currencies/tickers/numbers/dates."
     )
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        url = f"{base}/openai/deployments/{dep}/chat/completions?api-version={ver}"
-        r = await client.post(url, headers={"api-key": api_key, "Content-Type": "application/json"}, json={
-            "messages": [
-                {"role":"system","content": prompt},
-                {"role":"user","content": (sample_text or "")[:8000]}
-            ],
-            "temperature": 0.2,
-            "max_tokens": 1000
-        })
-        r.raise_for_status()
-        data = r.json()
-        content = data["choices"][0]["message"]["content"]
-        try:
-            arr = json.loads(content)
-        except Exception:
-            return []
+    # client OpenAI bersama (keep-alive) — bukan AsyncClient baru per panggilan
+    url = f"{base}/openai/deployments/{dep}/chat/completions?api-version={ver}"
+    r = await httpx_clients.get("openai").post(url, headers={"api-key": api_key, "Content-Type": "application/json"}, json={
+        "messages": [
+            {"role":"system","content": prompt},
+            {"role":"user","content": (sample_text or "")[:8000]}
+        ],
+        "temperature": 0.2,
+        "max_tokens": 1000
+    }, timeout=30.0)
+    r.raise_for_status()
+    data = r.json()
+    content = data["choices"][0]["message"]["content"]
+    try:
+        arr = json.loads(content)
+    except Exception:
+        return []
 
     pairs: list[Tuple[str, str]] = []
     for it in arr:
@@ -282,23 +290,48 @@ async def build_auto_pairs_with_openai(sample_text: str, target_lang: str) -> li
             pairs.append((s, t))
     return pairs
 
-async def compose_glossary_tsv(
+async def compose_glossary(
     source_lang: str,
     target_lang: str,
-    sample_text: str = ""
-) -> bytes:
+    sample_text: str = "",
+    *,
+    cache=None,
+) -> Tuple[bytes, bool]:
     """
-    Selalu mengembalikan TSV glossary yang siap dipakai Document Translation (format="TSV"):
-      - base no-translate + kode umum
-      - indofix/jafix mapping (sesuai arah bahasa)
-      - + auto-pairs dari Azure OpenAI (jika tersedia)
+    Seperti compose_glossary_tsv, plus flag `complete`: False kalau auto-pairs (LLM/cache) gagal
+    dan glossary jatuh ke bagian statis saja — hasil terjemahan dengan glossary ini jangan di-cache.
     """
     base = _always_pairs(source_lang, target_lang)
     auto_extra: list[Tuple[str, str]] = []
+    complete = True
     try:
         if sample_text:
-            # Pakai versi target langsung (lebih akurat untuk bahasa non-EN)
-            auto_extra = await build_auto_pairs_with_openai(sample_text, target_lang)
+            cached = await cache.lookup(source_lang, target_lang, sample_text) if cache is not None else None
+            if cached is not None:
+                auto_extra = cached
+            else:
+                # Pakai versi target langsung (lebih akurat untuk bahasa non-EN)
+                auto_extra = await build_auto_pairs_with_openai(sample_text, target_lang)
+                if cache is not None:
+                    await cache.store(source_lang, target_lang, sample_text, auto_extra)
     except Exception:
         auto_extra = []
-    return _to_tsv(base + auto_extra)
+        complete = False
+    return _to_tsv(base + auto_extra), complete
+
+
+async def compose_glossary_tsv(
+    source_lang: str,
+    target_lang: str,
+    sample_text: str = "",
+    *,
+    cache=None,
+) -> bytes:
+    """
+    Selalu mengembalikan TSV glossary yang siap dipakai Document Translation (format="TSV"):
+      - base no-translate + kode umum
+      - indofix/jafix mapping (sesuai arah bahasa)
+      - + auto-pairs dari Azure OpenAI (jika tersedia)
+    `cache` (GlossaryCache, opsional): sampel mirip + pasangan bahasa sama → auto-pairs dari cache, LLM dilewati.
+    """
+    return (await compose_glossary(source_lang, target_lang, sample_text, cache=cache))[0]
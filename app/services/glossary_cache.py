@@ -0,0 +1,169 @@
+# app/services/glossary_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import delete, or_, select, update
+
+from app.db import AsyncSessionLocal
+from app.models import GlossaryCacheEntry
+
+logger = logging.getLogger("worker.glossary_cache")
+
+# Bagian sampel yang benar-benar dikirim ke LLM (lihat build_auto_pairs_with_openai)
+SAMPLE_CHARS = 8000
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+_TOKEN_RX = re.compile(r"[^\W\d_]+", re.UNICODE)
+_CJK_RX = re.compile(r"[぀-ヿ㐀-鿿가-힯]")
+
+
+def simhash(text: str) -> int:
+    """
+    SimHash 64 bit atas bigram kata (CJK: per karakter). Dokumen yang mirip
+    (mis. laporan mingguan versi baru) → hanya beberapa bit berbeda.
+    """
+    tokens: List[str] = []
+    for tok in _TOKEN_RX.findall((text or "")[:SAMPLE_CHARS].casefold()):
+        if _CJK_RX.search(tok):
+            tokens.extend(tok)
+        else:
+            tokens.append(tok)
+    feats = Counter(zip(tokens, tokens[1:])) if len(tokens) > 1 else Counter((t,) for t in tokens)
+    if not feats:
+        return 0
+    acc = [0] * 64
+    for feat, w in feats.items():
+        h = int.from_bytes(hashlib.blake2b("\x00".join(feat).encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(64):
+            acc[i] += w if (h >> i) & 1 else -w
+    return sum(1 << i for i in range(64) if acc[i] > 0)
+
+
+def _bands(h: int) -> List[int]:
+    mask = (1 << _BAND_BITS) - 1
+    return [(h >> (i * _BAND_BITS)) & mask for i in range(_BANDS)]
+
+
+class GlossaryCache:
+    """
+    Cache term pairs LLM di DB (tabel glossary_cache), key = (source, target) + SimHash sampel.
+    Hamming distance ≤ max_distance dianggap dokumen yang sama → LLM dilewati.
+    Dengan 4 band × 16 bit, kandidat dengan jarak ≤ 3 pasti berbagi minimal satu band (pigeonhole).
+    - lookup(src, tgt, sample) → pairs / None
+    - store(src, tgt, sample, pairs)
+    - sweep()                  → hapus entry lewat TTL, lalu yang paling lama tidak dipakai sampai ≤ max_entries
+    TTL dihitung dari created_at: entry yang sering kena hit tetap kedaluwarsa (sumber glossary /
+    logika fingerprint bisa berubah). last_hit hanya untuk trimming LRU.
+    """
+
+    def __init__(self, *, ttl_s: float = 30 * 86400, max_entries: int = 5000,
+                 max_distance: int = 3, enabled: bool = True):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_distance = min(max_distance, _BANDS - 1)
+        self.enabled = enabled
+        self.metrics: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "errors": 0, "evicted": 0}
+
+    def stats(self) -> dict:
+        total = self.metrics["hits"] + self.metrics["misses"]
+        return {**self.metrics, "hit_ratio": round(self.metrics["hits"] / total, 3) if total else 0.0}
+
+    async def lookup(self, source_lang: str, target_lang: str, sample_text: str) -> Optional[List[Tuple[str, str]]]:
+        if not self.enabled or not sample_text:
+            return None
+        try:
+            found = await self._lookup(_norm(source_lang), _norm(target_lang), simhash(sample_text))
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.warning("glossary_cache_lookup_error", extra={"error": str(e)})
+            found = None
+        self.metrics["hits" if found is not None else "misses"] += 1
+        return found
+
+    async def _lookup(self, src: str, tgt: str, h: int) -> Optional[List[Tuple[str, str]]]:
+        if not h:
+            return None
+        now = int(time.time())
+        bands = _bands(h)
+        async with AsyncSessionLocal() as session:
+            res = await session.execute(
+                select(GlossaryCacheEntry).where(
+                    GlossaryCacheEntry.source_lang == src,
+                    GlossaryCacheEntry.target_lang == tgt,
+                    GlossaryCacheEntry.created_at >= now - int(self.ttl_s),
+                    or_(*(getattr(GlossaryCacheEntry, f"band{i}") == b for i, b in enumerate(bands))),
+                )
+            )
+            best, best_d = None, self.max_distance + 1
+            for row in res.scalars():
+                d = bin(int(row.simhash, 16) ^ h).count("1")
+                if d < best_d:
+                    best, best_d = row, d
+            if best is None:
+                return None
+            await session.execute(
+                update(GlossaryCacheEntry).where(GlossaryCacheEntry.id == best.id)
+                .values(hits=GlossaryCacheEntry.hits + 1, last_hit=now)
+            )
+            await session.commit()
+            logger.info("glossary_cache_hit", extra={"source_lang": src, "target_lang": tgt, "distance": best_d})
+            return [(s, t) for s, t in json.loads(best.pairs_json or "[]")]
+
+    async def store(self, source_lang: str, target_lang: str, sample_text: str,
+                    pairs: List[Tuple[str, str]]) -> None:
+        if not self.enabled or not sample_text or not pairs:
+            return  # hasil kosong (LLM gagal/tidak dikonfigurasi) tidak di-cache
+        h = simhash(sample_text)
+        if not h:
+            return
+        now = int(time.time())
+        b = _bands(h)
+        try:
+            async with AsyncSessionLocal() as session:
+                session.add(GlossaryCacheEntry(
+                    id=uuid4().hex,
+                    source_lang=_norm(source_lang),
+                    target_lang=_norm(target_lang),
+                    simhash=f"{h:016x}",
+                    band0=b[0], band1=b[1], band2=b[2], band3=b[3],
+                    pairs_json=json.dumps([list(p) for p in pairs], ensure_ascii=False),
+                    hits=0,
+                    created_at=now,
+                    last_hit=now,
+                ))
+                await session.commit()
+            self.metrics["stores"] += 1
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.warning("glossary_cache_store_error", extra={"error": str(e)})
+
+    async def sweep(self) -> int:
+        if not self.enabled:
+            return 0
+        now = int(time.time())
+        async with AsyncSessionLocal() as session:
+            res = await session.execute(
+                delete(GlossaryCacheEntry).where(GlossaryCacheEntry.created_at < now - int(self.ttl_s))
+            )
+            n = res.rowcount or 0
+            keep = select(GlossaryCacheEntry.id).order_by(GlossaryCacheEntry.last_hit.desc()).limit(self.max_entries)
+            res = await session.execute(
+                delete(GlossaryCacheEntry).where(GlossaryCacheEntry.id.not_in(keep.scalar_subquery()))
+            )
+            n += res.rowcount or 0
+            await session.commit()
+        self.metrics["evicted"] += n
+        logger.info("glossary_cache_sweep", extra={"evicted": n})
+        return n
+
+
+def _norm(lang: str) -> str:
+    return (lang or "auto").lower()
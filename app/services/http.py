@@ -2,7 +2,12 @@
 http.py - Module untuk proyek
 """
 
+import asyncio
+import os
+from typing import Awaitable, Dict, Optional, Set, Tuple
+
 import aiohttp
+import httpx
 
 class HttpClient:
     def __init__(self):
@@ -22,3 +27,90 @@ class HttpClient:
             await self._session.close()
 
 http_client = HttpClient()
+
+
+# ---------- client milik event loop lama ----------
+_retiring: Set[asyncio.Future] = set()
+
+
+async def _quiet(aw: Awaitable) -> None:
+    try:
+        await aw
+    except Exception:
+        pass  # loop lama sudah tutup → transport tidak bisa ditutup bersih; yang penting client ditandai closed
+
+
+def close_stale(aw: Awaitable, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """
+    Jadwalkan penutupan client/session yang terikat ke event loop lama (mis. aclose()).
+    Loop lama masih jalan (thread lain) → ditutup di loop itu; sudah berhenti/tutup → di loop sekarang.
+    Tanpa ini socket bocor dan aiohttp memperingatkan "Unclosed client session".
+    """
+    if loop is not None and loop.is_running() and not loop.is_closed() and loop is not asyncio.get_running_loop():
+        asyncio.run_coroutine_threadsafe(_quiet(aw), loop)
+        return
+    t = asyncio.ensure_future(_quiet(aw))
+    _retiring.add(t)
+    t.add_done_callback(_retiring.discard)
+
+
+# ---------- httpx: client bersama per layanan (worker) ----------
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    _HTTP2 = os.getenv("HTTPX_HTTP2", "1") == "1"
+except ImportError:
+    _HTTP2 = False
+
+# Default per layanan: (timeout detik, max koneksi). Host lain dalam satu layanan tetap punya pool sendiri di httpx.
+_HTTPX_DEFAULTS: Dict[str, Tuple[float, int]] = {
+    "translator": (120.0, 32),
+    "graph": (120.0, 16),
+    "openai": (30.0, 16),
+    "blob": (30.0, 32),
+}
+
+
+class HttpxClients:
+    """
+    Registry httpx.AsyncClient long-lived per layanan (translator / graph / openai / blob):
+    keep-alive + HTTP/2 (kalau paket h2 ada) → handshake TLS cukup sekali per host, bukan per job.
+    Client terikat ke event loop yang membuatnya (sama seperti blob_aio); aclose() saat shutdown.
+    """
+
+    def __init__(self, keepalive_s: float = float(os.getenv("HTTPX_KEEPALIVE_S", "90"))):
+        self.keepalive_s = keepalive_s
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self, service: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # client loop lama tidak bisa dipakai ulang → tutup, bukan sekadar dilepas
+            for old in self._clients.values():
+                close_stale(old.aclose(), self._loop)
+            self._clients = {}
+            self._loop = loop
+        c = self._clients.get(service)
+        if c is None or c.is_closed:
+            timeout, conns = _HTTPX_DEFAULTS.get(service, (60.0, 16))
+            c = self._clients[service] = httpx.AsyncClient(
+                timeout=httpx.Timeout(timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=conns,
+                    max_keepalive_connections=conns,
+                    keepalive_expiry=self.keepalive_s,
+                ),
+                http2=_HTTP2,
+            )
+        return c
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for c in clients:
+            try:
+                await c.aclose()
+            except Exception:
+                pass
+
+
+httpx_clients = HttpxClients()
@@ -1,328 +1,352 @@
+# app/services/large_translation.py
 from __future__ import annotations
 
-import os, io, sys, time, uuid, shutil, subprocess, tempfile
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
 
-import requests
-from pypdf import PdfReader, PdfWriter, PdfMerger
-from azure.storage.blob import (
-    BlobServiceClient, ContentSettings,
-    generate_container_sas, ContainerSasPermissions
-)
+from azure.storage.blob import BlobSasPermissions
+from pypdf import PdfReader, PdfWriter
 
-from dotenv import load_env
-load_env()
+from . import blob_aio
+from .blob import generate_blob_sas_url
 
-# ---------- Config ----------
-MAX_DOC_MB = 39.5
-MAX_BATCH_MB = 240.0
-POLL_INTERVAL = 3.0
+logger = logging.getLogger("worker.large_translation")
 
-AZ_CONN_STR = os.getenv("AZURE_STORAGE_CONNECTION_STRING", "")
-INPUT_CONTAINER  = os.getenv("AZURE_INPUT_CONTAINER", "input")
-OUTPUT_CONTAINER = os.getenv("AZURE_OUTPUT_CONTAINER", "output")
+# Batas Document Translation: 40 MB per dokumen, 250 MB per batch (sisakan margin)
+MAX_DOC_BYTES = int(float(os.getenv("LARGE_DOC_MB", "39.5")) * 1024 * 1024)
+MAX_BATCH_BYTES = int(float(os.getenv("LARGE_BATCH_MB", "240")) * 1024 * 1024)
+MAX_BATCH_DOCS = int(os.getenv("LARGE_BATCH_MAX_DOCS", "50"))
+# Batch yang jalan bersamaan per dokumen besar (kuota concurrent batch Translator dibagi dengan job lain)
+MAX_PARALLEL_BATCHES = int(os.getenv("LARGE_MAX_PARALLEL_BATCHES", "4"))
+TRANSFER_PARALLEL = int(os.getenv("LARGE_TRANSFER_PARALLEL", "6"))
+SOFFICE_TIMEOUT_S = float(os.getenv("LARGE_SOFFICE_TIMEOUT_S", "900"))
 
-AZ_TRN_ENDPOINT = (os.getenv("AZURE_TRANSLATOR_ENDPOINT", "") or "").rstrip("/")
-AZ_TRN_REGION   = os.getenv("AZURE_TRANSLATOR_REGION", "")
-AZ_TRN_KEY      = os.getenv("AZURE_TRANSLATOR_KEY", "")
+_CONVERTIBLE = (".docx", ".doc", ".pptx", ".ppt")
 
-if not all([AZ_CONN_STR, AZ_TRN_ENDPOINT, AZ_TRN_REGION, AZ_TRN_KEY]):
-    print("[large_translation] Missing required ENV. Please set storage conn string + translator endpoint/region/key.", file=sys.stderr)
 
-_blob = BlobServiceClient.from_connection_string(AZ_CONN_STR)
-_src = _blob.get_container_client(INPUT_CONTAINER)
-_tgt = _blob.get_container_client(OUTPUT_CONTAINER)
+class LargeTranslationError(RuntimeError):
+    pass
 
-def _sizeof_mb_path(p: Path) -> float:
-    return p.stat().st_size / (1024*1024)
 
-def _has_soffice() -> bool:
-    from shutil import which
-    return which("soffice") is not None
-
-def _to_pdf_if_needed(local_path: Path) -> Path:
-    ext = local_path.suffix.lower()
-    if ext == ".pdf":
-        return local_path
-    if ext in (".docx", ".doc", ".pptx", ".ppt"):
-        if not _has_soffice():
-            raise RuntimeError("LibreOffice (soffice) not found; required for DOCX/PPTX -> PDF.")
-        out_dir = local_path.parent
-        cmd = ["soffice","--headless","--norestore","--invisible","--convert-to","pdf","--outdir",str(out_dir),str(local_path)]
-        r = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if r.returncode != 0:
-            raise RuntimeError(f"LibreOffice convert failed:\nSTDOUT:{r.stdout}\nSTDERR:{r.stderr}")
-        pdf = out_dir / (local_path.stem + ".pdf")
-        if not pdf.exists():
-            # fallback: pick the newest pdf
-            cands = list(out_dir.glob("*.pdf"))
-            if not cands:
-                raise RuntimeError("Conversion done but PDF not found.")
-            pdf = max(cands, key=lambda p: p.stat().st_mtime)
-        return pdf
-    raise RuntimeError("Unsupported format. Use PDF/DOCX/PPTX.")
-
-def _split_pdf_by_size(src_pdf: Path, max_mb: float=MAX_DOC_MB) -> List[Path]:
+# ----------------------------- PDF (jalan di thread) -----------------------------
+def split_pdf_by_size(src_pdf: Path, out_dir: Path, max_bytes: int = MAX_DOC_BYTES) -> List[Path]:
+    """
+    Pecah PDF jadi part ≤ max_bytes. Jumlah halaman per part ditebak dari rata-rata byte/halaman,
+    lalu dikoreksi kalau hasil tulis masih kebesaran (bukan tulis ulang tiap tambah satu halaman).
+    Satu halaman yang sendirian sudah > max_bytes tetap jadi part sendiri (Translator yang menolak).
+    """
     reader = PdfReader(str(src_pdf))
-    out_dir = src_pdf.parent / f"parts_{uuid.uuid4().hex[:6]}"
+    n = len(reader.pages)
+    if n == 0:
+        raise LargeTranslationError("PDF has no pages")
     out_dir.mkdir(parents=True, exist_ok=True)
+    per_page = max(1.0, src_pdf.stat().st_size / n)
+    target = max_bytes * 0.9
 
     parts: List[Path] = []
-    n = len(reader.pages)
     start = 0
     while start < n:
-        end = start
-        last_ok: Optional[Path] = None
-        while end < n:
+        count = max(1, min(n - start, int(target / per_page)))
+        while True:
             w = PdfWriter()
-            for i in range(start, end+1):
+            for i in range(start, start + count):
                 w.add_page(reader.pages[i])
-            cand = out_dir / f"part_{len(parts)+1:03d}.pdf"
-            with cand.open("wb") as f: w.write(f)
-            if _sizeof_mb_path(cand) <= max_mb:
-                last_ok = cand; end += 1
-            else:
-                cand.unlink(missing_ok=True); break
-        if last_ok is None:
-            w = PdfWriter(); w.add_page(reader.pages[start])
-            cand = out_dir / f"part_{len(parts)+1:03d}.pdf"
-            with cand.open("wb") as f: w.write(f)
-            parts.append(cand); start += 1
-        else:
-            parts.append(last_ok); start = end
+            cand = out_dir / f"part_{len(parts) + 1:03d}.pdf"
+            with cand.open("wb") as f:
+                w.write(f)
+            size = cand.stat().st_size
+            if size <= max_bytes or count == 1:
+                break
+            count = max(1, int(count * target / size))
+        parts.append(cand)
+        per_page = max(1.0, size / count)
+        start += count
     return parts
 
-def _merge_pdfs(pdf_paths: List[Path], out_path: Path) -> Path:
-    merger = PdfMerger()
+
+def merge_pdfs(pdf_paths: Sequence[Path], out_path: Path) -> Path:
+    w = PdfWriter()
     for p in pdf_paths:
-        merger.append(str(p))
+        w.append(str(p))
     with out_path.open("wb") as f:
-        merger.write(f)
-    merger.close()
+        w.write(f)
+    w.close()
     return out_path
 
-def _upload_files(container, paths: List[Path], prefix: str) -> List[str]:
-    blob_names = []
-    for p in paths:
-        with p.open("rb") as f:
-            name = f"{prefix}/{p.name}"
-            container.upload_blob(name=name, data=f, overwrite=True, content_settings=ContentSettings(content_type="application/pdf"))
-            blob_names.append(name)
-    return blob_names
-
-def _get_container_sas_url(container_name: str, minutes: int=120) -> str:
-    # obtain account info
-    acct = _blob.account_name
-    # try to get key from conn string
-    key = None
-    try:
-        for kv in os.getenv("AZURE_STORAGE_CONNECTION_STRING","").split(";"):
-            if kv.strip().startswith("AccountKey="):
-                key = kv.split("=",1)[1].strip()
-                break
-    except Exception:
-        pass
-    if not key:
-        # try internal credential
-        cred = getattr(_blob, "credential", None)
-        key = getattr(cred, "account_key", None)
-
-    if not key:
-        raise RuntimeError("Cannot get account key for SAS generation. Provide connection string with AccountKey.")
-
-    sas = generate_container_sas(
-        account_name=acct,
-        container_name=container_name,
-        account_key=key,
-        permission=ContainerSasPermissions(read=True, write=True, list=True, create=True, add=True),
-        expiry=int(time.time()) + minutes*60,
-    )
-    return f"https://{acct}.blob.core.windows.net/{container_name}?{sas}"
-
-def _create_batch(source_container_sas: str, target_container_sas: str, prefix: str, target_lang: str, source_lang: str="") -> str:
-    url = f"{AZ_TRN_ENDPOINT}/translator/document/batches?api-version=2024-05-01"
-    headers = {
-        "Ocp-Apim-Subscription-Key": AZ_TRN_KEY,
-        "Ocp-Apim-Subscription-Region": AZ_TRN_REGION,
-        "Content-Type": "application/json"
-    }
-    body = {
-        "inputs": [{
-            "source": {
-                "sourceUrl": source_container_sas,
-                **({"language": source_lang} if source_lang else {}),
-                "filter": {"prefix": prefix}
-            },
-            "targets": [{
-                "targetUrl": target_container_sas,
-                "language": target_lang
-            }]
-        }]
-    }
-    r = requests.post(url, json=body, headers=headers, timeout=60)
-    r.raise_for_status()
-    op_loc = r.headers.get("Operation-Location") or r.headers.get("operation-location")
-    if not op_loc:
-        raise RuntimeError("Missing Operation-Location header from create batch.")
-    # Extract batch id from body too (optional)
-    return op_loc
-
-def _poll_until_done(op_location: str, timeout_s: int=3600) -> dict:
-    headers = {
-        "Ocp-Apim-Subscription-Key": AZ_TRN_KEY,
-        "Ocp-Apim-Subscription-Region": AZ_TRN_REGION
-    }
-    t0 = time.time()
-    # op_location can be URL to the batch; normalize to status URL if needed
-    url = op_location if "translator/document/batches/" in op_location else op_location
-    while True:
-        r = requests.get(url, headers=headers, timeout=30)
-        if r.status_code >= 300:
-            raise RuntimeError(f"Polling failed: {r.status_code} {r.text}")
-        data = r.json()
-        st = (data.get("status") or "").lower()
-        if st in ("succeeded","failed","cancelled"):
-            return data
-        if time.time() - t0 > timeout_s:
-            raise TimeoutError("Polling timeout.")
-        time.sleep(POLL_INTERVAL)
-
-def _group_batches(paths, max_batch_mb=MAX_BATCH_MB):
-    batches = []
-    cur, cur_mb = [], 0.0
-    for p in sorted(paths, key=lambda x: x.name):
-        sz = _sizeof_mb_path(p)
-        if cur and cur_mb + sz > max_batch_mb:
+
+def group_batches(parts: Sequence[Path], max_bytes: int = MAX_BATCH_BYTES, max_docs: int = MAX_BATCH_DOCS) -> List[List[Path]]:
+    batches: List[List[Path]] = []
+    cur: List[Path] = []
+    cur_bytes = 0
+    for p in parts:
+        sz = p.stat().st_size
+        if cur and (cur_bytes + sz > max_bytes or len(cur) >= max_docs):
             batches.append(cur)
-            cur, cur_mb = [], 0.0
-        cur.append(p); cur_mb += sz
+            cur, cur_bytes = [], 0
+        cur.append(p)
+        cur_bytes += sz
     if cur:
         batches.append(cur)
     return batches
 
-def run_large_translation(src_blob_name: str, target_lang: str, source_lang: str="") -> Tuple[str, str]:
+
+async def to_pdf(local_path: Path) -> Path:
+    """DOCX/PPTX → PDF via LibreOffice (subprocess async, event loop tidak ikut menunggu)."""
+    ext = local_path.suffix.lower()
+    if ext == ".pdf":
+        return local_path
+    if ext not in _CONVERTIBLE:
+        raise LargeTranslationError(f"Unsupported format for large translation: {ext or '(none)'}")
+    if shutil.which("soffice") is None:
+        raise LargeTranslationError("LibreOffice (soffice) not found; required for DOCX/PPTX -> PDF.")
+    out_dir = local_path.parent
+    proc = await asyncio.create_subprocess_exec(
+        "soffice", "--headless", "--norestore", "--invisible",
+        "--convert-to", "pdf", "--outdir", str(out_dir), str(local_path),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout=SOFFICE_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise LargeTranslationError("LibreOffice convert timed out")
+    if proc.returncode != 0:
+        raise LargeTranslationError(
+            f"LibreOffice convert failed:\nSTDOUT:{out.decode(errors='replace')}\nSTDERR:{err.decode(errors='replace')}"
+        )
+    pdf = out_dir / (local_path.stem + ".pdf")
+    if not pdf.exists():
+        raise LargeTranslationError("Conversion done but PDF not found.")
+    return pdf
+
+
+# ----------------------------- engine -----------------------------
+class LargeTranslation:
     """
-    src_blob_name: blob path in INPUT_CONTAINER (e.g., 'uploads/bigfile.pdf')
-    Returns: (output_blob_name, sas_url_to_download)
+    Split → translate → merge untuk dokumen di atas batas Translator, async penuh:
+    - download input ke file temp (streaming), konversi ke PDF, split per ukuran (thread)
+    - upload part paralel (TRANSFER_PARALLEL)
+    - part dikelompokkan jadi batch (≤ 240 MB / MAX_BATCH_DOCS), batch di-submit paralel
+      sampai `max_parallel` (semaphore); tiap part satu entry File dengan target per bahasa
+    - batch yang selesai langsung di-download part hasilnya, selagi batch lain masih jalan
+    - merge per bahasa (thread) → upload ke `out_blob` masing-masing
+    submit/wait/documents/file_input di-inject (poller, client & governor bersama milik worker).
     """
-    # 1) Download to temp
-    tmpdir = Path(tempfile.mkdtemp(prefix="lgtrn-"))
-    try:
-        dl = _src.download_blob(src_blob_name)
-        raw = dl.readall()
-    except Exception as e:
-        raise RuntimeError(f"Cannot download input blob '{src_blob_name}': {e}")
-
-    ext = Path(src_blob_name).suffix.lower()
-    local_src = tmpdir / f"src{ext or '.bin'}"
-    local_src.write_bytes(raw)
-
-    # 2) Normalize to PDF
-    pdf = _to_pdf_if_needed(local_src)
-
-    # 3) Split to < 40MB parts
-    parts = _split_pdf_by_size(pdf, MAX_DOC_MB)
-
-    # 4) Group parts into batches under job prefix
-    job_id = uuid.uuid4().hex[:12]
-    batches = _group_batches(parts, MAX_BATCH_MB)
 
-    # 5) Build SAS (source/target)
-    src_sas = _get_container_sas_url(INPUT_CONTAINER, minutes=180)
-    tgt_sas = _get_container_sas_url(OUTPUT_CONTAINER, minutes=180)
-
-    out_dir = tmpdir / "out"; out_dir.mkdir(parents=True, exist_ok=True)
-    translated_paths: List[Path] = []
-
-    for bi, batch_files in enumerate(batches, start=1):
-        prefix = f"jobs/{job_id}/parts/b{bi:02d}"
-        _upload_files(_src, batch_files, prefix)
-
-        # 6) Create batch with prefix & poll
-        op_loc = _create_batch(src_sas, tgt_sas, prefix, target_lang=target_lang, source_lang=source_lang)
-        result = _poll_until_done(op_loc, timeout_s=3600)
-        if (result.get("status") or "").lower() != "succeeded":
-            raise RuntimeError(f"Batch {bi} failed: {result}")
-
-        # 7) Download translated parts for this batch
-        for p in sorted(batch_files, key=lambda x: x.name):
-            out_blob = f"{prefix}/{p.name}"
-            try:
-                stream = _tgt.download_blob(out_blob)
-                data = stream.readall()
-            except Exception:
-                # fallback basename
+    def __init__(
+        self,
+        *,
+        submit: Callable[[List[Dict[str, object]]], Awaitable[str]],
+        wait: Callable[[str], Awaitable[dict]],
+        documents: Callable[[str], Awaitable[List[dict]]],
+        file_input: Callable[..., Dict[str, object]],
+        input_container: str,
+        output_container: str,
+        max_doc_bytes: int = MAX_DOC_BYTES,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+        max_batch_docs: int = MAX_BATCH_DOCS,
+        max_parallel: int = MAX_PARALLEL_BATCHES,
+        transfer_parallel: int = TRANSFER_PARALLEL,
+        work_prefix: str = "large/",
+    ):
+        self._submit = submit
+        self._wait = wait
+        self._documents = documents
+        self._file_input = file_input
+        self.input_container = input_container
+        self.output_container = output_container
+        self.max_doc_bytes = max_doc_bytes
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_docs = max_batch_docs
+        self.work_prefix = work_prefix
+        # dibagi semua dokumen besar di proses ini → total batch paralel tetap ≤ max_parallel
+        self._batch_sem = asyncio.Semaphore(max(1, max_parallel))
+        self._transfer_parallel = max(1, transfer_parallel)
+        self.metrics: Dict[str, int] = {"documents": 0, "parts": 0, "batches": 0, "failed_parts": 0}
+
+    def needs_split(self, size: int) -> bool:
+        return size > self.max_doc_bytes
+
+    def stats(self) -> dict:
+        return dict(self.metrics)
+
+    async def run(
+        self,
+        src_blob: str,
+        *,
+        run_id: str,
+        source_lang: str,
+        targets: Sequence[Tuple[str, str, Optional[str], str]],
+    ) -> Dict[str, dict]:
+        """
+        targets: [(key, language, glossary_url, out_blob)] → {key: {"status": "Succeeded"|"Failed", "blob", "error", "parts"}}.
+        Kegagalan satu bahasa tidak menggagalkan bahasa lain; error sebelum submit → raise.
+        """
+        t0 = time.perf_counter()
+        prefix = f"{self.work_prefix.rstrip('/')}/{run_id}"
+        tmp = Path(tempfile.mkdtemp(prefix="lgtrn-"))
+        try:
+            local = tmp / f"src{Path(src_blob).suffix.lower() or '.bin'}"
+            await self._download(self.input_container, src_blob, local)
+            pdf = await to_pdf(local)
+            parts = await asyncio.to_thread(split_pdf_by_size, pdf, tmp / "parts", self.max_doc_bytes)
+            part_blobs = {p: f"{prefix}/parts/{p.name}" for p in parts}
+            await self._parallel(
+                self._upload(self.input_container, part_blobs[p], p) for p in parts
+            )
+
+            batches = group_batches(parts, self.max_batch_bytes, self.max_batch_docs)
+            self.metrics["documents"] += 1
+            self.metrics["parts"] += len(parts)
+            logger.info("large_translation_split", extra={
+                "run_id": run_id, "blob_name": src_blob, "parts": len(parts), "batches": len(batches),
+                "langs": [t[1] for t in targets],
+            })
+
+            out_parts: Dict[str, Dict[Path, Path]] = {key: {} for key, *_ in targets}
+            errors: Dict[str, str] = {}
+            await asyncio.gather(*(
+                self._run_batch(bi, batch, part_blobs, prefix, tmp, source_lang, targets, out_parts, errors)
+                for bi, batch in enumerate(batches, start=1)
+            ))
+
+            results: Dict[str, dict] = {}
+            for key, lang, _, out_blob in targets:
+                got = out_parts[key]
+                if key in errors or len(got) != len(parts):
+                    results[key] = {
+                        "status": "Failed", "blob": None, "parts": len(parts),
+                        "error": errors.get(key) or f"{len(parts) - len(got)} translated part(s) missing",
+                    }
+                    continue
+                merged = tmp / f"merged_{lang}.pdf"
                 try:
-                    stream = _tgt.download_blob(p.name)
-                    data = stream.readall()
-                except Exception:
-                    raise RuntimeError(f"Translated chunk not found in output container: {out_blob}")
-            dst = out_dir / p.name
-            dst.write_bytes(data)
-            translated_paths.append(dst)
-
-    merged = tmpdir / f"{Path(src_blob_name).stem}_TRANSLATED_{target_lang}.pdf"
-    _merge_pdfs(translated_paths, merged)
-
-    # 8) Upload final merged PDF to OUTPUT (next to input path)
-    parent = os.path.dirname(src_blob_name)
-    out_blob_name = f"{parent}/{merged.name}" if parent else merged.name
-    with merged.open("rb") as f:
-        _tgt.upload_blob(name=out_blob_name, data=f, overwrite=True, content_settings=ContentSettings(content_type="application/pdf"))
-
-    # 9) Make SAS for final file
-    final_sas = _get_container_sas_url(OUTPUT_CONTAINER, minutes=180)
-    # Convert container SAS to file SAS by appending &rest? No, easiest: rely on container SAS + path
-    sas_url = f"{final_sas}&restype=container&comp=list"  # informational; usually you will share direct blob SAS in your worker
-
-    # Better: generate a blob SAS
-    # For simplicity here we just return a blob URL without SAS; integrate your own SAS helper in worker.
-    direct_url = f"https://{_blob.account_name}.blob.core.windows.net/{OUTPUT_CONTAINER}/{out_blob_name}"
-    return out_blob_name, direct_url
-
-# ------------- CLI -------------
-def _upload_local_file_to_input(local: Path, blob_name: str):
-    with local.open("rb") as f:
-        _src.upload_blob(name=blob_name, data=f, overwrite=True, content_settings=ContentSettings(content_type="application/pdf"))
-
-def _sas_blob_download_url(container: str, blob_name: str, minutes: int=60) -> str:
-    # generate blob-level SAS for direct download
-    acct = _blob.account_name
-    key = None
-    for kv in os.getenv("AZURE_STORAGE_CONNECTION_STRING","").split(";"):
-        if kv.strip().startswith("AccountKey="):
-            key = kv.split("=",1)[1].strip()
-            break
-    from azure.storage.blob import generate_blob_sas, BlobSasPermissions
-    sas = generate_blob_sas(
-        account_name=acct,
-        container_name=container,
-        blob_name=blob_name,
-        account_key=key,
-        permission=BlobSasPermissions(read=True),
-        expiry=int(time.time()) + minutes*60,
-    )
-    return f"https://{acct}.blob.core.windows.net/{container}/{blob_name}?{sas}"
-
-if __name__ == "__main__":
-    import argparse
-    ap = argparse.ArgumentParser(description="Translate large document via split-batch-merge")
-    ap.add_argument("input", help="Local file path (PDF/DOCX/PPTX). If provided, we'll upload then translate.")
-    ap.add_argument("--to", required=True, help="Target language, e.g., id, en, ja")
-    ap.add_argument("--from", dest="source_lang", default="", help="Source language code or empty for auto")
-    ap.add_argument("--blob", default="", help="Optional blob path to use under INPUT container")
-    args = ap.parse_args()
-
-    local = Path(args.input).expanduser().resolve()
-    if not local.exists():
-        print(f"File not found: {local}", file=sys.stderr)
-        sys.exit(2)
-
-    blob_name = args.blob or f"uploads/{local.name}"
-    # upload to input then run pipeline
-    _upload_local_file_to_input(local, blob_name)
-    out_blob, url = run_large_translation(blob_name, target_lang=args.to, source_lang=args.source_lang)
-    print("OK")
-    print("Output blob:", out_blob)
-    print("Direct URL  :", url)
+                    await asyncio.to_thread(merge_pdfs, [got[p] for p in parts], merged)
+                    await self._upload(self.output_container, out_blob, merged)
+                except Exception as e:
+                    results[key] = {"status": "Failed", "blob": None, "parts": len(parts), "error": f"Merge/upload failed: {e}"}
+                    continue
+                results[key] = {"status": "Succeeded", "blob": out_blob, "parts": len(parts), "error": None}
+
+            logger.info("large_translation_done", extra={
+                "run_id": run_id, "blob_name": src_blob, "parts": len(parts),
+                "succeeded": sum(1 for r in results.values() if r["status"] == "Succeeded"),
+                "ms": round((time.perf_counter() - t0) * 1000),
+            })
+            return results
+        finally:
+            await asyncio.to_thread(shutil.rmtree, tmp, True)
+            await self._cleanup(prefix, run_id)
+
+    # ------------------------------------------------------------------
+    async def _run_batch(
+        self,
+        bi: int,
+        batch: List[Path],
+        part_blobs: Dict[Path, str],
+        prefix: str,
+        tmp: Path,
+        source_lang: str,
+        targets: Sequence[Tuple[str, str, Optional[str], str]],
+        out_parts: Dict[str, Dict[Path, Path]],
+        errors: Dict[str, str],
+    ) -> None:
+        def out_name(lang: str, p: Path) -> str:
+            return f"{prefix}/out/{lang.lower()}/{p.name}"
+
+        try:
+            inputs = [
+                self._file_input(
+                    src_blob_sas_url=generate_blob_sas_url(self.input_container, part_blobs[p], minutes=360),
+                    source_lang=source_lang,
+                    targets=[
+                        (
+                            lang,
+                            generate_blob_sas_url(
+                                self.output_container, out_name(lang, p), minutes=360,
+                                permission=BlobSasPermissions(read=True, write=True, create=True),
+                            ),
+                            glossary_url,
+                        )
+                        for _, lang, glossary_url, _ in targets
+                    ],
+                )
+                for p in batch
+            ]
+            async with self._batch_sem:
+                batch_id = await self._submit(inputs)
+                if not batch_id:
+                    raise LargeTranslationError("Failed to start document translation (no batch id)")
+                self.metrics["batches"] += 1
+                logger.info("large_translation_batch_submitted", extra={"batch": bi, "batch_id": batch_id, "parts": len(batch)})
+                await self._wait(batch_id)
+            docs = await self._documents(batch_id)
+        except Exception as e:
+            err = f"Batch {bi} failed: {e}"
+            logger.error("large_translation_batch_error", extra={"batch": bi, "error": str(e)})
+            for key, *_ in targets:
+                errors.setdefault(key, err)
+            return
+
+        # batch ini selesai → download hasilnya sekarang, tidak menunggu batch lain
+        async def _fetch(key: str, lang: str, p: Path) -> None:
+            doc = self._match(docs, part_blobs[p], lang)
+            if doc is not None and (doc.get("status") or "").lower() != "succeeded":
+                self.metrics["failed_parts"] += 1
+                errors.setdefault(key, f"Part {p.name} ({lang}): {doc.get('error') or doc.get('status')}")
+                return
+            dst = tmp / "out" / lang.lower() / p.name
+            try:
+                await self._download(self.output_container, out_name(lang, p), dst)
+            except Exception as e:
+                self.metrics["failed_parts"] += 1
+                errors.setdefault(key, f"Part {p.name} ({lang}) not downloadable: {e}")
+                return
+            out_parts[key][p] = dst
+
+        await self._parallel(_fetch(key, lang, p) for p in batch for key, lang, *_ in targets)
+
+    @staticmethod
+    def _match(docs: List[dict], part_blob: str, lang: str) -> Optional[dict]:
+        suffix = f"/{part_blob}".lower()
+        for d in docs:
+            path = unquote(urlparse(d.get("sourcePath") or "").path).lower()
+            if path.endswith(suffix) and (d.get("to") or "").lower() in ("", lang.lower()):
+                return d
+        return None
+
+    async def _parallel(self, coros) -> None:
+        sem = asyncio.Semaphore(self._transfer_parallel)
+
+        async def _one(c):
+            async with sem:
+                return await c
+
+        for r in await asyncio.gather(*(_one(c) for c in coros), return_exceptions=True):
+            if isinstance(r, BaseException):
+                raise r
+
+    async def _download(self, container: str, name: str, dst: Path) -> None:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        with dst.open("wb") as f:
+            async for chunk in blob_aio.stream(container, name):
+                f.write(chunk)
+
+    async def _upload(self, container: str, name: str, path: Path) -> None:
+        with path.open("rb") as f:
+            await blob_aio.put_bytes(container, name, f, content_type="application/pdf")
+
+    async def _cleanup(self, prefix: str, run_id: str) -> None:
+        for container in (self.input_container, self.output_container):
+            try:
+                await blob_aio.delete_prefix(container, f"{prefix}/")
+            except Exception as e:
+                logger.warning("large_translation_cleanup_error", extra={"run_id": run_id, "container": container, "error": str(e)})
@@ -318,36 +318,125 @@
 
 
 from __future__ import annotations
+import os
 from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Tuple, Union
+
+from concurrent.futures.process import BrokenProcessPool
+
+from .font_policy import POLICY_FINGERPRINT, FontSpec, resolve
+from .ooxml_fonts import font_pool, rewrite_package, scan_package, shutdown_font_pool
+
+# Naikkan setiap kali hasil font pass berubah (dipakai sebagai bagian key result cache);
+# fingerprint policy ikut supaya override FONT_POLICY_FILE tidak memakai hasil cache lama
+FONT_PASS_VERSION = f"4-{POLICY_FINGERPRINT}"
+
+# Input file-like → output juga file-like (spill ke disk di atas batas ini), bukan bytes
+FONT_SPILL_BYTES = int(os.getenv("FONT_SPILL_MB", "16")) * 1024 * 1024
+
+Doc = Union[bytes, BinaryIO]
+
+
+def _open_input(data: Doc) -> BinaryIO:
+    if hasattr(data, "read"):
+        data.seek(0)
+        return data
+    return BytesIO(data)
+
+
+def _unchanged(data: Doc) -> Doc:
+    if hasattr(data, "seek"):
+        data.seek(0)
+    return data
+
+
+def _new_output(data: Doc) -> BinaryIO:
+    return SpooledTemporaryFile(max_size=FONT_SPILL_BYTES) if hasattr(data, "read") else BytesIO()
+
+
+def _finish_output(out: BinaryIO, data: Doc) -> Doc:
+    if hasattr(data, "read"):
+        out.seek(0)
+        return out
+    return out.getvalue()
 
 # =========================
 # 1) Language → Font mapper
 # =========================
 def _font_for_lang(target_lang: str) -> str:
     """
-    CJK → Meiryo UI, lainnya → Calibri
+    Satu typeface untuk bahasa target (font utama FontSpec); policy lengkap per slot: font_policy.resolve().
     """
-    t = (target_lang or "").lower()
-    if t.startswith(("ja", "jp", "ko", "zh", "zh-hans", "zh-hant")):
-        return "Meiryo UI"
-    return "Calibri"
+    return resolve(target_lang).primary
 
 
 # =========================
-# 2) DOCX font enforcer
+# 2) Streaming (default)
 # =========================
-def set_docx_font(data: bytes, font_name: str) -> bytes:
+def _stream_fonts(data: Doc, spec: FontSpec, kind: str) -> Tuple[Doc, dict]:
+    # pre-scan: semua run sudah memakai font target → tidak ada yang di-parse ulang / ditulis
+    if scan_package(_open_input(data), spec, kind=kind) == 0:
+        return _unchanged(data), {"handler": kind, "skipped": True, "runs_changed": 0}
+    out = _new_output(data)
+    try:
+        try:
+            stats = rewrite_package(_open_input(data), out, spec, kind=kind, pool=font_pool())
+        except BrokenProcessPool:
+            # proses pool mati (OOM/kill) → buang pool; job ini dan seterusnya serial (tanpa fork ulang)
+            shutdown_font_pool(broken=True)
+            out.seek(0)
+            out.truncate()
+            stats = rewrite_package(_open_input(data), out, spec, kind=kind)
+    except BaseException:
+        out.close()
+        raise
+    return _finish_output(out, data), {
+        "handler": kind, "skipped": False, "runs_changed": stats["runs_changed"], "parts": stats["parts"],
+    }
+
+
+def _apply_fonts(data: Doc, spec: FontSpec, kind: str) -> Tuple[Doc, dict]:
+    """Streaming; paket yang tidak bisa di-stream (ZIP/XML rusak) → fallback object model (satu font)."""
+    try:
+        return _stream_fonts(data, spec, kind)
+    except Exception:
+        if kind == "xlsx":
+            raise  # sengaja tanpa fallback openpyxl (lambat & boros memori untuk sheet besar)
+        om = _set_docx_font_om if kind == "docx" else _set_pptx_font_om
+        return om(data, spec.primary), {"handler": kind, "skipped": False, "runs_changed": None, "fallback": True}
+
+
+def set_docx_font(data: Doc, font_name: str) -> Doc:
+    """Rewrite XML langsung di ZIP (body, header/footer, notes, chart, SmartArt; entry lain disalin mentah)."""
+    return _apply_fonts(data, FontSpec.uniform(font_name), "docx")[0]
+
+
+def set_pptx_font(data: Doc, font_name: str) -> Doc:
+    """Sama seperti set_docx_font untuk PPTX (slide, layout, master, notes, chart, SmartArt)."""
+    return _apply_fonts(data, FontSpec.uniform(font_name), "pptx")[0]
+
+
+def set_xlsx_font(data: Doc, font_name: str) -> Doc:
+    """XLSX: font di xl/styles.xml + rich text run di sharedStrings/komentar (+ chart/drawing); sheet disalin mentah."""
+    return _apply_fonts(data, FontSpec.uniform(font_name), "xlsx")[0]
+
+
+# =========================
+# 3) DOCX font enforcer (object model, fallback + baseline benchmark)
+# =========================
+def _set_docx_font_om(data: Doc, font_name: str) -> Doc:
     try:
         from docx import Document
         from docx.oxml import OxmlElement
         from docx.oxml.ns import qn
     except Exception:
-        return data
+        return _unchanged(data)
 
     try:
-        doc = Document(BytesIO(data))
+        doc = Document(_open_input(data))
     except Exception:
-        return data
+        return _unchanged(data)
 
     def _ensure_rPr(elem):
         rPr = elem.rPr
@@ -447,30 +536,30 @@ def set_docx_font(data: bytes, font_name: str) -> bytes:
     except Exception:
         pass
 
-    out = BytesIO()
+    out = _new_output(data)
     try:
         doc.save(out)
-        return out.getvalue()
+        return _finish_output(out, data)
     except Exception:
-        return data
+        return _unchanged(data)
 
 
 # =========================
-# 3) PPTX font enforcer
+# 4) PPTX font enforcer (object model, fallback + baseline benchmark)
 # =========================
-def set_pptx_font(data: bytes, font_name: str) -> bytes:
+def _set_pptx_font_om(data: Doc, font_name: str) -> Doc:
     try:
         from pptx import Presentation
         from pptx.enum.shapes import MSO_SHAPE_TYPE
         from pptx.oxml.ns import qn
         from pptx.oxml.xmlchemy import OxmlElement
     except Exception:
-        return data
+        return _unchanged(data)
 
     try:
-        prs = Presentation(BytesIO(data))
+        prs = Presentation(_open_input(data))
     except Exception:
-        return data
+        return _unchanged(data)
 
     def _ensure_font_nodes(rPr):
         latin = rPr.find(qn('a:latin'))
@@ -545,30 +634,58 @@ def set_pptx_font(data: bytes, font_name: str) -> bytes:
     except Exception:
         pass
 
-    out = BytesIO()
+    out = _new_output(data)
     try:
         prs.save(out)
-        return out.getvalue()
+        return _finish_output(out, data)
     except Exception:
-        return data
+        return _unchanged(data)
 
 
 # =========================
-# 4) Dispatcher by extension
+# 5) Dispatcher by extension
 # =========================
-def enforce_fonts_by_lang(name_or_ext: str, bin_data: bytes, target_lang: str) -> bytes:
+# hanya paket OOXML (ZIP): .doc/.ppt biner lama tidak bisa dibuka streaming maupun python-docx/pptx
+_DOCX_EXTS = (".docx",)
+_PPTX_EXTS = (".pptx",)
+_XLSX_EXTS = (".xlsx", ".xlsm")
+
+
+def _norm_ext(name_or_ext: str) -> str:
+    e = (name_or_ext or "").lower()
+    return e if "." in e else f".{e}"
+
+
+def font_pass_applies(name_or_ext: str) -> bool:
     """
-    JA/KO/ZH → Meiryo UI, lainnya → Calibri.
-    Otomatis pilih handler berdasar ekstensi.
+    True kalau enforce_fonts_by_lang bisa mengubah file ini.
+    False (PDF, TXT, dll) → hasil bisa di-rename/copy server-side tanpa download.
     """
-    font = _font_for_lang(target_lang)
-    e = (name_or_ext or "").lower()
-    e = e if "." in e else f".{e}"
+    return _norm_ext(name_or_ext).endswith(_DOCX_EXTS + _PPTX_EXTS + _XLSX_EXTS)
+
+
+def font_pass(name_or_ext: str, bin_data: Doc, target_lang: str) -> Tuple[Doc, dict]:
+    """
+    Seperti enforce_fonts_by_lang, plus laporan:
+    {"handler", "skipped" (pre-scan: sudah compliant, data dikembalikan apa adanya), "runs_changed"}.
+    """
+    e = _norm_ext(name_or_ext)
     try:
-        if e.endswith((".docx", ".doc")):
-            return set_docx_font(bin_data, font)
-        if e.endswith((".pptx", ".ppt")):
-            return set_pptx_font(bin_data, font)
-        return bin_data
+        if e.endswith(_DOCX_EXTS):
+            return _apply_fonts(bin_data, resolve(target_lang, "docx"), "docx")
+        if e.endswith(_PPTX_EXTS):
+            return _apply_fonts(bin_data, resolve(target_lang, "pptx"), "pptx")
+        if e.endswith(_XLSX_EXTS):
+            return _apply_fonts(bin_data, resolve(target_lang, "xlsx"), "xlsx")
     except Exception:
-        return bin_data
+        pass
+    return _unchanged(bin_data), {"handler": None, "skipped": True, "runs_changed": 0}
+
+
+def enforce_fonts_by_lang(name_or_ext: str, bin_data: Doc, target_lang: str) -> Doc:
+    """
+    Font per slot script sesuai font_policy (mis. JA: latin Calibri + ea Meiryo UI).
+    Otomatis pilih handler berdasar ekstensi.
+    bytes masuk → bytes keluar; file-like masuk → file-like (posisi 0) keluar.
+    """
+    return font_pass(name_or_ext, bin_data, target_lang)[0]
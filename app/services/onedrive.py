@@ -1,9 +1,11 @@
 from __future__ import annotations
 import os, json, time, asyncio
-from typing import Optional, Tuple
+from typing import BinaryIO, Optional, Tuple, Union
 import httpx
 from sqlalchemy import select
 
+from app.services.http import httpx_clients
+
 
 GRAPH = "https://graph.microsoft.com/v1.0"
 
@@ -53,25 +55,24 @@ async def get_valid_user_token(session, user_id: str) -> Optional[str]:
         # scope minimal untuk OneDrive upload + offline
         "scope": "Files.ReadWrite files.readwrite.all offline_access",
     }
-    async with httpx.AsyncClient(timeout=30.0) as c:
-        r = await c.post(token_url, data=data)
-        if r.status_code != 200:
-            return access_token
-        j = r.json()
-        access_token = j.get("access_token") or access_token
-        new_refresh  = j.get("refresh_token") or refresh_token
-        expires_in   = int(j.get("expires_in", 3600))
-        new_exp      = now + expires_in - 30
-
-        # simpan balik
-        try:
-            tok["access_token"]  = access_token
-            tok["refresh_token"] = new_refresh
-            user.token_json = json.dumps(tok)
-            user.expires_at = new_exp
-            await session.commit()
-        except Exception:
-            pass
+    r = await httpx_clients.get("graph").post(token_url, data=data, timeout=30.0)
+    if r.status_code != 200:
+        return access_token
+    j = r.json()
+    access_token = j.get("access_token") or access_token
+    new_refresh  = j.get("refresh_token") or refresh_token
+    expires_in   = int(j.get("expires_in", 3600))
+    new_exp      = now + expires_in - 30
+
+    # simpan balik
+    try:
+        tok["access_token"]  = access_token
+        tok["refresh_token"] = new_refresh
+        user.token_json = json.dumps(tok)
+        user.expires_at = new_exp
+        await session.commit()
+    except Exception:
+        pass
 
     return access_token
 
@@ -91,10 +92,11 @@ async def _ensure_translated_folder(user_token: str, client: httpx.AsyncClient)
     return r2.json()["id"]
 
 async def upload_bytes_to_user_onedrive(
-    session, user_id: str, filename: str, data: bytes
+    session, user_id: str, filename: str, data: Union[bytes, BinaryIO]
 ) -> Tuple[Optional[str], Optional[str]]:
     """
     Upload ke OneDrive/Translated milik user_id.
+    `data` boleh bytes atau file-like seekable (dibaca per chunk, tidak ditampung utuh).
     Return (item_id, web_url)
     """
     token = await get_valid_user_token(session, user_id)
@@ -102,58 +104,62 @@ async def upload_bytes_to_user_onedrive(
         return (None, None)
 
     headers = {"Authorization": f"Bearer {token}"}
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        folder_id = await _ensure_translated_folder(token, client)
-        if not folder_id:
-            return (None, None)
+    client = httpx_clients.get("graph")  # pool Graph bersama (keep-alive), bukan client baru per upload
+    folder_id = await _ensure_translated_folder(token, client)
+    if not folder_id:
+        return (None, None)
 
-        # upload session agar aman untuk file besar
+    # upload session agar aman untuk file besar
+    r = await client.post(
+        f"{GRAPH}/me/drive/items/{folder_id}:/{filename}:/createUploadSession",
+        headers=headers, json={"@microsoft.graph.conflictBehavior":"replace"}
+    )
+    if r.status_code == 401:
+        # sekali lagi coba refresh keras
+        token = await get_valid_user_token(session, user_id)
+        if not token:
+            return (None, None)
+        headers = {"Authorization": f"Bearer {token}"}
         r = await client.post(
             f"{GRAPH}/me/drive/items/{folder_id}:/{filename}:/createUploadSession",
             headers=headers, json={"@microsoft.graph.conflictBehavior":"replace"}
         )
-        if r.status_code == 401:
-            # sekali lagi coba refresh keras
-            token = await get_valid_user_token(session, user_id)
-            if not token:
-                return (None, None)
-            headers = {"Authorization": f"Bearer {token}"}
-            r = await client.post(
-                f"{GRAPH}/me/drive/items/{folder_id}:/{filename}:/createUploadSession",
-                headers=headers, json={"@microsoft.graph.conflictBehavior":"replace"}
-            )
-
-        r.raise_for_status()
-        upload_url = r.json()["uploadUrl"]
-
-        # kirim chunk
-        size=len(data); chunk=10*1024*1024; start=0
-        last_resp = None
-        while start < size:
-            end=min(start+chunk,size)-1
-            piece=data[start:end+1]
-            last_resp = await client.put(
-                upload_url,
-                headers={"Content-Range": f"bytes {start}-{end}/{size}"},
-                content=piece
-            )
-            if last_resp.status_code not in (200,201,202):
-                last_resp.raise_for_status()
-            start=end+1
-
-        item = last_resp.json()
-        item_id = item.get("id")
-        web_url = item.get("webUrl")
-
-        # sharing link (opsional)
-        try:
-            r2 = await client.post(
-                f"{GRAPH}/me/drive/items/{item_id}/createLink",
-                headers=headers, json={"type":"view","scope":"anonymous"}
-            )
-            if r2.status_code == 200:
-                web_url = (r2.json().get("link") or {}).get("webUrl") or web_url
-        except Exception:
-            pass
-
-        return (item_id, web_url)
+
+    r.raise_for_status()
+    upload_url = r.json()["uploadUrl"]
+
+    # kirim chunk
+    if hasattr(data, "read"):
+        size=data.seek(0, 2); data.seek(0)
+    else:
+        size=len(data)
+    chunk=10*1024*1024; start=0
+    last_resp = None
+    while start < size:
+        end=min(start+chunk,size)-1
+        piece=data.read(end+1-start) if hasattr(data, "read") else data[start:end+1]
+        last_resp = await client.put(
+            upload_url,
+            headers={"Content-Range": f"bytes {start}-{end}/{size}"},
+            content=piece
+        )
+        if last_resp.status_code not in (200,201,202):
+            last_resp.raise_for_status()
+        start=end+1
+
+    item = last_resp.json()
+    item_id = item.get("id")
+    web_url = item.get("webUrl")
+
+    # sharing link (opsional)
+    try:
+        r2 = await client.post(
+            f"{GRAPH}/me/drive/items/{item_id}/createLink",
+            headers=headers, json={"type":"view","scope":"anonymous"}
+        )
+        if r2.status_code == 200:
+            web_url = (r2.json().get("link") or {}).get("webUrl") or web_url
+    except Exception:
+        pass
+
+    return (item_id, web_url)
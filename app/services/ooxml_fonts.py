@@ -0,0 +1,817 @@
+# app/services/ooxml_fonts.py
+"""
+Font pass streaming langsung di paket ZIP OOXML (DOCX/PPTX/XLSX), tanpa object model
+python-docx/python-pptx/openpyxl.
+- Hanya part XML yang membawa run properties yang di-parse: body, header/footer, footnote/endnote,
+  komentar, styles (DOCX); slide, layout, master, notes (PPTX); styles, shared strings, komentar,
+  drawing (XLSX); chart & SmartArt di semuanya.
+- Part kecil: parse + tostring lxml sekali; part besar (> OOXML_STREAM_PART_MB) di-iterparse per
+  paragraf/shape (memori datar) dan ditulis ulang secara inkremental.
+- Entry lain (media, embeddings, rels, sheet, ...) disalin byte-for-byte: tanpa dekompres/rekompres;
+  part besar yang sudah compliant (mis. sharedStrings tanpa rich text) juga disalin mentah.
+  Salin mentah memakai state internal zipfile; kalau tidak ada (versi CPython lain) → inflate/deflate
+  lewat API publik ZipFile.open/writestr.
+- Font per slot script (latin/ea/cs) dari font_policy.FontSpec; run campuran bisa dipecah per script.
+- scan_package(): pre-scan tanpa menulis; paket yang sudah memakai font target tidak di-rewrite.
+- Paket dengan banyak part (deck ratusan slide): part di-rewrite paralel di ProcessPoolExecutor
+  bersama (font_pool), dirakit ulang sesuai urutan entry asli.
+Benchmark vs implementasi object model: python -m app.services.ooxml_fonts [file.docx|file.pptx ...]
+"""
+from __future__ import annotations
+
+import copy
+import multiprocessing
+import os
+import re
+import shutil
+import struct
+import threading
+import zipfile
+import zlib
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from io import BytesIO
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from .font_policy import LATIN_LANG, FontSpec, is_mixed, resolve, split_scripts
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+P_NS = "http://schemas.openxmlformats.org/presentationml/2006/main"
+S_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+_XML_SPACE = f"{{{XML_NS}}}space"
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+def _a(tag: str) -> str:
+    return f"{{{A_NS}}}{tag}"
+
+
+def _s(tag: str) -> str:
+    return f"{{{S_NS}}}{tag}"
+
+
+# Part yang di-rewrite per jenis paket; sisanya disalin mentah
+PART_PATTERNS: Dict[str, "re.Pattern[str]"] = {
+    "docx": re.compile(
+        r"word/(document|header\d*|footer\d*|footnotes|endnotes|comments|styles|glossary/document"
+        r"|charts/chart\d*|diagrams/(data|drawing)\d*)\.xml"
+    ),
+    "pptx": re.compile(
+        r"ppt/(slides/slide|slideLayouts/slideLayout|slideMasters/slideMaster|notesSlides/notesSlide"
+        r"|notesMasters/notesMaster|handoutMasters/handoutMaster|charts/chart|diagrams/(data|drawing))\d*\.xml"
+    ),
+    # sheet (xl/worksheets) tidak disentuh: font sel datang dari styles, rich text dari sharedStrings
+    "xlsx": re.compile(r"xl/(styles|sharedStrings|comments\d*|charts/chart\d*|drawings/drawing\d*)\.xml"),
+}
+
+# Part ≤ batas ini diproses utuh di memori (parse + tostring lxml, paling cepat); di atasnya streaming
+STREAM_PART_BYTES = int(float(os.getenv("OOXML_STREAM_PART_MB", "4")) * 1024 * 1024)
+
+# Rewrite per part paralel di proses terpisah (CPU-bound; event loop & GIL proses worker tidak ikut tertahan)
+FONT_POOL_WORKERS = int(os.getenv("FONT_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+POOL_MIN_PARTS = int(os.getenv("FONT_POOL_MIN_PARTS", "8"))
+POOL_WINDOW_PER_WORKER = 2
+ZLIB_LEVEL = 6
+
+# Unit streaming: subtree yang di-parse utuh, diubah, lalu diserialisasi (paragraf / shape / blok style)
+_UNITS = frozenset({
+    _w("p"), _w("style"), _w("docDefaults"),
+    _a("p"), _a("lstStyle"),
+    _s("si"), _s("comment"), _s("font"),
+    *(f"{{{P_NS}}}{t}" for t in ("sp", "grpSp", "graphicFrame", "cxnSp", "pic", "txStyles", "notesStyle")),
+})
+
+# ---- WordprocessingML ----
+W_R, W_RPR, W_RFONTS, W_T = _w("r"), _w("rPr"), _w("rFonts"), _w("t")
+W_PPR, W_STYLE, W_RPR_DEFAULT, W_HINT = _w("pPr"), _w("style"), _w("rPrDefault"), _w("hint")
+# slot FontSpec → atribut rFonts; atribut theme slot yang sama dibuang (kalau tidak, theme menang)
+_W_SLOT_ATTRS = {"latin": (_w("ascii"), _w("hAnsi")), "ea": (_w("eastAsia"),), "cs": (_w("cs"),)}
+_W_SLOT_THEME = {
+    "latin": (_w("asciiTheme"), _w("hAnsiTheme")), "ea": (_w("eastAsiaTheme"),), "cs": (_w("cstheme"),),
+}
+# child rPr yang wajib mendahului rFonts (urutan skema CT_RPr / CT_ParaRPr)
+_W_BEFORE_RFONTS = frozenset(_w(t) for t in ("ins", "del", "moveFrom", "moveTo", "rStyle"))
+
+# ---- DrawingML ----
+A_R, A_FLD, A_RPR, A_T = _a("r"), _a("fld"), _a("rPr"), _a("t")
+A_END_PARA_RPR, A_DEF_RPR = _a("endParaRPr"), _a("defRPr")
+_A_FONT_TAGS = (_a("latin"), _a("ea"), _a("cs"))
+# child CT_TextCharacterProperties yang wajib sesudah latin/ea/cs
+_A_AFTER_FONTS = frozenset(_a(t) for t in ("sym", "hlinkClick", "hlinkMouseOver", "rtl", "extLst"))
+
+# ---- SpreadsheetML: satu nama font per <font> (styles) / <rPr> (rich text run); tanpa slot script ----
+S_FONT, S_FONTS, S_RPR, S_SI = _s("font"), _s("fonts"), _s("rPr"), _s("si")
+S_NAME, S_RFONT, S_SCHEME, S_CHARSET = _s("name"), _s("rFont"), _s("scheme"), _s("charset")
+
+_FONT_TAGS = (W_R, W_RPR, W_RPR_DEFAULT, A_R, A_FLD, A_END_PARA_RPR, A_DEF_RPR, S_FONT, S_RPR)
+# elemen yang dibuang dari tree saat pre-scan (memori datar untuk part besar)
+_SCAN_CLEAR = (W_R, A_R, A_FLD, S_SI)
+
+_XML_DECL = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n'
+_WRITE_CHUNK = 1 << 16
+
+
+class FontSetter:
+    """
+    Terapkan FontSpec (font_policy) per slot: latin → w:ascii/w:hAnsi + a:latin, ea → w:eastAsia + a:ea,
+    cs → w:cs + a:cs; slot None tidak disentuh. spec.split → run teks campuran (mis. "Hello 世界")
+    dipecah per script: w:hint="eastAsia"/"cs" (WML) atau a:rPr/@lang (DML) per segmen.
+    SpreadsheetML hanya punya satu nama font → spec.primary (name/rFont; scheme dibuang supaya
+    font theme tidak menimpa).
+    apply() → jumlah elemen yang berubah; dry_run=True hanya menghitung elemen yang belum sesuai.
+    """
+
+    def __init__(self, spec: FontSpec):
+        self.spec = spec
+        slots = (("latin", spec.latin), ("ea", spec.ea), ("cs", spec.cs))
+        self._w_set = tuple((a, f) for slot, f in slots if f for a in _W_SLOT_ATTRS[slot])
+        self._w_drop = tuple(a for slot, f in slots if f for a in _W_SLOT_THEME[slot])
+        self._a_set = {_a(slot): f for slot, f in slots if f}
+        self._s_font = spec.primary if any(f for _, f in slots) else None
+
+    def apply(self, root: etree._Element, *, dry_run: bool = False) -> int:
+        changed = 0
+        for el in list(root.iter(*_FONT_TAGS)):
+            changed += self.fix(el, dry_run=dry_run)
+        return changed
+
+    def fix(self, el: etree._Element, *, dry_run: bool = False) -> int:
+        tag = el.tag
+        if tag == W_R:
+            segs = self._split(el, W_RPR, W_T, dry_run)
+            if segs is not None:
+                return 1 if dry_run else self._w_segments(segs)
+        if tag == W_R or tag == W_RPR_DEFAULT:
+            rPr = self._child(el, W_RPR, dry_run)
+            return 1 if rPr is None else self._w_fonts(rPr, create=True, dry_run=dry_run)
+        if tag == W_RPR:
+            # rPr paragraf / style: hanya rFonts yang sudah ada (rPr run diurus lewat w:r)
+            if el.getparent().tag in (W_PPR, W_STYLE):
+                return self._w_fonts(el, create=False, dry_run=dry_run)
+            return 0
+        if tag == A_R:
+            segs = self._split(el, A_RPR, A_T, dry_run)
+            if segs is not None:
+                return 1 if dry_run else self._a_segments(segs)
+        if tag == A_R or tag == A_FLD:
+            rPr = self._child(el, A_RPR, dry_run)
+            return 1 if rPr is None else self._a_fonts(rPr, dry_run)
+        if tag == S_RPR:
+            return self._s_fonts(el, S_RFONT, create=True, dry_run=dry_run)
+        if tag == S_FONT:
+            # <font> di dxf (conditional format) hanya override parsial → nama tidak ditambahkan
+            return self._s_fonts(el, S_NAME, create=el.getparent().tag == S_FONTS, dry_run=dry_run)
+        return self._a_fonts(el, dry_run)
+
+    @staticmethod
+    def _child(parent: etree._Element, tag: str, dry_run: bool) -> Optional[etree._Element]:
+        """rPr selalu child pertama (w:r, a:r, a:fld, w:rPrDefault); None kalau belum ada & dry_run."""
+        el = parent.find(tag)
+        if el is None and not dry_run:
+            el = parent.makeelement(tag)
+            parent.insert(0, el)
+        return el
+
+    # ---- pecah run campuran ----
+    def _split(
+        self, run: etree._Element, rpr_tag: str, t_tag: str, dry_run: bool,
+    ) -> Optional[List[Tuple[str, etree._Element]]]:
+        """
+        Run berisi rPr + satu teks campuran → [(script, run)] sebagai sibling berurutan (run asli jadi
+        segmen pertama; rPr & atribut run disalin). None kalau tidak perlu/tidak bisa dipecah
+        (tab, break, field, dsb. dibiarkan). dry_run → [] (hanya menandai "perlu dipecah").
+        """
+        if not self.spec.split:
+            return None
+        t = None
+        for c in run:
+            if c.tag == t_tag and t is None:
+                t = c
+            elif c.tag != rpr_tag:
+                return None
+        if t is None or len(t) or not t.text or not is_mixed(t.text):
+            return None
+        if dry_run:
+            return []
+        segs = split_scripts(t.text)
+        tail, run.tail = run.tail, None
+        template = copy.deepcopy(run)
+        out: List[Tuple[str, etree._Element]] = []
+        prev = run
+        for k, (script, text) in enumerate(segs):
+            r = run if k == 0 else copy.deepcopy(template)
+            rt = r.find(t_tag)
+            rt.text = text
+            if t_tag == W_T:
+                rt.set(_XML_SPACE, "preserve")
+            if k:
+                prev.addnext(r)
+            prev = r
+            out.append((script, r))
+        prev.tail = tail
+        return out
+
+    def _w_segments(self, segs: List[Tuple[str, etree._Element]]) -> int:
+        for script, r in segs:
+            rPr = self._child(r, W_RPR, False)
+            self._w_fonts(rPr, create=True)
+            rf = rPr.find(W_RFONTS)
+            if script == "latin":
+                if rf is not None:
+                    rf.attrib.pop(W_HINT, None)
+                continue
+            if rf is None:
+                rf = self._w_new_rfonts(rPr)
+            rf.set(W_HINT, "eastAsia" if script == "ea" else "cs")
+        return len(segs)
+
+    def _a_segments(self, segs: List[Tuple[str, etree._Element]]) -> int:
+        lang = self.spec.lang
+        for script, r in segs:
+            rPr = self._child(r, A_RPR, False)
+            self._a_fonts(rPr)
+            if lang and script == self.spec.script:
+                rPr.set("lang", lang)
+            elif lang and script == "latin":
+                rPr.set("lang", LATIN_LANG)
+        return len(segs)
+
+    # ---- slot font ----
+    @staticmethod
+    def _w_new_rfonts(rPr: etree._Element) -> etree._Element:
+        i = 0
+        for c in rPr:
+            if c.tag not in _W_BEFORE_RFONTS:
+                break
+            i += 1
+        rf = rPr.makeelement(W_RFONTS)
+        rPr.insert(i, rf)
+        return rf
+
+    def _w_fonts(self, rPr: etree._Element, *, create: bool, dry_run: bool = False) -> int:
+        if not self._w_set:
+            return 0
+        rf = rPr.find(W_RFONTS)
+        if rf is None:
+            if not create:
+                return 0
+            if dry_run:
+                return 1
+            rf = self._w_new_rfonts(rPr)
+        elif all(rf.get(a) == f for a, f in self._w_set) and not any(a in rf.attrib for a in self._w_drop):
+            return 0
+        elif dry_run:
+            return 1
+        attrib = rf.attrib
+        for a in self._w_drop:
+            attrib.pop(a, None)
+        for a, f in self._w_set:
+            attrib[a] = f
+        return 1
+
+    def _a_fonts(self, rPr: etree._Element, dry_run: bool = False) -> int:
+        want = self._a_set
+        if not want:
+            return 0
+        cur = {c.tag: c for c in rPr if c.tag in _A_FONT_TAGS}
+        if all(t in cur and cur[t].get("typeface") == f for t, f in want.items()):
+            return 0
+        if dry_run:
+            return 1
+        for c in cur.values():
+            rPr.remove(c)
+        # panose/charset lama milik font lain → buat ulang; slot di luar spec dipertahankan.
+        # Urutan skema latin, ea, cs, disisipkan sebelum sym/hlinkClick/.../extLst
+        i = next((k for k, c in enumerate(rPr) if c.tag in _A_AFTER_FONTS), len(rPr))
+        for tag in reversed(_A_FONT_TAGS):
+            if tag in want:
+                rPr.insert(i, rPr.makeelement(tag, {"typeface": want[tag]}))
+            elif tag in cur:
+                rPr.insert(i, cur[tag])
+        return 1
+
+    def _s_fonts(self, el: etree._Element, name_tag: str, *, create: bool, dry_run: bool = False) -> int:
+        """<font>/<rPr> SpreadsheetML: child bebas urutan (xsd:choice) → name/rFont cukup di-set/append."""
+        font = self._s_font
+        if font is None:
+            return 0
+        name = el.find(name_tag)
+        if name is None:
+            if not create:
+                return 0
+        elif name.get("val") == font and el.find(S_SCHEME) is None:
+            return 0
+        if dry_run:
+            return 1
+        # scheme (minor/major) → Excel memakai font theme, bukan name; charset milik font lama
+        for c in [c for c in el if c.tag == S_SCHEME or c.tag == S_CHARSET]:
+            el.remove(c)
+        if name is None:
+            name = etree.SubElement(el, name_tag)
+        name.set("val", font)
+        return 1
+
+
+# ----------------------------- serialisasi inkremental -----------------------------
+def _esc_text(s: str) -> bytes:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").encode("utf-8")
+
+
+def _esc_attr(s: str) -> bytes:
+    return (
+        s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+        .replace("\n", "&#10;").replace("\r", "&#13;").replace("\t", "&#9;").encode("utf-8")
+    )
+
+
+def _qname(tag: str, prefix: Optional[str]) -> bytes:
+    local = tag.rpartition("}")[2]
+    return (f"{prefix}:{local}" if prefix else local).encode("utf-8")
+
+
+def _start_tag(el: etree._Element, nsmap: dict, parent_ns: dict) -> bytes:
+    parts = [b"<", _qname(el.tag, el.prefix)]
+    for prefix, uri in nsmap.items():
+        if parent_ns.get(prefix) != uri:
+            parts.append(b' xmlns:' + prefix.encode() + b'="' if prefix else b' xmlns="')
+            parts.append(_esc_attr(uri) + b'"')
+    if el.attrib:
+        rev = {uri: p for p, uri in nsmap.items() if p}
+        rev[XML_NS] = "xml"
+        for k, v in el.attrib.items():
+            if k[0] == "{":
+                uri, _, local = k[1:].partition("}")
+                k = f"{rev[uri]}:{local}"
+            parts.append(b" " + k.encode("utf-8") + b'="' + _esc_attr(v) + b'"')
+    return b"".join(parts)
+
+
+_XMLNS_RX = re.compile(rb' xmlns(?::([\w.\-]+))?="([^"]*)"')
+
+
+def _unit_bytes(el: etree._Element, parent_ns: dict) -> bytes:
+    """Subtree via lxml (C); deklarasi namespace yang sudah ada di scope parent dibuang dari tag pembuka."""
+    s = etree.tostring(el, encoding="UTF-8", xml_declaration=False, with_tail=False)
+    end = s.index(b">")
+
+    def _keep(m: "re.Match[bytes]") -> bytes:
+        prefix = m.group(1).decode() if m.group(1) else None
+        return b"" if parent_ns.get(prefix) == m.group(2).decode("utf-8") else m.group(0)
+
+    return _XMLNS_RX.sub(_keep, s[:end]) + s[end:]
+
+
+class _Frame:
+    __slots__ = ("el", "qname", "nsmap", "opened", "pending")
+
+    def __init__(self, el: etree._Element, nsmap: dict):
+        self.el = el
+        self.qname = _qname(el.tag, el.prefix)
+        self.nsmap = nsmap
+        self.opened = False                 # '>' tag pembuka sudah ditulis
+        self.pending: Optional[etree._Element] = None  # child terakhir, tail belum ditulis
+
+
+class _Buffered:
+    def __init__(self, dst: BinaryIO):
+        self.dst = dst
+        self.buf: List[bytes] = []
+        self.size = 0
+
+    def write(self, b: bytes) -> None:
+        self.buf.append(b)
+        self.size += len(b)
+        if self.size >= _WRITE_CHUNK:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buf:
+            self.dst.write(b"".join(self.buf))
+            self.buf, self.size = [], 0
+
+
+def rewrite_part(src: BinaryIO, dst: BinaryIO, fix: Callable[[etree._Element], int]) -> int:
+    """
+    iterparse satu part XML → tulis ulang ke dst. Elemen struktur (body, spTree, tbl, ...) ditulis
+    tag per tag; unit (_UNITS) diproses `fix` lalu diserialisasi utuh dan dilepas dari memori.
+    Return total dari `fix`.
+    """
+    out = _Buffered(dst)
+    w = out.write
+    w(_XML_DECL)
+    changed = 0
+    stack: List[_Frame] = []
+    unit: Optional[etree._Element] = None
+
+    def _open(fr: _Frame) -> None:
+        if not fr.opened:
+            w(b">")
+            if fr.el.text:
+                w(_esc_text(fr.el.text))
+            fr.opened = True
+        prev = fr.pending
+        if prev is not None:
+            if prev.tail:
+                w(_esc_text(prev.tail))
+            fr.el.remove(prev)
+            fr.pending = None
+
+    for ev, el in etree.iterparse(
+        src, events=("start", "end", "comment", "pi"), resolve_entities=False, huge_tree=True
+    ):
+        if unit is not None:
+            if ev == "end" and el is unit:
+                changed += fix(el)
+                w(_unit_bytes(el, stack[-1].nsmap if stack else {}))
+                if stack:
+                    stack[-1].pending = el
+                unit = None
+            continue
+
+        if ev == "start":
+            parent_ns: dict = {}
+            if stack:
+                _open(stack[-1])
+                parent_ns = stack[-1].nsmap
+            if el.tag in _UNITS:
+                unit = el
+                continue
+            fr = _Frame(el, el.nsmap)
+            w(_start_tag(el, fr.nsmap, parent_ns))
+            stack.append(fr)
+        elif ev == "end":
+            fr = stack.pop()
+            if not fr.opened and not el.text:
+                w(b"/>")
+            else:
+                _open(fr)
+                w(b"</" + fr.qname + b">")
+            if stack:
+                stack[-1].pending = el
+        else:  # comment / processing instruction
+            if stack:
+                _open(stack[-1])
+                stack[-1].pending = el
+            w(etree.tostring(el, encoding="UTF-8", with_tail=False))
+    out.flush()
+    return changed
+
+
+_PARSER = etree.XMLParser(resolve_entities=False, huge_tree=True, remove_blank_text=False)
+
+
+def rewrite_small_part(src: BinaryIO, dst: BinaryIO, fix: Callable[[etree._Element], int]) -> int:
+    """Part kecil: satu parse + satu tostring (C penuh), tanpa overhead per elemen di Python."""
+    root = etree.fromstring(src.read(), _PARSER)
+    changed = fix(root)
+    dst.write(_XML_DECL)
+    dst.write(etree.tostring(root, encoding="UTF-8", xml_declaration=False))
+    return changed
+
+
+# ----------------------------- ZIP -----------------------------
+_DATA_DESCRIPTOR = 0x08
+
+
+def _without_zip64_extra(extra: bytes) -> bytes:
+    """Buang record ZIP64 (0x0001) dari extra field; FileHeader() menambahkan sendiri kalau perlu."""
+    out, i = [], 0
+    while i + 4 <= len(extra):
+        hid, ln = struct.unpack("<HH", extra[i:i + 4])
+        if hid != 1:
+            out.append(extra[i:i + 4 + ln])
+        i += 4 + ln
+    return b"".join(out)
+
+
+# State internal ZipFile yang dipakai _write_raw (sama dengan ZipFile._open_to_write, CPython 3.8–3.13).
+# Bisa berubah antar versi minor tanpa pemberitahuan → dicek per ZipFile; tidak ada → jalur API publik.
+_RAW_WRITE_ATTRS = ("fp", "_lock", "_writecheck", "_didModify", "start_dir", "filelist", "NameToInfo")
+
+
+def _can_write_raw(zout: zipfile.ZipFile) -> bool:
+    return all(hasattr(zout, a) for a in _RAW_WRITE_ATTRS) and not getattr(zout, "_writing", False)
+
+
+def _write_raw(zout: zipfile.ZipFile, zi: zipfile.ZipInfo, chunks: Iterable[bytes]) -> None:
+    """
+    Tulis entry yang datanya sudah terkompresi (CRC & ukuran sudah diisi di `zi`).
+    zipfile tidak punya API publik untuk ini → hanya dipanggil kalau _can_write_raw(zout).
+    """
+    zi.flag_bits &= ~_DATA_DESCRIPTOR  # CRC & ukuran sudah diketahui → langsung di local header
+    zip64 = zi.file_size > zipfile.ZIP64_LIMIT or zi.compress_size > zipfile.ZIP64_LIMIT
+    with zout._lock:
+        zout.fp.seek(zout.start_dir)
+        zi.header_offset = zout.fp.tell()
+        zout._writecheck(zi)
+        zout._didModify = True
+        zout.fp.write(zi.FileHeader(zip64))
+        for chunk in chunks:
+            zout.fp.write(chunk)
+        zout.start_dir = zout.fp.tell()
+        zout.filelist.append(zi)
+        zout.NameToInfo[zi.filename] = zi
+
+
+def _write_deflated(zout: zipfile.ZipFile, info: zipfile.ZipInfo, comp: bytes, crc: int, size: int) -> None:
+    """Part hasil pool (raw deflate + CRC): tulis mentah, atau inflate + writestr lewat API publik."""
+    zi = _new_info(info)
+    if _can_write_raw(zout):
+        zi.CRC, zi.file_size, zi.compress_size = crc, size, len(comp)
+        _write_raw(zout, zi, (comp,))
+        return
+    zout.writestr(zi, zlib.decompress(comp, -15), compresslevel=ZLIB_LEVEL)
+
+
+def _copy_raw(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """Salin entry apa adanya: data terkompresi + CRC asli, tanpa inflate/deflate."""
+    if not _can_write_raw(zout):
+        # jalur publik: inflate → deflate streaming, memori datar
+        zi = _new_info(info)
+        zi.compress_type = info.compress_type
+        with zin.open(info) as fin, zout.open(zi, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT // 2) as fout:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+        return
+    src = zin.fp
+    src.seek(info.header_offset)
+    head = src.read(zipfile.sizeFileHeader)
+    if len(head) != zipfile.sizeFileHeader or head[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local header: {info.filename}")
+    name_len, extra_len = struct.unpack("<HH", head[26:30])
+    src.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+
+    def _chunks() -> Iterator[bytes]:
+        remaining = info.compress_size
+        while remaining > 0:
+            chunk = src.read(min(1 << 20, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated entry: {info.filename}")
+            yield chunk
+            remaining -= len(chunk)
+
+    zi = copy.copy(info)
+    zi.extra = _without_zip64_extra(info.extra)
+    _write_raw(zout, zi, _chunks())
+
+
+def _new_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    zi = zipfile.ZipInfo(info.filename, info.date_time)
+    zi.compress_type = zipfile.ZIP_DEFLATED
+    zi.external_attr = info.external_attr
+    return zi
+
+
+def _rewrite_entry(data: bytes, spec: FontSpec) -> Tuple[bytes, int, int, int]:
+    """Jalan di proses pool: rewrite satu part + deflate. Return (deflated, crc32, size, changed)."""
+    out = BytesIO()
+    changed = rewrite_small_part(BytesIO(data), out, FontSetter(spec).apply)
+    raw = out.getvalue()
+    co = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15)
+    return co.compress(raw) + co.flush(), zlib.crc32(raw), len(raw), changed
+
+
+def scan_package(src: BinaryIO, spec: FontSpec, *, kind: str, limit: Optional[int] = 1) -> int:
+    """
+    Pre-scan murah: hitung run/properti yang belum sesuai `spec` tanpa menulis apa pun.
+    iterparse difilter tag (C) + elemen dibuang setelah dicek; berhenti begitu hitungan mencapai
+    `limit` (default 1 → cukup tahu "sudah compliant atau belum"; None → hitung semua).
+    """
+    pattern = PART_PATTERNS[kind]
+    setter = FontSetter(spec)
+    found = 0
+    with zipfile.ZipFile(src) as zin:
+        for info in zin.infolist():
+            if not pattern.fullmatch(info.filename):
+                continue
+            with zin.open(info) as fin:
+                found += _scan_part(fin, setter, None if limit is None else limit - found)
+            if limit is not None and found >= limit:
+                break
+    return found
+
+
+def _scan_part(fin: BinaryIO, setter: FontSetter, limit: Optional[int]) -> int:
+    found = 0
+    for _, el in etree.iterparse(
+        fin, events=("end",), tag=_FONT_TAGS + (S_SI,), resolve_entities=False, huge_tree=True
+    ):
+        if el.tag != S_SI:
+            found += setter.fix(el, dry_run=True)
+            if limit is not None and found >= limit:
+                return found
+        if el.tag in _SCAN_CLEAR:
+            el.clear(keep_tail=True)
+            if el.tag == S_SI:
+                # <si> langsung di bawah <sst>: sibling yang sudah dicek ikut dilepas
+                while el.getprevious() is not None:
+                    del el.getparent()[0]
+    return found
+
+
+def rewrite_package(
+    src: BinaryIO, dst: BinaryIO, spec: FontSpec, *, kind: str, pool: Optional[Executor] = None,
+) -> Dict[str, int]:
+    """
+    Tulis ulang paket `kind` ("docx"/"pptx"/"xlsx") dari src ke dst (seekable), urutan entry dipertahankan.
+    Dengan `pool` (dan ≥ POOL_MIN_PARTS part): part kecil di-rewrite + deflate paralel di proses lain,
+    maksimal POOL_WINDOW_PER_WORKER × worker part in-flight; hasil ditulis sesuai urutan entry asli.
+    Part besar tetap streaming di thread pemanggil. Return {"parts", "copied", "runs_changed", "pooled"}.
+    """
+    pattern = PART_PATTERNS[kind]
+    setter = FontSetter(spec)
+    stats = {"parts": 0, "copied": 0, "runs_changed": 0, "pooled": 0}
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w", allowZip64=True) as zout:
+        infos = zin.infolist()
+        todo = [i for i in infos if pattern.fullmatch(i.filename)]
+        futures: Dict[str, Future] = {}
+        ahead: Iterator[zipfile.ZipInfo] = iter(())
+        window = 0
+        if pool is not None and len(todo) >= POOL_MIN_PARTS:
+            ahead = iter([i for i in todo if i.file_size <= STREAM_PART_BYTES])
+            window = max(1, POOL_WINDOW_PER_WORKER * getattr(pool, "_max_workers", 1))
+
+        def _fill() -> None:
+            while len(futures) < window:
+                nxt = next(ahead, None)
+                if nxt is None:
+                    return
+                futures[nxt.filename] = pool.submit(_rewrite_entry, zin.read(nxt), spec)
+
+        try:
+            for info in infos:
+                if not pattern.fullmatch(info.filename):
+                    _copy_raw(zin, zout, info)
+                    stats["copied"] += 1
+                    continue
+                stats["parts"] += 1
+                _fill()
+                fut = futures.pop(info.filename, None)
+                if fut is not None:
+                    comp, crc, size, changed = fut.result()
+                    _write_deflated(zout, info, comp, crc, size)
+                    stats["runs_changed"] += changed
+                    stats["pooled"] += 1
+                    continue
+                if info.file_size > STREAM_PART_BYTES:
+                    # part besar yang sudah compliant: cek murah dulu, lalu salin mentah tanpa rewrite
+                    with zin.open(info) as fin:
+                        if _scan_part(fin, setter, 1) == 0:
+                            _copy_raw(zin, zout, info)
+                            continue
+                zi = _new_info(info)
+                with zin.open(info) as fin, zout.open(zi, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT // 2) as fout:
+                    if info.file_size <= STREAM_PART_BYTES:
+                        stats["runs_changed"] += rewrite_small_part(fin, fout, setter.apply)
+                    else:
+                        stats["runs_changed"] += rewrite_part(fin, fout, setter.apply)
+        finally:
+            for fut in futures.values():
+                fut.cancel()
+    return stats
+
+
+# ----------------------------- process pool -----------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_broken = False
+_pool_lock = threading.Lock()
+
+
+def font_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    ProcessPoolExecutor bersama untuk font pass; None → font pass jalan serial di thread pemanggil.
+    Tidak pernah membuat pool: aman dipanggil dari thread to_thread. Pool dibuat sekali oleh
+    start_font_pool() saat startup.
+    """
+    return _pool
+
+
+def start_font_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Buat pool dan fork semua proses anaknya sekarang. Panggil SEKALI saat startup, sebelum
+    to_thread/klien Azure/aiohttp menjalankan thread: anak fork mewarisi semua lock yang sedang
+    dipegang thread mana pun (logging, SSL, allocator) → bisa deadlock kalau fork dilakukan nanti.
+    Pool fork meluncurkan proses pada submit pertama, jadi pemanasan map() di sini memastikan
+    semua fork terjadi sekarang, bukan saat job berjalan.
+    Setelah pool rusak (shutdown_font_pool(broken=True)) tidak dibuat ulang: font pass tetap
+    serial sampai proses restart. spawn/forkserver bukan alternatif: keduanya meng-import ulang
+    modul __main__ worker (klien blob/queue) di tiap anak.
+    """
+    global _pool
+    if FONT_POOL_WORKERS <= 0 or threading.current_thread() is not threading.main_thread():
+        return _pool
+    with _pool_lock:
+        if _pool is None and not _pool_broken:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+            pool = ProcessPoolExecutor(max_workers=FONT_POOL_WORKERS, mp_context=ctx)
+            list(pool.map(abs, range(FONT_POOL_WORKERS)))
+            _pool = pool
+        return _pool
+
+
+def shutdown_font_pool(*, broken: bool = False) -> None:
+    """
+    Tutup pool (shutdown). broken=True → buang pool rusak tanpa menunggu (boleh dari thread mana pun)
+    dan tandai rusak: start_font_pool() tidak fork ulang, font pass jalan serial.
+    """
+    global _pool, _pool_broken
+    with _pool_lock:
+        pool, _pool = _pool, None
+        _pool_broken = _pool_broken or broken
+    if pool is not None:
+        pool.shutdown(wait=not broken, cancel_futures=True)
+
+
+# ----------------------------- benchmark -----------------------------
+def _synthetic(kind: str, size: int) -> bytes:
+    buf = BytesIO()
+    if kind == "docx":
+        from docx import Document
+
+        doc = Document()
+        for i in range(size):
+            p = doc.add_paragraph(f"Paragraph {i} ")
+            p.add_run("bold run ").bold = True
+            p.add_run("plain run with some more text to translate.")
+            if i % 50 == 0:
+                t = doc.add_table(rows=2, cols=3)
+                for c in t._cells:
+                    c.text = f"cell {i}"
+        doc.sections[0].header.paragraphs[0].text = "Header text"
+        doc.save(buf)
+    else:
+        from pptx import Presentation
+        from pptx.util import Inches
+
+        prs = Presentation()
+        for i in range(size):
+            s = prs.slides.add_slide(prs.slide_layouts[1])
+            s.shapes.title.text = f"Slide {i}"
+            tf = s.placeholders[1].text_frame
+            tf.text = "First bullet"
+            for j in range(5):
+                tf.add_paragraph().text = f"Bullet {j} on slide {i}"
+            tb = s.shapes.add_textbox(Inches(1), Inches(5), Inches(4), Inches(1))
+            tb.text_frame.text = "Text box"
+            s.notes_slide.notes_text_frame.text = f"Speaker notes {i}"
+        prs.save(buf)
+    return buf.getvalue()
+
+
+def _bench(argv: List[str]) -> None:
+    import argparse
+    import time
+
+    from .office_fonts import _set_docx_font_om, _set_pptx_font_om
+
+    ap = argparse.ArgumentParser(description="Benchmark font pass: streaming ZIP vs object model")
+    ap.add_argument("files", nargs="*", help="DOCX/PPTX; kosong → dokumen sintetis")
+    ap.add_argument("--lang", default="ja", help="bahasa target → FontSpec dari font_policy")
+    ap.add_argument("--reps", type=int, default=3)
+    ap.add_argument("--slides", type=int, default=300)
+    ap.add_argument("--paragraphs", type=int, default=5000)
+    args = ap.parse_args(argv)
+
+    cases = []
+    for f in args.files:
+        with open(f, "rb") as fh:
+            cases.append((os.path.basename(f), os.path.splitext(f)[1].lower().lstrip("."), fh.read()))
+    if not cases:
+        cases = [
+            (f"synthetic-{args.slides}-slides.pptx", "pptx", _synthetic("pptx", args.slides)),
+            (f"synthetic-{args.paragraphs}-paras.docx", "docx", _synthetic("docx", args.paragraphs)),
+        ]
+
+    legacy = {"docx": _set_docx_font_om, "pptx": _set_pptx_font_om}
+    cases = [c for c in cases if c[1] in legacy]  # XLSX tidak punya baseline object model
+    pool = start_font_pool()
+    print(f"{'file':<36} {'MB':>6} {'object model s':>15} {'streaming s':>12} {'pool s':>8} {'speedup':>8} {'runs':>7}")
+    for name, kind, data in cases:
+        spec = resolve(args.lang, kind)
+        t_om, t_st, t_pl, runs = [], [], [], 0
+        for _ in range(args.reps):
+            t0 = time.perf_counter()
+            legacy[kind](data, spec.primary)
+            t_om.append(time.perf_counter() - t0)
+            out = BytesIO()
+            t0 = time.perf_counter()
+            runs = rewrite_package(BytesIO(data), out, spec, kind=kind)["runs_changed"]
+            t_st.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            rewrite_package(BytesIO(data), BytesIO(), spec, kind=kind, pool=pool)
+            t_pl.append(time.perf_counter() - t0)
+        om, st, pl = min(t_om), min(t_st), min(t_pl)
+        print(f"{name[:36]:<36} {len(data) / 1e6:>6.1f} {om:>15.3f} {st:>12.3f} {pl:>8.3f} {om / min(st, pl):>7.1f}x {runs:>7}")
+    shutdown_font_pool()
+
+
+if __name__ == "__main__":
+    import sys
+
+    _bench(sys.argv[1:])
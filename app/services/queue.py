@@ -29,6 +29,7 @@ async def enqueue_job(payload: dict, *, visibility_timeout: int | None = None):
     visibility_timeout (detik) memberi jeda sebelum pesan bisa diproses worker
     agar DB commit pasti terlihat. Default None -> gunakan default service.
     """
-    import json
+    import asyncio
     vt = visibility_timeout if visibility_timeout and visibility_timeout > 0 else None
-    _ = _qc.send_message(json.dumps(payload), visibility_timeout=vt)
+    # client sync → jalankan di thread supaya event loop tidak tertahan (dan bisa di-gather)
+    await asyncio.to_thread(_qc.send_message, json.dumps(payload), visibility_timeout=vt)
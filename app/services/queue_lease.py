@@ -0,0 +1,161 @@
+# app/services/queue_lease.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+logger = logging.getLogger("worker.lease")
+
+
+class MessageLease:
+    """
+    Pesan queue yang sedang dipegang worker.
+    pop_receipt selalu yang terbaru (berubah setiap update_message).
+    """
+
+    def __init__(self, msg, visibility: int):
+        self.id: str = msg.id
+        self.pop_receipt: str = msg.pop_receipt
+        self.content = msg.content
+        self.dequeue_count: Optional[int] = getattr(msg, "dequeue_count", None)
+        self.job_id: Optional[str] = None
+        self.renewals = 0
+        self.lost = False
+        self.done = False
+        self.visible_until = time.monotonic() + visibility
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+
+class LeaseManager:
+    """
+    Heartbeat visibility timeout untuk pesan yang sedang diproses.
+    - acquire(msg)  → mulai renew berkala via update_message
+    - complete()    → delete_message (job selesai, sukses/gagal final)
+    - release()     → pesan terlihat lagi setelah `delay` detik (error / shutdown)
+    Lease dianggap hilang (lost) bila pop_receipt ditolak atau visibility sudah lewat.
+    """
+
+    def __init__(self, queue_client, *, visibility: int, renew_every: Optional[float] = None):
+        self._qc = queue_client
+        self.visibility = int(visibility)
+        # renew di pertengahan window supaya 1x gagal masih ada waktu retry
+        self.renew_every = float(renew_every or max(5.0, self.visibility / 2))
+        self._leases: Dict[str, MessageLease] = {}
+        self.metrics: Dict[str, int] = {
+            "acquired": 0,
+            "renewed": 0,
+            "renew_errors": 0,
+            "lost": 0,
+            "completed": 0,
+            "released": 0,
+        }
+
+    # ------------------------------------------------------------------
+    def acquire(self, msg) -> MessageLease:
+        lease = MessageLease(msg, self.visibility)
+        self._leases[lease.id] = lease
+        lease._task = asyncio.create_task(self._heartbeat(lease))
+        self.metrics["acquired"] += 1
+        return lease
+
+    def stats(self) -> dict:
+        return {**self.metrics, "active": len(self._leases)}
+
+    # ------------------------------------------------------------------
+    async def _heartbeat(self, lease: MessageLease) -> None:
+        delay = self.renew_every
+        while not (lease.done or lease.lost):
+            await asyncio.sleep(delay)
+            ok = await self._renew(lease)
+            if ok:
+                delay = self.renew_every
+            else:
+                # retry lebih cepat selama masih ada sisa visibility
+                remaining = lease.visible_until - time.monotonic()
+                delay = max(1.0, min(self.renew_every, remaining / 3))
+
+    async def _renew(self, lease: MessageLease) -> bool:
+        async with lease._lock:
+            if lease.done or lease.lost:
+                return True
+            try:
+                upd = await self._qc.update_message(
+                    lease.id, lease.pop_receipt, visibility_timeout=self.visibility
+                )
+                lease.pop_receipt = upd.pop_receipt
+                lease.visible_until = time.monotonic() + self.visibility
+                lease.renewals += 1
+                self.metrics["renewed"] += 1
+                return True
+            except (ResourceNotFoundError, HttpResponseError) as e:
+                status = getattr(e, "status_code", None)
+                if isinstance(e, ResourceNotFoundError) or status in (400, 404):
+                    self._mark_lost(lease, str(e))
+                    return True
+                self.metrics["renew_errors"] += 1
+                logger.warning("lease_renew_error", extra={"job_id": lease.job_id, "msg_id": lease.id, "error": str(e)})
+            except Exception as e:
+                self.metrics["renew_errors"] += 1
+                logger.warning("lease_renew_error", extra={"job_id": lease.job_id, "msg_id": lease.id, "error": str(e)})
+            if time.monotonic() >= lease.visible_until:
+                self._mark_lost(lease, "visibility expired before renewal")
+            return False
+
+    def _mark_lost(self, lease: MessageLease, reason: str) -> None:
+        if lease.lost:
+            return
+        lease.lost = True
+        self.metrics["lost"] += 1
+        logger.warning("lease_lost", extra={
+            "job_id": lease.job_id, "msg_id": lease.id, "renewals": lease.renewals, "reason": reason,
+        })
+
+    async def _finish(self, lease: MessageLease) -> None:
+        lease.done = True
+        self._leases.pop(lease.id, None)
+        t = lease._task
+        if t and not t.done() and t is not asyncio.current_task():
+            t.cancel()
+            try:
+                await t
+            except BaseException:
+                pass
+
+    # ------------------------------------------------------------------
+    async def complete(self, lease: MessageLease) -> bool:
+        """Hapus pesan dari queue. False bila lease sudah hilang / delete gagal."""
+        await self._finish(lease)
+        async with lease._lock:
+            if lease.lost:
+                return False
+            try:
+                await self._qc.delete_message(lease.id, lease.pop_receipt)
+                self.metrics["completed"] += 1
+                return True
+            except Exception as e:
+                logger.warning("msg_delete_warn", extra={"job_id": lease.job_id, "msg_id": lease.id, "error": str(e)})
+                return False
+
+    async def release(self, lease: MessageLease, *, delay: int = 0) -> bool:
+        """Kembalikan pesan ke queue (terlihat lagi setelah `delay` detik)."""
+        await self._finish(lease)
+        async with lease._lock:
+            if lease.lost:
+                return False
+            try:
+                await self._qc.update_message(lease.id, lease.pop_receipt, visibility_timeout=max(0, int(delay)))
+                self.metrics["released"] += 1
+                return True
+            except Exception as e:
+                logger.warning("lease_release_warn", extra={"job_id": lease.job_id, "msg_id": lease.id, "error": str(e)})
+                return False
+
+    async def release_all(self, *, delay: int = 0) -> int:
+        leases = list(self._leases.values())
+        res = await asyncio.gather(*(self.release(l, delay=delay) for l in leases), return_exceptions=True)
+        return sum(1 for r in res if r is True)
@@ -0,0 +1,299 @@
+# app/services/rate_governor.py
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Mapping, Optional
+
+import aiohttp
+import httpx
+
+logger = logging.getLogger("worker.rate_governor")
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# error koneksi/timeout yang layak dicoba ulang (requests.RequestException sudah turunan OSError)
+RETRY_EXCEPTIONS = (OSError, asyncio.TimeoutError, httpx.TransportError, aiohttp.ClientConnectionError)
+# Request non-idempoten (POST /batches): hanya error fase connect — request pasti belum sampai ke service.
+# Read timeout / 5xx bisa berarti batch sudah dibuat → retry = batch ganda (ditagih dua kali).
+CONNECT_EXCEPTIONS = (
+    httpx.ConnectError, httpx.ConnectTimeout, aiohttp.ClientConnectorError,
+    *((aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, "ConnectionTimeoutError") else ()),
+)
+
+
+def retry_exceptions(idempotent: bool = True) -> tuple:
+    return RETRY_EXCEPTIONS if idempotent else CONNECT_EXCEPTIONS
+
+
+def should_retry_status(status: int, headers: Optional[Mapping[str, str]] = None, *, idempotent: bool = True) -> bool:
+    """
+    Status yang layak dicoba ulang. Non-idempoten: 429 (request ditolak throttling) atau 503 dengan
+    Retry-After (service menolak sebelum memproses); 500/502/504 tidak — hasilnya tidak pasti.
+    """
+    if status not in RETRY_STATUSES:
+        return False
+    if idempotent:
+        return True
+    return status == 429 or (status == 503 and retry_after_s(headers) is not None)
+
+
+class TokenBucket:
+    """Token bucket thread-safe (dipakai kode async & sync bersamaan). rate <= 0 → tanpa batas."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self._tokens = self.capacity
+        self._ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float = 1.0) -> float:
+        """Ambil n token (boleh minus = antre). Return detik yang harus ditunggu caller."""
+        if self.rate <= 0 or n <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+            self._ts = now
+            self._tokens -= n
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class RateGovernor:
+    """
+    Satu governor per layanan (mis. Azure Translator) yang dipakai bersama semua pemanggil di proses:
+    - token bucket request/detik + karakter/detik (antre, bukan gagal)
+    - 429/5xx → hormati Retry-After, kalau tidak ada backoff eksponensial + jitter;
+      throttle juga menahan pemanggil lain (pause global) supaya tidak memperparah
+    - metrics antrean: jumlah yang menunggu, total/max waktu tunggu
+    Pakai `call(send)` / `call_sync(send)` untuk httpx/requests, atau acquire() + backoff() untuk loop sendiri.
+    Request non-idempoten (create batch) → `idempotent=False`: retry dibatasi (lihat should_retry_status).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        requests_per_s: float = 10.0,
+        chars_per_s: float = 0.0,
+        burst_s: float = 1.0,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        observe: Optional[Callable[[float], None]] = None,
+    ):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.observe = observe  # callback durasi antre (ms), mis. ke StageMetrics
+        self._requests = TokenBucket(requests_per_s, requests_per_s * burst_s)
+        self._chars = TokenBucket(chars_per_s, chars_per_s * burst_s)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, float] = {
+            "acquired": 0, "queued": 0, "waiting": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+            "throttled": 0, "retries": 0, "gave_up": 0,
+        }
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, **defaults) -> "RateGovernor":
+        """Konfigurasi dari ENV <prefix>_RPS, _CHARS_PER_S, _BURST_S, _MAX_RETRIES, _BACKOFF_BASE_S, _BACKOFF_MAX_S."""
+        def _f(key: str, default: float) -> float:
+            return float(os.getenv(f"{prefix}_{key}", str(default)))
+        return cls(
+            name,
+            requests_per_s=_f("RPS", defaults.get("requests_per_s", 10.0)),
+            chars_per_s=_f("CHARS_PER_S", defaults.get("chars_per_s", 0.0)),
+            burst_s=_f("BURST_S", defaults.get("burst_s", 1.0)),
+            max_retries=int(_f("MAX_RETRIES", defaults.get("max_retries", 6))),
+            base_delay=_f("BACKOFF_BASE_S", defaults.get("base_delay", 1.0)),
+            max_delay=_f("BACKOFF_MAX_S", defaults.get("max_delay", 60.0)),
+        )
+
+    def stats(self) -> dict:
+        m = dict(self.metrics)
+        m["wait_ms_total"] = round(m["wait_ms_total"], 1)
+        m["wait_ms_max"] = round(m["wait_ms_max"], 1)
+        m["paused_s"] = round(max(0.0, self._paused_until - time.monotonic()), 1)
+        return m
+
+    # ----------------------------- antrean -----------------------------
+    def _reserve(self, chars: int) -> float:
+        wait = max(self._requests.reserve(1), self._chars.reserve(chars))
+        return max(wait, self._paused_until - time.monotonic())
+
+    def _record(self, waited_s: float, queued: bool) -> None:
+        ms = waited_s * 1000 if queued else 0.0
+        with self._lock:
+            self.metrics["acquired"] += 1
+            if queued:
+                self.metrics["queued"] += 1
+                self.metrics["wait_ms_total"] += ms
+                self.metrics["wait_ms_max"] = max(self.metrics["wait_ms_max"], ms)
+        if self.observe is not None:
+            try:
+                self.observe(ms)
+            except Exception:
+                pass
+
+    async def acquire(self, chars: int = 0) -> float:
+        """Tunggu giliran (request + karakter). Return detik menunggu."""
+        t0 = time.monotonic()
+        wait = self._reserve(chars)
+        if wait > 0:
+            with self._lock:
+                self.metrics["waiting"] += 1
+            try:
+                await asyncio.sleep(wait)
+                # pause karena 429 bisa diperpanjang selama kita tidur
+                while self._paused_until > time.monotonic():
+                    await asyncio.sleep(self._paused_until - time.monotonic())
+            finally:
+                with self._lock:
+                    self.metrics["waiting"] -= 1
+        waited = time.monotonic() - t0
+        self._record(waited, wait > 0)
+        return waited
+
+    def acquire_sync(self, chars: int = 0) -> float:
+        t0 = time.monotonic()
+        wait = self._reserve(chars)
+        if wait > 0:
+            with self._lock:
+                self.metrics["waiting"] += 1
+            try:
+                time.sleep(wait)
+                while self._paused_until > time.monotonic():
+                    time.sleep(self._paused_until - time.monotonic())
+            finally:
+                with self._lock:
+                    self.metrics["waiting"] -= 1
+        waited = time.monotonic() - t0
+        self._record(waited, wait > 0)
+        return waited
+
+    # ----------------------------- retry -------------------------------
+    def retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Detik sebelum percobaan ulang ke-`attempt` (0-based); None kalau jatah retry habis."""
+        if attempt >= self.max_retries:
+            self.metrics["gave_up"] += 1
+            return None
+        self.metrics["retries"] += 1
+        if retry_after is not None:
+            return min(retry_after, self.max_delay) + random.uniform(0, 0.25 * self.base_delay)
+        # equal jitter: acak di [0.5, 1] × base·2^attempt
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(cap / 2, cap)
+
+    def note_throttle(self, delay: float) -> None:
+        """429/503 dari service → tahan semua pemanggil governor ini selama `delay` detik."""
+        self.metrics["throttled"] += 1
+        until = time.monotonic() + delay
+        with self._lock:
+            self._paused_until = max(self._paused_until, until)
+
+    async def backoff(self, attempt: int, *, status: Optional[int] = None,
+                      headers: Optional[Mapping[str, str]] = None) -> bool:
+        delay = self._plan_backoff(attempt, status, headers)
+        if delay is None:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    def backoff_sync(self, attempt: int, *, status: Optional[int] = None,
+                     headers: Optional[Mapping[str, str]] = None) -> bool:
+        delay = self._plan_backoff(attempt, status, headers)
+        if delay is None:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _plan_backoff(self, attempt: int, status: Optional[int], headers: Optional[Mapping[str, str]]) -> Optional[float]:
+        delay = self.retry_delay(attempt, retry_after_s(headers))
+        if delay is None:
+            return None
+        if status in (429, 503):
+            self.note_throttle(delay)
+        logger.warning("rate_governor_retry", extra={
+            "governor": self.name, "attempt": attempt + 1, "status": status, "delay_s": round(delay, 2),
+        })
+        return delay
+
+    # ----------------------------- helper tingkat tinggi ---------------
+    async def call(self, send: Callable[[], Awaitable], *, chars: int = 0, idempotent: bool = True):
+        """
+        `send()` → response httpx (punya status_code & headers). Retry 429/5xx & error koneksi
+        (idempotent=False: hanya 429, 503+Retry-After dan error connect).
+        Response terakhir dikembalikan apa adanya; caller tetap raise_for_status().
+        """
+        retry_on = retry_exceptions(idempotent)
+        attempt = 0
+        while True:
+            await self.acquire(chars)
+            try:
+                resp = await send()
+            except retry_on:
+                if await self.backoff(attempt):
+                    attempt += 1
+                    continue
+                raise
+            if should_retry_status(resp.status_code, resp.headers, idempotent=idempotent) and await self.backoff(
+                attempt, status=resp.status_code, headers=resp.headers
+            ):
+                attempt += 1
+                continue
+            return resp
+
+    def call_sync(self, send: Callable[[], object], *, chars: int = 0, idempotent: bool = True):
+        """Versi sync untuk `requests` (mis. skrip yang jalan di thread)."""
+        retry_on = retry_exceptions(idempotent)
+        attempt = 0
+        while True:
+            self.acquire_sync(chars)
+            try:
+                resp = send()
+            except retry_on:
+                if self.backoff_sync(attempt):
+                    attempt += 1
+                    continue
+                raise
+            if should_retry_status(resp.status_code, resp.headers, idempotent=idempotent) and self.backoff_sync(
+                attempt, status=resp.status_code, headers=resp.headers
+            ):
+                attempt += 1
+                continue
+            return resp
+
+
+def retry_after_s(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Retry-After (detik atau HTTP-date) / retry-after-ms / x-ms-retry-after-ms → detik."""
+    if not headers:
+        return None
+    for key in ("retry-after-ms", "x-ms-retry-after-ms"):
+        v = headers.get(key)
+        if v:
+            try:
+                return float(v) / 1000.0
+            except ValueError:
+                pass
+    v = headers.get("Retry-After") or headers.get("retry-after")
+    if not v:
+        return None
+    try:
+        return max(0.0, float(v))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(v).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Governor bersama untuk semua panggilan Azure Translator di proses ini (worker, translator.py, large_translation)
+translator_governor = RateGovernor.from_env("translator", "TRANSLATOR", requests_per_s=10.0, chars_per_s=33000.0)
@@ -0,0 +1,139 @@
+# app/services/result_cache.py
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from typing import Dict, Optional
+
+from app.services import blob_aio
+
+logger = logging.getLogger("worker.result_cache")
+
+
+def cache_key(content_sha256: str, source_lang: str, target_lang: str, *, glossary: str = "", fonts: str = "",
+              fmt: str = "") -> str:
+    """
+    Key content-addressed: hash dokumen + pasangan bahasa + fingerprint glossary statis
+    + versi font pass + format output (".docx" vs ".pdf" dari jalur dokumen besar).
+    Ganti salah satunya → key baru (entry lama kedaluwarsa sendiri).
+    """
+    h = hashlib.sha256()
+    for part in (content_sha256, (source_lang or "auto").lower(), (target_lang or "en").lower(), glossary, fonts,
+                 (fmt or "").lower()):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Cache hasil terjemahan final (setelah font pass) di blob `<prefix><key>`.
+    - lookup(key)               → nama blob cache / None (sekalian update `last_hit`)
+    - materialize(name, dst)    → copy server-side ke path output job
+    - store(key, src)           → copy server-side hasil job ke cache
+    - sweep()                   → hapus entry lewat TTL, lalu LRU sampai di bawah max_bytes
+    """
+
+    def __init__(self, *, container: str, prefix: str = "cache/", ttl_s: float = 14 * 86400,
+                 max_bytes: int = 20 * 1024 ** 3, enabled: bool = True):
+        self.container = container
+        self.prefix = prefix
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.metrics: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "store_errors": 0, "evicted": 0}
+
+    def _name(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def stats(self) -> dict:
+        total = self.metrics["hits"] + self.metrics["misses"]
+        return {**self.metrics, "hit_ratio": round(self.metrics["hits"] / total, 3) if total else 0.0}
+
+    # ------------------------------------------------------------------
+    async def lookup(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        name = self._name(key)
+        try:
+            hit = await self._touch(name)
+        except Exception as e:
+            logger.warning("result_cache_lookup_error", extra={"key": key, "error": str(e)})
+            hit = False
+        self.metrics["hits" if hit else "misses"] += 1
+        return name if hit else None
+
+    async def _touch(self, name: str) -> bool:
+        props = await blob_aio.properties(self.container, name)
+        if props is None:
+            return False
+        meta = props["metadata"]
+        now = time.time()
+        if now - _last_hit(meta, props["last_modified"]) > self.ttl_s:
+            return False
+        meta["last_hit"] = str(int(now))
+        try:
+            await blob_aio.set_metadata(self.container, name, meta)
+        except Exception:
+            pass  # urutan LRU sedikit meleset tidak masalah
+        return True
+
+    async def materialize(self, name: str, dst_container: str, dst_name: str) -> str:
+        return await blob_aio.copy(self.container, name, dst_container, dst_name)
+
+    async def store(self, key: str, src_container: str, src_name: str) -> None:
+        if not self.enabled:
+            return
+        try:
+            await blob_aio.copy(
+                src_container, src_name, self.container, self._name(key),
+                metadata={"last_hit": str(int(time.time()))},
+            )
+            self.metrics["stores"] += 1
+        except Exception as e:
+            self.metrics["store_errors"] += 1
+            logger.warning("result_cache_store_error", extra={"key": key, "error": str(e)})
+
+    # ------------------------------------------------------------------
+    async def sweep(self) -> int:
+        if not self.enabled:
+            return 0
+        await blob_aio.ensure_container(self.container)
+        now = time.time()
+        entries = []
+        expired = []
+        for b in await blob_aio.list_blobs(self.container, self.prefix, metadata=True):
+            last = _last_hit(b.metadata or {}, b.last_modified)
+            if now - last > self.ttl_s:
+                expired.append(b.name)
+            else:
+                entries.append((last, b.size or 0, b.name))
+
+        total = sum(size for _, size, _ in entries)
+        entries.sort()  # paling lama tidak dipakai di depan
+        victims = list(expired)
+        for last, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            victims.append(name)
+            total -= size
+
+        n = 0
+        for name in victims:
+            try:
+                n += await blob_aio.delete_blob(self.container, name)
+            except Exception as e:
+                logger.warning("result_cache_evict_error", extra={"blob_name": name, "error": str(e)})
+        self.metrics["evicted"] += n
+        logger.info("result_cache_sweep", extra={
+            "expired": len(expired), "evicted": n, "bytes_after": total, "entries": len(entries) + len(expired) - n,
+        })
+        return n
+
+
+def _last_hit(meta: dict, last_modified) -> float:
+    try:
+        return float(meta.get("last_hit") or "")
+    except ValueError:
+        return last_modified.timestamp() if last_modified else 0.0
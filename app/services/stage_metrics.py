@@ -0,0 +1,134 @@
+# app/services/stage_metrics.py
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger("worker.stage_metrics")
+
+_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Durasi (ms) satu stage: count/sum/max total + reservoir sampel terakhir untuk p50/p95/p99."""
+
+    def __init__(self, window: int = 2048):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float, ok: bool = True) -> None:
+        self.samples.append(ms)
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if not ok:
+            self.errors += 1
+
+    def quantiles(self) -> Dict[str, float]:
+        data = sorted(self.samples)
+        if not data:
+            return {f"p{int(q * 100)}": 0.0 for q in _QUANTILES}
+        return {f"p{int(q * 100)}": round(data[min(len(data) - 1, int(q * len(data)))], 1) for q in _QUANTILES}
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "max": round(self.max_ms, 1),
+            **self.quantiles(),
+        }
+
+
+class StageMetrics:
+    """
+    Span per stage (fetch, glossary, preflight, submit, translate_wait, font_pass, onedrive, db, ...)
+    dengan korelasi job_id di log, diagregasi jadi histogram in-process.
+    - span(stage, job_id=...)  → async context manager; exception tetap diteruskan (span ok=False)
+    - observe(stage, ms, ok)   → catat durasi yang diukur sendiri
+    - snapshot() / render()    → JSON / format teks Prometheus (summary)
+    - serve(port)              → endpoint lokal GET /metrics (teks) & /metrics.json
+    """
+
+    def __init__(self, *, window: int = 2048, log_spans: bool = True):
+        self.window = window
+        self.log_spans = log_spans
+        self.stages: Dict[str, Histogram] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def observe(self, stage: str, ms: float, ok: bool = True) -> None:
+        h = self.stages.get(stage)
+        if h is None:
+            h = self.stages[stage] = Histogram(self.window)
+        h.observe(ms, ok)
+
+    @asynccontextmanager
+    async def span(self, stage: str, *, job_id: Optional[str] = None, **extra):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self.observe(stage, ms, ok)
+            if self.log_spans:
+                logger.info("stage_span", extra={"job_id": job_id, "stage": stage, "ok": ok, "ms": round(ms, 1), **extra})
+
+    def snapshot(self) -> dict:
+        return {name: h.snapshot() for name, h in sorted(self.stages.items())}
+
+    def render(self) -> str:
+        lines = [
+            "# HELP worker_stage_ms Durasi stage worker (ms).",
+            "# TYPE worker_stage_ms summary",
+        ]
+        for name, h in sorted(self.stages.items()):
+            qs = h.quantiles()
+            for q in _QUANTILES:
+                lines.append(f'worker_stage_ms{{stage="{name}",quantile="{q}"}} {qs[f"p{int(q * 100)}"]}')
+            lines.append(f'worker_stage_ms_sum{{stage="{name}"}} {round(h.total_ms, 1)}')
+            lines.append(f'worker_stage_ms_count{{stage="{name}"}} {h.count}')
+            lines.append(f'worker_stage_errors_total{{stage="{name}"}} {h.errors}')
+        return "\n".join(lines) + "\n"
+
+    # ------------------------------------------------------------------
+    async def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """HTTP minimal (tanpa dependensi) untuk scrape lokal; cukup GET satu path per koneksi."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info("metrics_server_start", extra={"host": host, "port": port})
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            parts = head.split(b" ", 2)
+            path = parts[1].decode("latin-1").split("?", 1)[0] if len(parts) > 1 else ""
+            if path == "/metrics":
+                status, ctype, body = "200 OK", "text/plain; version=0.0.4", self.render().encode()
+            elif path == "/metrics.json":
+                status, ctype, body = "200 OK", "application/json", json.dumps(self.snapshot()).encode()
+            else:
+                status, ctype, body = "404 Not Found", "text/plain", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception:
+            pass
+        finally:
+            writer.close()
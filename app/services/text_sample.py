@@ -0,0 +1,175 @@
+# app/services/text_sample.py
+from __future__ import annotations
+
+import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from typing import BinaryIO, Iterator, List
+
+from lxml import etree
+
+# Sampel teks untuk glossary otomatis (LLM). Dulu `data[:32768].decode()` → untuk DOCX/PPTX/XLSX/PDF
+# isinya byte terkompresi (token terbuang). Di sini teks asli diambil per format, streaming & dibatasi.
+SAMPLE_BYTES = int(os.getenv("GLOSSARY_SAMPLE_BYTES", "32768"))
+SAMPLE_PDF_PAGES = int(os.getenv("GLOSSARY_SAMPLE_PDF_PAGES", "5"))
+_MIN_SEGMENT = 3
+_PDF_BYTES_IN_RAM = 32 * 1024 * 1024  # PDF lebih besar → file temp (PyMuPDF baca lazy dari disk)
+
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+_S = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+# part → (tag paragraf, tag teks)
+_OOXML_PARTS = {
+    "docx": (f"{{{_W}}}p", f"{{{_W}}}t"),
+    "pptx": (f"{{{_A}}}p", f"{{{_A}}}t"),
+    "xlsx": (f"{{{_S}}}si", f"{{{_S}}}t"),
+    "xlsx_inline": (f"{{{_S}}}is", f"{{{_S}}}t"),  # workbook tanpa sharedStrings (inlineStr di sheet)
+}
+_SLIDE_RX = re.compile(r"^ppt/slides/slide(\d+)\.xml$")
+_SHEET_RX = re.compile(r"^xl/worksheets/sheet(\d+)\.xml$")
+_WS_RX = re.compile(r"\s+")
+
+
+def extract_sample(fp: BinaryIO, *, budget_bytes: int = SAMPLE_BYTES,
+                   pdf_pages: int = SAMPLE_PDF_PAGES) -> str:
+    """
+    Teks representatif dari dokumen (DOCX/PPTX/XLSX/PDF/teks biasa; dikenali dari magic bytes), paragraf unik
+    sesuai urutan dokumen, total ≤ budget_bytes (UTF-8). Tidak pernah raise → "" kalau gagal.
+    Memori terbatas: part OOXML di-iterparse dan elemen dibuang setelah dibaca; PDF hanya N halaman awal.
+    Sinkron (CPU) → panggil lewat asyncio.to_thread dari kode async.
+    """
+    try:
+        fp.seek(0)
+        head = fp.read(8)
+        fp.seek(0)
+        if head.startswith(b"PK\x03\x04"):
+            segments = _ooxml_segments(fp)
+        elif head.startswith(b"%PDF"):
+            segments = _pdf_segments(fp, pdf_pages)
+        else:
+            segments = _plain_segments(fp, budget_bytes)
+        return _collect(segments, budget_bytes)
+    except Exception:
+        return ""
+    finally:
+        try:
+            fp.seek(0)
+        except Exception:
+            pass
+
+
+def _collect(segments: Iterator[str], budget_bytes: int) -> str:
+    seen = set()
+    out: List[str] = []
+    used = 0
+    for seg in segments:
+        seg = _WS_RX.sub(" ", seg).strip()
+        if len(seg) < _MIN_SEGMENT or not any(c.isalpha() for c in seg):
+            continue
+        key = seg.casefold()
+        if key in seen:
+            continue
+        seen.add(key)
+        size = len(seg.encode("utf-8")) + 1
+        if used + size > budget_bytes:
+            break
+        out.append(seg)
+        used += size
+    return "\n".join(out)
+
+
+# ----------------------------- OOXML -----------------------------------
+def _ooxml_segments(fp: BinaryIO) -> Iterator[str]:
+    with zipfile.ZipFile(fp) as zf:
+        names = set(zf.namelist())
+        slides = _numbered(names, _SLIDE_RX)
+        if "word/document.xml" in names:
+            parts, kind = ["word/document.xml"], "docx"
+        elif slides:
+            parts, kind = slides, "pptx"
+        elif "xl/sharedStrings.xml" in names:
+            parts, kind = ["xl/sharedStrings.xml"], "xlsx"
+        elif "xl/workbook.xml" in names:
+            parts, kind = _numbered(names, _SHEET_RX), "xlsx_inline"
+        else:
+            return
+        p_tag, t_tag = _OOXML_PARTS[kind]
+        for part in parts:
+            with zf.open(part) as stream:
+                yield from _iter_paragraphs(stream, p_tag, t_tag)
+
+
+def _numbered(names, rx) -> List[str]:
+    found = [(int(m.group(1)), n) for n in names if (m := rx.match(n))]
+    return [n for _, n in sorted(found)]
+
+
+def _iter_paragraphs(stream, p_tag: str, t_tag: str) -> Iterator[str]:
+    buf: List[str] = []
+    for _, el in etree.iterparse(stream, events=("end",), tag=(p_tag, t_tag),
+                                 huge_tree=True, resolve_entities=False, no_network=True):
+        if el.tag == t_tag:
+            if el.text:
+                buf.append(el.text)
+            continue
+        if buf:
+            yield "".join(buf)
+            buf = []
+        # buang paragraf yang sudah dibaca supaya pohon tidak tumbuh
+        el.clear()
+        parent = el.getparent()
+        if parent is not None:
+            while el.getprevious() is not None:
+                del parent[0]
+    if buf:
+        yield "".join(buf)
+
+
+# ----------------------------- PDF -------------------------------------
+def _pdf_segments(fp: BinaryIO, pages: int) -> Iterator[str]:
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        yield from _pypdf_segments(fp, pages)
+        return
+
+    fp.seek(0, io.SEEK_END)
+    size = fp.tell()
+    fp.seek(0)
+    tmp = None
+    try:
+        if size <= _PDF_BYTES_IN_RAM:
+            doc = fitz.open(stream=fp.read(), filetype="pdf")
+        else:
+            tmp = tempfile.NamedTemporaryFile(suffix=".pdf")
+            shutil.copyfileobj(fp, tmp, 1024 * 1024)
+            tmp.flush()
+            doc = fitz.open(tmp.name, filetype="pdf")
+        try:
+            for page in doc.pages(0, min(pages, doc.page_count)):
+                for block in page.get_text("blocks"):
+                    if len(block) > 6 and block[6] == 0:  # block teks (bukan gambar)
+                        yield block[4]
+        finally:
+            doc.close()
+    finally:
+        if tmp is not None:
+            tmp.close()
+
+
+def _pypdf_segments(fp: BinaryIO, pages: int) -> Iterator[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(fp)  # lazy per halaman
+    for page in reader.pages[:pages]:
+        yield from (page.extract_text() or "").split("\n")
+
+
+# ----------------------------- teks biasa ------------------------------
+def _plain_segments(fp: BinaryIO, budget_bytes: int) -> Iterator[str]:
+    data = fp.read(max(budget_bytes * 2, 4096))
+    yield from data.decode("utf-8", errors="ignore").splitlines()
@@ -2,11 +2,13 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import time
-from typing import Optional, Tuple, Dict, Any, List
+from typing import Optional, Tuple, Dict, Any, List, Mapping
 
 from ..config import settings
 from .http import http_client
+from .rate_governor import retry_exceptions, should_retry_status, translator_governor
 
 # Prioritaskan endpoint Document Translator
 _ENDPOINT = (
@@ -35,6 +37,36 @@ _printed_once = False
 _last_working_url: Optional[str] = None
 
 
+async def _send(
+    sess, method: str, url: str, *, chars: int = 0, idempotent: Optional[bool] = None, **kw,
+) -> Tuple[int, Mapping[str, str], bytes]:
+    """
+    Request lewat governor Translator bersama: antre token bucket, retry 429/5xx (Retry-After) + jitter.
+    POST (create batch) dianggap non-idempoten kecuali `idempotent=True`: retry hanya 429/503+Retry-After
+    dan error connect, supaya batch tidak terbuat dua kali.
+    """
+    if idempotent is None:
+        idempotent = method.upper() != "POST"
+    retry_on = retry_exceptions(idempotent)
+    attempt = 0
+    while True:
+        await translator_governor.acquire(chars)
+        try:
+            async with sess.request(method, url, **kw) as resp:
+                status, headers, body = resp.status, resp.headers, await resp.read()
+        except retry_on:
+            if await translator_governor.backoff(attempt):
+                attempt += 1
+                continue
+            raise
+        if should_retry_status(status, headers, idempotent=idempotent) and await translator_governor.backoff(
+            attempt, status=status, headers=headers
+        ):
+            attempt += 1
+            continue
+        return status, headers, body
+
+
 async def _create_batch_internal(sess, json_body: dict) -> Tuple[str, str]:
     global _last_working_url, _printed_once
     candidates = [
@@ -51,21 +83,21 @@ async def _create_batch_internal(sess, json_body: dict) -> Tuple[str, str]:
         else:
             print("[translator] try     :", url)
 
-        async with sess.post(url, json=json_body, headers=_HEADERS) as resp:
-            if resp.status == 404:
-                tried.append(f"404:{url}")
-                continue
-            if resp.status >= 300:
-                txt = await resp.text()
-                raise RuntimeError(f"Create batch failed: {resp.status} {txt} | url={url}")
+        status, headers, body = await _send(sess, "POST", url, json=json_body, headers=_HEADERS)
+        if status == 404:
+            tried.append(f"404:{url}")
+            continue
+        if status >= 300:
+            txt = body.decode("utf-8", errors="replace")
+            raise RuntimeError(f"Create batch failed: {status} {txt} | url={url}")
 
-            op_loc = resp.headers.get("Operation-Location") or resp.headers.get("operation-location")
-            if not op_loc:
-                txt = await resp.text()
-                raise RuntimeError(f"Missing Operation-Location | url={url} | body={txt}")
+        op_loc = headers.get("Operation-Location") or headers.get("operation-location")
+        if not op_loc:
+            txt = body.decode("utf-8", errors="replace")
+            raise RuntimeError(f"Missing Operation-Location | url={url} | body={txt}")
 
-            _last_working_url = url
-            return op_loc, url
+        _last_working_url = url
+        return op_loc, url
 
     raise RuntimeError(f"All candidate URLs gave 404. Tried: {', '.join(tried)}")
 
@@ -85,21 +117,21 @@ async def _post_with_fallback(json_body: dict) -> tuple[str, str]:
         else:
             print("[translator] try     :", url)
 
-        async with sess.post(url, json=json_body, headers=_HEADERS) as resp:
-            if resp.status == 404:
-                tried.append(f"404:{url}")
-                continue
-            if resp.status >= 300:
-                txt = await resp.text()
-                raise RuntimeError(f"Create batch failed: {resp.status} {txt} | url={url}")
+        status, headers, body = await _send(sess, "POST", url, json=json_body, headers=_HEADERS)
+        if status == 404:
+            tried.append(f"404:{url}")
+            continue
+        if status >= 300:
+            txt = body.decode("utf-8", errors="replace")
+            raise RuntimeError(f"Create batch failed: {status} {txt} | url={url}")
 
-            op_loc = resp.headers.get("Operation-Location") or resp.headers.get("operation-location")
-            if not op_loc:
-                txt = await resp.text()
-                raise RuntimeError(f"Missing Operation-Location | url={url} | body={txt}")
+        op_loc = headers.get("Operation-Location") or headers.get("operation-location")
+        if not op_loc:
+            txt = body.decode("utf-8", errors="replace")
+            raise RuntimeError(f"Missing Operation-Location | url={url} | body={txt}")
 
-            _last_working_url = url
-            return op_loc, url
+        _last_working_url = url
+        return op_loc, url
 
     raise RuntimeError(f"Semua kandidat URL 404. Dicoba: {', '.join(tried)}")
 
@@ -133,26 +165,28 @@ async def create_batch(
 
     body = {"inputs": [{"source": source, "targets": [target], "storageType": "File"}]}
 
-    async with http_client() as sess:
-        op_loc, used = await _create_batch_internal(sess, body)
-        return op_loc, used
+    sess = await http_client.get_session()
+    op_loc, used = await _create_batch_internal(sess, body)
+    return op_loc, used
 
 
 async def poll_batch(operation_location: str, *, timeout_s: int = 3600, interval_s: float = 3.0) -> Dict[str, Any]:
     """Polls a batch job until it completes, returns the job JSON."""
-    async with http_client() as sess:
-        start = time.time()
-        delay = interval_s
-        while True:
-            async with sess.get(operation_location, headers=_HEADERS) as resp:
-                data = await resp.json()
-            status = (data.get("status") or data.get("Status") or "").capitalize()
-            if status in {"Succeeded", "Failed", "Cancelled"}:
-                return data
-            await asyncio.sleep(delay)
-            delay = min(delay * 1.75, 20.0)
-            if time.time() - start > timeout_s:
-                raise TimeoutError("Batch polling timed out")
+    sess = await http_client.get_session()
+    start = time.time()
+    delay = interval_s
+    while True:
+        code, _, body = await _send(sess, "GET", operation_location, headers=_HEADERS)
+        if code >= 300:
+            raise RuntimeError(f"Polling failed: {code} {body.decode('utf-8', errors='replace')}")
+        data = json.loads(body)
+        status = (data.get("status") or data.get("Status") or "").capitalize()
+        if status in {"Succeeded", "Failed", "Cancelled"}:
+            return data
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.75, 20.0)
+        if time.time() - start > timeout_s:
+            raise TimeoutError("Batch polling timed out")
 
 
 async def translate_texts(
@@ -173,12 +207,18 @@ async def translate_texts(
 
     body = [{"Text": t if t is not None else ""} for t in texts]
 
-    async with http_client() as sess:
-        async with sess.post(url, headers={**_HEADERS, "Content-Type": "application/json"}, json=body) as resp:
-            if resp.status >= 300:
-                txt = await resp.text()
-                raise RuntimeError(f"Text translate failed: {resp.status} {txt}")
-            data = await resp.json()
+    sess = await http_client.get_session()
+    # Text Translation tanpa state di server → aman di-retry seperti GET
+    status, _, raw = await _send(
+        sess, "POST", url,
+        chars=sum(len(t or "") for t in texts),
+        idempotent=True,
+        headers={**_HEADERS, "Content-Type": "application/json"},
+        json=body,
+    )
+    if status >= 300:
+        raise RuntimeError(f"Text translate failed: {status} {raw.decode('utf-8', errors='replace')}")
+    data = json.loads(raw)
 
     out: List[str] = []
     for item in data:
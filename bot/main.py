@@ -39,9 +39,14 @@ OAUTH_CONNECTION    = os.environ.get("OAUTH_CONNECTION_NAME", "msgraph").strip()
 
 TRANSLATOR_API      = os.environ.get("TRANSLATOR_API", "http://localhost:8080").rstrip("/")
 UPLOAD_CREATE_PATH  = os.environ.get("UPLOAD_CREATE_PATH", "/upload/create").strip()
+UPLOAD_INIT_PATH    = os.environ.get("UPLOAD_INIT_PATH", "/upload/init").strip()
+UPLOAD_FINALIZE_PATH= os.environ.get("UPLOAD_FINALIZE_PATH", "/upload/finalize").strip()
+BOT_DIRECT_UPLOAD   = os.environ.get("BOT_DIRECT_UPLOAD", "1") == "1"
 JOB_DETAIL_PATH     = os.environ.get("JOB_DETAIL_PATH", "/jobs").strip()
 
 BOT_MAX_POLL_SEC    = int(os.environ.get("BOT_MAX_POLL_SEC", "1800"))
+# File > 40 MB diproses worker lewat split-translate-merge (hasil PDF), jadi batas upload bot bisa lebih besar
+BOT_MAX_UPLOAD_MB   = float(os.environ.get("BOT_MAX_UPLOAD_MB", "120"))
 
 PUBLIC_BASE_URL     = os.environ.get("PUBLIC_BASE_URL", "").rstrip("/")
 TEAMS_JWT_SECRET    = os.environ.get("TEAMS_JWT_SECRET", "dev-secret")
@@ -887,6 +892,77 @@ async def _post_upload_create(bearer: str, filename: str, content_type: str, dat
                 raise RuntimeError(f"upload/create: no job_ids in response: {txt}")
             return job_ids[0]
 
+class _DirectUploadUnsupported(RuntimeError):
+    pass
+
+async def _post_upload_direct(bearer: str, filename: str, content_type: str, data: bytes, src: str, tgt: str, user_id: str) -> str:
+    """init → PUT block langsung ke blob (SAS) → finalize. Byte file tidak lewat API backend."""
+    headers: Dict[str, str] = {}
+    if bearer:
+        headers["Authorization"] = f"Bearer {bearer}"
+    timeout = aiohttp.ClientTimeout(total=600)
+    t0 = time.perf_counter()
+    async with aiohttp.ClientSession(timeout=timeout) as sess:
+        form = aiohttp.FormData()
+        form.add_field("filename", filename)
+        form.add_field("size", str(len(data)))
+        form.add_field("source_lang", str(src or "auto"))
+        form.add_field("target_lang", str(tgt or "en"))
+        form.add_field("user_id", str(user_id or "unknown"))
+        async with sess.post(f"{TRANSLATOR_API}{UPLOAD_INIT_PATH}", data=form, headers=headers) as r:
+            txt = await r.text()
+            if r.status in (404, 405):
+                raise _DirectUploadUnsupported(f"upload/init not available: {r.status}")
+            if r.status != 200:
+                raise RuntimeError(f"upload/init failed: {r.status} {txt}")
+            init = json.loads(txt)
+
+        job_id = init["job_id"]
+        upload_url = init["upload_url"]
+        block_size = int(init.get("block_size") or 8 * 1024 * 1024)
+        block_ids: List[str] = []
+        for i, off in enumerate(range(0, max(1, len(data)), block_size)):
+            block_id = base64.b64encode(f"{i:08d}".encode()).decode()
+            block_ids.append(block_id)
+            async with sess.put(
+                f"{upload_url}&comp=block&blockid={block_id}", data=data[off:off + block_size],
+            ) as r:
+                if r.status not in (200, 201):
+                    raise RuntimeError(f"put block failed: {r.status} {(await r.text())[:300]}")
+        xml = "<?xml version=\"1.0\" encoding=\"utf-8\"?><BlockList>" + "".join(
+            f"<Latest>{b}</Latest>" for b in block_ids
+        ) + "</BlockList>"
+        async with sess.put(
+            f"{upload_url}&comp=blocklist", data=xml.encode(),
+            headers={"Content-Type": "application/xml", "x-ms-blob-content-type": content_type or "application/octet-stream"},
+        ) as r:
+            if r.status not in (200, 201):
+                raise RuntimeError(f"put block list failed: {r.status} {(await r.text())[:300]}")
+
+        form = aiohttp.FormData()
+        form.add_field("job_id", job_id)
+        form.add_field("user_id", str(user_id or "unknown"))
+        async with sess.post(f"{TRANSLATOR_API}{UPLOAD_FINALIZE_PATH}", data=form, headers=headers) as r:
+            txt = await r.text()
+            if r.status != 200:
+                raise RuntimeError(f"upload/finalize failed: {r.status} {txt}")
+    logger.info("backend.upload_direct.ok", extra={
+        "duration_ms": round((time.perf_counter()-t0)*1000, 2), "job_id": job_id,
+        "blocks": len(block_ids), "bytes": len(data), "file_name": filename, "src": src, "tgt": tgt,
+    })
+    return job_id
+
+async def _submit_upload(bearer: str, filename: str, content_type: str, data: bytes, src: str, tgt: str, user_id: str) -> str:
+    """Utamakan upload langsung ke storage; backend lama (tanpa /upload/init) → /upload/create."""
+    if BOT_DIRECT_UPLOAD:
+        try:
+            return await _post_upload_direct(bearer, filename, content_type, data, src, tgt, user_id)
+        except _DirectUploadUnsupported as e:
+            # hanya kalau /upload/init memang tidak ada: error lain bisa terjadi setelah init membuat job,
+            # fallback di titik itu meninggalkan job UPLOADING + blob yatim
+            logger.info("backend.upload_direct.unsupported", extra={"error": str(e)})
+    return await _post_upload_create(bearer, filename, content_type, data, src, tgt, user_id)
+
 async def wait_job_until_done(job_id: str, max_wait_sec: int) -> dict:
     deadline=None; hard_cap=7200; loop=asyncio.get_event_loop()
     if max_wait_sec>0: deadline = loop.time()+max_wait_sec
@@ -905,6 +981,13 @@ async def wait_job_until_done(job_id: str, max_wait_sec: int) -> dict:
             jitter = 0.75 * (os.urandom(1)[0]/255.0)
             await asyncio.sleep(delay + jitter); delay = min(10.0, delay*1.6)
 
+def _job_note(detail: Any) -> str:
+    """detail job SUCCEEDED (JSON dari worker) → pesan untuk user; "" kalau tidak ada."""
+    if isinstance(detail, str):
+        try: detail = json.loads(detail)
+        except Exception: return ""
+    return str((detail or {}).get("message") or "") if isinstance(detail, dict) else ""
+
 async def _get_job_links(job_id: str) -> Tuple[Optional[str], Optional[str]]:
     url = f"{TRANSLATOR_API}{JOB_DETAIL_PATH}/{job_id}"
     async with aiohttp.ClientSession() as sess:
@@ -1293,9 +1376,9 @@ class SBCSBot(TeamsActivityHandler):
             await _safe_send(step.context, "❌ Failed to download the file.")
             return await step.end_dialog()
 
-        MAX_SIZE = 40 * 1024 * 1024
+        MAX_SIZE = int(BOT_MAX_UPLOAD_MB * 1024 * 1024)
         if len(data) > MAX_SIZE:
-            await _safe_send(step.context, f"❌ File is too large ({len(data)/1024/1024:.1f} MB). Maximum is 40 MB.")
+            await _safe_send(step.context, f"❌ File is too large ({len(data)/1024/1024:.1f} MB). Maximum is {BOT_MAX_UPLOAD_MB:g} MB.")
             return await step.end_dialog()
 
         await _safe_send(step.context, f"✅ File downloaded ({len(data)/1024/1024:.1f} MB)")
@@ -1305,7 +1388,7 @@ class SBCSBot(TeamsActivityHandler):
 
         # Submit to translator
         try:
-            job_id = await _post_upload_create(user_token, filename, content_type, data, src, tgt, str(user_id))
+            job_id = await _submit_upload(user_token, filename, content_type, data, src, tgt, str(user_id))
         except Exception as e:
             await _safe_send(step.context, f"❌ Failed to submit to translator: {e}")
             return await step.end_dialog()
@@ -1334,6 +1417,10 @@ class SBCSBot(TeamsActivityHandler):
             else:
                 await _safe_send(step.context, 
                     f"⚠️ Translation completed but download link is temporarily unavailable. Please check your OneDrive folder.")
+            # catatan worker (mis. dokumen besar dikirim sebagai PDF)
+            note = _job_note(result.get("detail"))
+            if note:
+                await _safe_send(step.context, f"ℹ️ {note}")
                 
         elif status in ("timeout", "failed"):
             raw_detail = result.get("detail")
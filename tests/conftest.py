@@ -0,0 +1,52 @@
+# tests/conftest.py
+"""
+Unit test tanpa jaringan: connection string dev (Azurite) kalau belum di-set, dan
+create_container/create_queue saat import app.services.blob/queue tidak dipanggil ke server sungguhan.
+"""
+import contextlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault(
+    "AZURE_STORAGE_CONNECTION_STRING",
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;QueueEndpoint=http://127.0.0.1:10001/devstoreaccount1;",
+)
+os.environ.setdefault("APP_LOG_DIR", os.path.join(tempfile.gettempdir(), "app-tests-logs"))
+
+with mock.patch("azure.storage.blob.BlobServiceClient.create_container"), \
+        mock.patch("azure.storage.queue.QueueClient.create_queue"):
+    import app.services.blob  # noqa: E402,F401
+    import app.services.queue  # noqa: E402,F401
+
+
+@pytest.fixture
+def make_session():
+    """`async with make_session() as session:` → AsyncSession SQLite in-memory dengan semua tabel."""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    from app.db import Base
+    import app.models  # noqa: F401  (registrasi tabel)
+
+    @contextlib.asynccontextmanager
+    async def _make():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                yield session
+        finally:
+            await engine.dispose()
+
+    return _make
@@ -0,0 +1,141 @@
+# tests/test_batch_coalescer.py
+"""user-004: coalescing job bahasa sama ke satu batch Translator + fan-out hasil per job."""
+import asyncio
+
+import pytest
+
+from app.services.batch_coalescer import BatchCoalescer
+
+
+def _entry(src: str) -> dict:
+    return {"source": {"sourceUrl": f"https://acct/input/{src}?sig"}, "targets": []}
+
+
+class _Translator:
+    """Translator palsu: setiap dokumen di batch sukses, kecuali sumber yang ada di `bad`."""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.submitted = []
+
+    async def submit(self, inputs):
+        self.submitted.append([e["source"]["sourceUrl"] for e in inputs])
+        if any(any(b in e["source"]["sourceUrl"] for b in self.bad) for e in inputs):
+            raise RuntimeError("400 InvalidDocument")
+        return f"batch-{len(self.submitted)}"
+
+    async def wait(self, batch_id):
+        n = len(self.submitted[int(batch_id.split("-")[1]) - 1])
+        return {"status": "Succeeded", "summary": {"total": n}}
+
+    async def documents(self, batch_id):
+        urls = self.submitted[int(batch_id.split("-")[1]) - 1]
+        return [{"sourcePath": u, "to": "ja", "status": "Succeeded"} for u in urls]
+
+
+def _coalescer(tr, **kw):
+    kw.setdefault("window_s", 0.05)
+    return BatchCoalescer(submit=tr.submit, wait=tr.wait, documents=tr.documents,
+                          source_container="input", **kw)
+
+
+def test_failed_shared_submit_only_fails_the_offending_job():
+    tr = _Translator(bad={"bad.docx"})
+    co = _coalescer(tr)
+
+    async def run():
+        return await asyncio.gather(*(
+            co.translate(("en", "ja"), _entry(src), [(key, src, "ja")])
+            for key, src in (("j1", "a.docx"), ("j2", "bad.docx"), ("j3", "c.docx"))
+        ), return_exceptions=True)
+
+    ok1, err, ok3 = asyncio.run(run())
+    assert isinstance(err, RuntimeError)
+    assert ok1["documents"]["j1"]["status"] == "Succeeded"
+    assert ok3["documents"]["j3"]["status"] == "Succeeded"
+    assert len(tr.submitted[0]) == 3 and sorted(map(len, tr.submitted[1:])) == [1, 1, 1]
+    assert co.metrics["split_retries"] == 1
+
+
+def test_single_input_submit_failure_is_not_retried():
+    tr = _Translator(bad={"bad.docx"})
+    co = _coalescer(tr)
+    with pytest.raises(RuntimeError):
+        asyncio.run(co.translate("sig", _entry("bad.docx"), [("j", "bad.docx", "ja")]))
+    assert len(tr.submitted) == 1 and co.metrics["split_retries"] == 0
+
+
+def test_same_signature_within_window_is_one_batch_with_fan_out():
+    tr = _Translator()
+    co = _coalescer(tr)
+
+    async def run():
+        return await asyncio.gather(
+            co.translate(("en", "ja"), _entry("a.docx"), [("j1", "a.docx", "ja")], size=10),
+            co.translate(("en", "ja"), _entry("b.docx"), [("j2", "b.docx", "ja")], size=10),
+            co.translate(("en", "ko"), _entry("c.docx"), [("j3", "c.docx", "ja")], size=10),
+        )
+
+    r1, r2, r3 = asyncio.run(run())
+    assert len(tr.submitted) == 2 and sorted(map(len, tr.submitted)) == [1, 2]
+    assert r1["batch_id"] == r2["batch_id"] != r3["batch_id"]
+    # tiap job hanya menerima dokumennya sendiri
+    assert list(r1["documents"]) == ["j1"] and r1["documents"]["j1"]["sourcePath"].endswith("/input/a.docx?sig")
+    assert list(r2["documents"]) == ["j2"] and r2["documents"]["j2"]["sourcePath"].endswith("/input/b.docx?sig")
+    assert co.stats() == {"batches": 2, "documents": 3, "coalesced": 2, "submit_errors": 0,
+                          "split_retries": 0, "pending_groups": 0}
+
+
+def test_caps_flush_the_group_early():
+    tr = _Translator()
+    co = _coalescer(tr, window_s=5.0, max_docs=2, max_bytes=100)
+
+    async def run():
+        t0 = asyncio.get_running_loop().time()
+        await asyncio.gather(*(
+            co.translate("sig", _entry(f"{i}.docx"), [(f"j{i}", f"{i}.docx", "ja")], size=10) for i in range(4)
+        ))
+        by_docs = asyncio.get_running_loop().time() - t0
+        await asyncio.gather(
+            co.translate("sig2", _entry("big1.docx"), [("b1", "big1.docx", "ja")], size=80),
+            co.translate("sig2", _entry("big2.docx"), [("b2", "big2.docx", "ja")], size=80),
+        )
+        return by_docs
+
+    by_docs = asyncio.run(run())
+    assert by_docs < 1.0  # max_docs tercapai → flush tanpa menunggu window 5 s
+    assert [len(s) for s in tr.submitted[:2]] == [2, 2]
+    assert [len(s) for s in tr.submitted[2:]] == [1, 1]  # max_bytes: 80 + 80 > 100 → batch terpisah
+
+
+def test_multi_target_entry_maps_each_language_to_its_job():
+    tr = _Translator()
+
+    async def documents(batch_id):
+        url = tr.submitted[0][0]
+        return [{"sourcePath": url, "to": "ja", "status": "Succeeded"},
+                {"sourcePath": url, "to": "ko", "status": "Failed"}]
+
+    co = BatchCoalescer(submit=tr.submit, wait=tr.wait, documents=documents,
+                        source_container="input", window_s=0)
+    res = asyncio.run(co.translate("sig", _entry("a.docx"), [("ja-job", "a.docx", "ja"), ("ko-job", "a.docx", "ko")]))
+    assert res["documents"]["ja-job"]["status"] == "Succeeded"
+    assert res["documents"]["ko-job"]["status"] == "Failed"
+
+
+def test_wait_failure_reaches_every_job_in_the_batch():
+    tr = _Translator()
+
+    async def wait(batch_id):
+        raise TimeoutError("Translator polling timeout")
+
+    co = BatchCoalescer(submit=tr.submit, wait=wait, documents=tr.documents,
+                        source_container="input", window_s=0.05)
+
+    async def run():
+        return await asyncio.gather(*(
+            co.translate("sig", _entry(f"{i}.docx"), [(f"j{i}", f"{i}.docx", "ja")]) for i in range(2)
+        ), return_exceptions=True)
+
+    assert all(isinstance(r, TimeoutError) for r in asyncio.run(run()))
+    assert len(tr.submitted) == 1
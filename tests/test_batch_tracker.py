@@ -0,0 +1,164 @@
+# tests/test_batch_tracker.py
+"""user-003: satu poller bersama untuk semua batch Translator (adaptif, timeout, waiter batal)."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.batch_tracker import BatchTracker, _Tracked
+
+
+class _Client:
+    """httpx client palsu: status per batch diambil dari antrean respons (status terakhir diulang)."""
+
+    def __init__(self, script):
+        self.script = {k: list(v) for k, v in script.items()}
+        self.gets = []
+
+    async def get(self, url, headers=None):
+        self.gets.append(url)
+        seq = self.script[url]
+        item = seq.pop(0) if len(seq) > 1 else seq[0]
+        if isinstance(item, int):
+            return httpx.Response(item, request=httpx.Request("GET", url))
+        return httpx.Response(200, json=item, request=httpx.Request("GET", url))
+
+
+def _tracker(client, **kw):
+    kw.setdefault("min_interval", 0.01)
+    kw.setdefault("max_interval", 0.02)
+    return BatchTracker(status_url=lambda b: f"https://t/batches/{b}", headers=lambda: {},
+                        client=lambda: client, **kw)
+
+
+def test_cancelled_waiter_deregisters_and_polling_stops():
+    client = _Client({"https://t/batches/b1": [{"status": "Running"}]})
+    tr = _tracker(client)
+
+    async def run():
+        w = asyncio.ensure_future(tr.wait("b1"))
+        await asyncio.sleep(0.15)
+        w.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await w
+        polls = len(client.gets)
+        await asyncio.sleep(0.2)
+        stats = tr.stats()
+        await tr.close()
+        return polls, len(client.gets), stats
+
+    before, after, stats = asyncio.run(run())
+    assert before > 0 and after == before
+    assert stats["outstanding"] == 0
+
+
+def test_cancelling_one_of_two_waiters_keeps_the_other():
+    url = "https://t/batches/b1"
+    client = _Client({url: [{"status": "Running"}] * 4 + [{"status": "Succeeded"}]})
+    tr = _tracker(client)
+
+    async def run():
+        a = asyncio.ensure_future(tr.wait("b1"))
+        b = asyncio.ensure_future(tr.wait("b1"))
+        await asyncio.sleep(0)
+        a.cancel()
+        res = await b
+        await tr.close()
+        return a, res
+
+    a, res = asyncio.run(run())
+    assert a.cancelled() and res["status"] == "Succeeded"
+
+
+def test_batches_share_one_poller_and_resolve_on_terminal_state():
+    client = _Client({
+        "https://t/batches/a": [{"status": "NotStarted"}, {"status": "Running"}, {"status": "Succeeded"}],
+        "https://t/batches/b": [{"status": "ValidationFailed"}],
+    })
+    tr = _tracker(client)
+
+    async def run():
+        try:
+            return await asyncio.gather(tr.wait("a"), tr.wait("a"), tr.wait("b"))
+        finally:
+            await tr.close()
+
+    a1, a2, b = asyncio.run(run())
+    assert a1 is a2 and a1["status"] == "Succeeded" and b["status"] == "ValidationFailed"
+    assert client.gets.count("https://t/batches/a") == 3  # dua waiter, satu rangkaian GET
+    assert tr.stats()["tracked"] == 2 and tr.stats()["resolved"] == 2 and tr.stats()["outstanding"] == 0
+
+
+def test_repeated_errors_fail_the_waiter():
+    client = _Client({"https://t/batches/x": [500]})
+    tr = _tracker(client, max_errors=3)
+
+    async def run():
+        try:
+            return await tr.wait("x")
+        finally:
+            await tr.close()
+
+    with pytest.raises(RuntimeError, match="polling failed"):
+        asyncio.run(run())
+    assert len(client.gets) == 3 and tr.metrics["poll_errors"] == 3
+
+
+def test_deadline_raises_timeout():
+    client = _Client({"https://t/batches/x": [{"status": "Running"}]})
+    tr = _tracker(client)
+
+    async def run():
+        try:
+            return await tr.wait("x", timeout_s=0.1)
+        finally:
+            await tr.close()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(run())
+    assert tr.metrics["timeouts"] == 1
+
+
+def test_throttle_goes_to_governor_and_is_not_an_error():
+    class _Gov:
+        def __init__(self):
+            self.throttled = []
+
+        async def acquire(self):
+            pass
+
+        def note_throttle(self, s):
+            self.throttled.append(s)
+
+    gov = _Gov()
+    client = _Client({"https://t/batches/x": [429, 429, {"status": "Succeeded"}]})
+    tr = _tracker(client, governor=gov, max_errors=1)
+
+    async def run():
+        try:
+            return await tr.wait("x")
+        finally:
+            await tr.close()
+
+    assert asyncio.run(run())["status"] == "Succeeded"
+    assert len(gov.throttled) == 2 and tr.metrics["throttled"] == 2 and tr.metrics["poll_errors"] == 0
+
+
+def test_interval_backs_off_without_progress_and_resets_on_progress():
+    tr = BatchTracker(status_url=lambda b: b, headers=lambda: {}, min_interval=2.0, max_interval=30.0, backoff=2.0)
+
+    async def run():
+        item = _Tracked("u", asyncio.get_running_loop().create_future(), 3600, tr.min_interval)
+        now = item.started
+        running = {"status": "Running", "summary": {"total": 10, "success": 0}}
+        first = tr._next_interval(item, running, now, None)
+        slow = [tr._next_interval(item, running, now, None) for _ in range(3)][-1]
+        progressed = tr._next_interval(item, {"status": "Running", "summary": {"total": 10, "success": 1}}, now, None)
+        throttled = tr._next_interval(item, None, now, 25.0)
+        return first, slow, progressed, throttled
+
+    first, slow, progressed, throttled = asyncio.run(run())
+    assert 1.6 <= first <= 2.4  # jitter ±20%
+    assert slow > first * 4     # backoff eksponensial tanpa progress
+    assert progressed < slow       # ada progress → interval rapat lagi (perkiraan sisa waktu)
+    assert throttled >= 25.0 * 0.8
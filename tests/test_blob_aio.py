@@ -0,0 +1,128 @@
+# tests/test_blob_aio.py
+"""user-010: client async per event loop, cache ensure_container, copy server-side + polling."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError
+
+from app.services import blob_aio
+
+
+def test_client_is_shared_within_a_loop_and_rebuilt_for_a_new_loop():
+    async def grab():
+        try:
+            return blob_aio.client(), blob_aio.client()
+        finally:
+            await blob_aio.close()
+
+    a1, a2 = asyncio.run(grab())
+    b1, _ = asyncio.run(grab())
+    assert a1 is a2
+    assert b1 is not a1
+
+
+def test_session_of_previous_loop_is_closed_on_loop_change():
+    async def grab():
+        blob_aio.client()
+        return blob_aio._session
+
+    old = asyncio.run(grab())
+    assert not old.closed
+
+    async def next_loop():
+        blob_aio.client()
+        await asyncio.sleep(0.01)  # penutupan session lama dijadwalkan di loop ini
+        await blob_aio.close()
+
+    asyncio.run(next_loop())
+    assert old.closed
+
+
+class _FakeClient:
+    def __init__(self, dst=None, create_error=None):
+        self.created = []
+        self.dst = dst
+        self.create_error = create_error
+
+    async def create_container(self, name):
+        self.created.append(name)
+        if self.create_error:
+            raise self.create_error
+
+    def get_blob_client(self, container, name):
+        return self.dst
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    def install(**kw):
+        fake = _FakeClient(**kw)
+        monkeypatch.setattr(blob_aio, "client", lambda: fake)
+        monkeypatch.setattr(blob_aio, "_ready_containers", set())
+        return fake
+    return install
+
+
+def test_ensure_container_creates_once(fake_client):
+    fake = fake_client(create_error=ResourceExistsError("exists"))
+
+    async def run():
+        await blob_aio.ensure_container("output")
+        await blob_aio.ensure_container("output")
+
+    asyncio.run(run())
+    assert fake.created == ["output"]
+
+
+def test_ensure_container_retries_after_transient_error(fake_client):
+    fake = fake_client(create_error=OSError("down"))
+
+    async def run():
+        await blob_aio.ensure_container("output")
+        await blob_aio.ensure_container("output")
+
+    asyncio.run(run())
+    assert fake.created == ["output", "output"]
+
+
+class _FakeDst:
+    def __init__(self, statuses):
+        self.calls = []
+        self._statuses = list(statuses)
+
+    async def start_copy_from_url(self, url, metadata=None, **kw):
+        self.calls.append((url, metadata, kw))
+        return {"copy_status": self._statuses.pop(0), "copy_id": "c1"}
+
+    async def get_blob_properties(self):
+        return SimpleNamespace(copy=SimpleNamespace(status=self._statuses.pop(0)))
+
+
+def test_copy_polls_until_success(fake_client, monkeypatch):
+    dst = _FakeDst(["pending", "pending", "success"])
+    fake_client(dst=dst)
+    monkeypatch.setattr(blob_aio.asyncio, "sleep", _no_sleep)
+
+    out = asyncio.run(blob_aio.copy("output", "a.docx", "output", "cache/k", metadata={"last_hit": "1"}))
+    assert out == "cache/k"
+    (url, metadata, cond), = dst.calls
+    assert "/output/a.docx?" in url and metadata == {"last_hit": "1"} and cond == {}
+
+
+def test_copy_without_overwrite_sends_if_none_match(fake_client):
+    dst = _FakeDst(["success"])
+    fake_client(dst=dst)
+    asyncio.run(blob_aio.copy("input", "uploads/x", "input", "jobs/x", overwrite=False))
+    assert dst.calls[0][2] == {"etag": "*", "match_condition": MatchConditions.IfMissing}
+
+
+def test_copy_failure_raises(fake_client):
+    fake_client(dst=_FakeDst(["failed"]))
+    with pytest.raises(RuntimeError, match="failed"):
+        asyncio.run(blob_aio.copy("output", "a", "output", "b"))
+
+
+async def _no_sleep(_s):
+    return None
@@ -0,0 +1,82 @@
+# tests/test_delete_prefix.py
+"""user-011: delete_prefix → Blob Batch per ≤256 nama, paralel terbatas, fallback hapus satu-satu."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import blob_aio
+
+
+async def _aiter(items):
+    for it in items:
+        yield it
+
+
+class _FakeContainer:
+    def __init__(self, names, *, missing=(), batch_error=None):
+        self.names = list(names)
+        self.missing = set(missing)
+        self.batch_error = batch_error
+        self.batches = []
+        self.active = 0
+        self.peak = 0
+
+    def list_blobs(self, name_starts_with=""):
+        return _aiter([SimpleNamespace(name=n) for n in self.names if n.startswith(name_starts_with)])
+
+    async def delete_blobs(self, *names, delete_snapshots=None, raise_on_any_failure=True):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0)
+        self.active -= 1
+        if self.batch_error:
+            raise self.batch_error
+        self.batches.append(names)
+        return _aiter([SimpleNamespace(status_code=404 if n in self.missing else 202) for n in names])
+
+
+@pytest.fixture
+def container(monkeypatch):
+    def install(cc, deleted=None):
+        monkeypatch.setattr(blob_aio, "client", lambda: SimpleNamespace(get_container_client=lambda c: cc))
+
+        async def delete_blob(c, name):
+            if deleted is not None:
+                deleted.append(name)
+            return name not in cc.missing
+
+        monkeypatch.setattr(blob_aio, "delete_blob", delete_blob)
+        return cc
+    return install
+
+
+def test_batches_are_capped_and_counted(container):
+    names = [f"jobs/j/input/{i:04d}" for i in range(600)]
+    cc = container(_FakeContainer(names + ["jobs/other/x"], missing=names[:3]))
+
+    stats = asyncio.run(blob_aio.delete_prefix("output", "jobs/j/", concurrency=2))
+    assert [len(b) for b in cc.batches] == [256, 256, 88]
+    assert {n for b in cc.batches for n in b} == set(names)
+    assert cc.peak <= 2
+    assert (stats["listed"], stats["deleted"], stats["missing"], stats["failed"], stats["batches"]) == (600, 597, 3, 0, 3)
+
+
+def test_smaller_batch_size_is_respected(container):
+    cc = container(_FakeContainer([f"p/{i}" for i in range(5)]))
+    stats = asyncio.run(blob_aio.delete_prefix("output", "p/", batch_size=2))
+    assert [len(b) for b in cc.batches] == [2, 2, 1] and stats["deleted"] == 5
+
+
+def test_rejected_batch_falls_back_to_single_deletes(container):
+    deleted = []
+    cc = container(_FakeContainer(["p/a", "p/b", "p/c"], missing={"p/c"}, batch_error=RuntimeError("HNS")), deleted)
+    stats = asyncio.run(blob_aio.delete_prefix("output", "p/"))
+    assert sorted(deleted) == ["p/a", "p/b", "p/c"]
+    assert (stats["deleted"], stats["missing"]) == (2, 1)
+
+
+def test_empty_prefix_listing_is_a_noop(container):
+    cc = container(_FakeContainer([]))
+    stats = asyncio.run(blob_aio.delete_prefix("output", "jobs/none/"))
+    assert cc.batches == [] and stats["listed"] == 0 and stats["batches"] == 0
@@ -0,0 +1,224 @@
+# tests/test_direct_upload.py
+"""user-008: upload 2 fase — SAS hanya untuk blob staging, finalize = snapshot + satu enqueue."""
+import asyncio
+from urllib.parse import urlparse, unquote
+
+import pytest
+from azure.core.exceptions import ResourceExistsError
+from sqlalchemy import select, update
+
+from app.models import Job
+from app.services import blob_aio, direct_upload
+from app.services.direct_upload import (
+    DirectUploadError,
+    finalize_direct_upload,
+    init_direct_upload,
+    input_blob_path,
+    staging_blob_path,
+)
+
+
+class _FakeBlobs:
+    def __init__(self):
+        self.blobs = {}  # name → bytes
+        self.copies = []
+
+    async def properties(self, container, name):
+        if name not in self.blobs:
+            return None
+        return {"size": len(self.blobs[name]), "metadata": {}, "last_modified": None}
+
+    async def copy(self, src_container, src_name, dst_container, dst_name, *, overwrite=True, **kw):
+        if not overwrite and dst_name in self.blobs:
+            raise ResourceExistsError("exists")
+        self.copies.append((src_name, dst_name))
+        self.blobs[dst_name] = self.blobs[src_name]
+        return dst_name
+
+    async def delete_blob(self, container, name):
+        return self.blobs.pop(name, None) is not None
+
+
+@pytest.fixture
+def env(monkeypatch):
+    blobs = _FakeBlobs()
+    for name in ("properties", "copy", "delete_blob"):
+        monkeypatch.setattr(blob_aio, name, getattr(blobs, name))
+    sent = []
+
+    async def enqueue_job(payload, *, visibility_timeout=None):
+        sent.append(payload)
+
+    monkeypatch.setattr(direct_upload, "enqueue_job", enqueue_job)
+    return blobs, sent
+
+
+def test_input_and_staging_paths():
+    assert input_blob_path("j1", "a b.docx").startswith("jobs/j1/input/")
+    assert input_blob_path("j1", None) == "jobs/j1/input/file"
+    assert input_blob_path("j1", "../../etc/passwd").startswith("jobs/j1/input/")
+    assert staging_blob_path("jobs/j1/input/a.docx") == "uploads/jobs/j1/input/a.docx"
+
+
+def _init(session, **over):
+    args = dict(filename="a.docx", size=10, source_lang="auto", targets=["ja", "ko"], user_id="u1", max_bytes=100)
+    args.update(over)
+    return init_direct_upload(session, **args)
+
+
+def test_init_issues_write_sas_for_staging_blob_only(make_session):
+    async def run():
+        async with make_session() as session:
+            res = await _init(session)
+            jobs = (await session.execute(select(Job))).scalars().all()
+            return res, jobs
+
+    res, jobs = asyncio.run(run())
+    assert len(res["job_ids"]) == 2 and res["job_id"] == res["job_ids"][0]
+    path = unquote(urlparse(res["upload_url"]).path)
+    assert path.endswith("/" + staging_blob_path(res["blob_name"]))
+    assert {j.status for j in jobs} == {"UPLOADING"}
+    assert {j.target_lang for j in jobs} == {"ja", "ko"}
+    assert {j.result_blob for j in jobs} == {res["blob_name"]}
+
+
+def test_init_rejects_declared_oversize(make_session):
+    async def run():
+        async with make_session() as session:
+            await _init(session, size=101)
+
+    with pytest.raises(DirectUploadError) as ei:
+        asyncio.run(run())
+    assert ei.value.status_code == 413
+
+
+def test_finalize_snapshots_queues_and_enqueues_once(make_session, env):
+    blobs, sent = env
+
+    async def run():
+        async with make_session() as session:
+            res = await _init(session)
+            with pytest.raises(DirectUploadError) as missing:
+                await finalize_direct_upload(session, res["job_id"], max_bytes=100)
+            blobs.blobs[staging_blob_path(res["blob_name"])] = b"x" * 10
+            first = await finalize_direct_upload(session, res["job_id"], max_bytes=100)
+            again = await finalize_direct_upload(session, res["job_id"], max_bytes=100)
+            statuses = {j.status for j in (await session.execute(select(Job))).scalars()}
+            return res, missing.value, first, again, statuses
+
+    res, missing, first, again, statuses = asyncio.run(run())
+    assert missing.status_code == 409
+    assert first["status"] == "QUEUED" and first["size"] == 10
+    assert again["status"] == "QUEUED" and "size" not in again  # finalize ulang → idempotent
+    assert statuses == {"QUEUED"}
+    # worker membaca salinan di path job; blob staging (yang bisa ditulis SAS) sudah dibuang
+    assert blobs.copies == [(staging_blob_path(res["blob_name"]), res["blob_name"])]
+    assert set(blobs.blobs) == {res["blob_name"]}
+    assert sent == [{"job_id": res["job_id"], "job_ids": res["job_ids"]}]
+
+
+def test_finalize_existing_snapshot_is_not_overwritten(make_session, env):
+    blobs, sent = env
+
+    async def run():
+        async with make_session() as session:
+            res = await _init(session, targets=["ja"])
+            blobs.blobs[res["blob_name"]] = b"first"
+            blobs.blobs[staging_blob_path(res["blob_name"])] = b"replaced-after-finalize"
+            out = await finalize_direct_upload(session, res["job_id"], max_bytes=100)
+            return res, out
+
+    res, out = asyncio.run(run())
+    assert blobs.blobs[res["blob_name"]] == b"first" and out["size"] == 5
+    assert sent == [{"job_id": res["job_id"]}]
+
+
+def test_finalize_oversize_fails_group_and_discards_blobs(make_session, env):
+    blobs, sent = env
+
+    async def run():
+        async with make_session() as session:
+            res = await _init(session)
+            blobs.blobs[staging_blob_path(res["blob_name"])] = b"x" * 200
+            with pytest.raises(DirectUploadError) as ei:
+                await finalize_direct_upload(session, res["job_id"], max_bytes=100)
+            statuses = {j.status for j in (await session.execute(select(Job))).scalars()}
+            return ei.value, statuses
+
+    err, statuses = asyncio.run(run())
+    assert err.status_code == 413
+    assert statuses == {"FAILED"}
+    assert blobs.blobs == {} and sent == []
+
+
+def test_finalize_rejects_other_user(make_session, env):
+    async def run():
+        async with make_session() as session:
+            res = await _init(session)
+            await finalize_direct_upload(session, res["job_id"], max_bytes=100, user_id="u2")
+
+    with pytest.raises(DirectUploadError) as ei:
+        asyncio.run(run())
+    assert ei.value.status_code == 403
+
+
+def test_finalize_groups_by_upload_group_not_by_blob(make_session, env):
+    blobs, sent = env
+
+    async def run():
+        async with make_session() as session:
+            res = await _init(session)
+            # job lain yang kebetulan punya result_blob sama tidak boleh ikut di-finalize
+            session.add(Job(id="other", filename="a.docx", status="UPLOADING", result_blob=res["blob_name"],
+                            target_lang="fr", created_at=0, updated_at=0))
+            await session.commit()
+            blobs.blobs[staging_blob_path(res["blob_name"])] = b"x" * 10
+            out = await finalize_direct_upload(session, res["job_id"], max_bytes=100)
+            other = await session.get(Job, "other")
+            return res, out, other.status
+
+    res, out, other = asyncio.run(run())
+    assert sorted(out["job_ids"]) == sorted(res["job_ids"]) and other == "UPLOADING"
+    assert sent == [{"job_id": res["job_id"], "job_ids": res["job_ids"]}]
+
+
+def test_expire_sweep_fails_stale_uploads_and_removes_staging(make_session, env):
+    blobs, _ = env
+
+    async def run():
+        async with make_session() as session:
+            stale = await _init(session, targets=["ja", "ko"])
+            fresh = await _init(session, targets=["ja"], filename="b.docx")
+            done = await _init(session, targets=["ja"], filename="c.docx")
+            for r in (stale, fresh, done):
+                blobs.blobs[staging_blob_path(r["blob_name"])] = b"x"
+            await finalize_direct_upload(session, done["job_id"], max_bytes=100)
+            await session.execute(
+                update(Job).where(Job.id.in_(stale["job_ids"] + done["job_ids"])).values(created_at=0)
+            )
+            await session.commit()
+            n = await direct_upload.expire_direct_uploads(session)
+            jobs = {j.id: j for j in (await session.execute(select(Job))).scalars()}
+            return stale, fresh, done, n, jobs
+
+    stale, fresh, done, n, jobs = asyncio.run(run())
+    assert n == 2
+    assert {jobs[j].status for j in stale["job_ids"]} == {"FAILED"}
+    assert jobs[fresh["job_id"]].status == "UPLOADING" and jobs[done["job_id"]].status == "QUEUED"
+    assert staging_blob_path(stale["blob_name"]) not in blobs.blobs
+    assert staging_blob_path(fresh["blob_name"]) in blobs.blobs
+    assert done["blob_name"] in blobs.blobs  # input job yang sudah QUEUED tidak disentuh
+
+
+def test_upgrade_schema_adds_upload_group_to_old_table():
+    from sqlalchemy import create_engine, inspect, text
+
+    from app.models import upgrade_schema
+
+    eng = create_engine("sqlite://")
+    with eng.begin() as conn:
+        conn.execute(text("CREATE TABLE jobs (id VARCHAR(64) PRIMARY KEY, result_blob VARCHAR(1024))"))
+        upgrade_schema(conn)
+        upgrade_schema(conn)  # idempoten
+        assert "upload_group" in {c["name"] for c in inspect(conn).get_columns("jobs")}
+        assert "ix_jobs_upload_group" in {i["name"] for i in inspect(conn).get_indexes("jobs")}
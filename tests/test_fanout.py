@@ -0,0 +1,48 @@
+# tests/test_fanout.py
+"""user-005: satu upload → satu job per bahasa, satu entry `inputs` dengan banyak target."""
+from app.config import settings
+from app.routers.upload import _parse_target_langs
+from worker.worker import _file_input, _folder_input, _output_name
+
+
+def test_parse_target_langs_repeated_and_comma_separated():
+    assert _parse_target_langs("en", ["ja", "zh-Hans,ko", " id "]) == ["ja", "zh-Hans", "ko", "id"]
+
+
+def test_parse_target_langs_drops_duplicates_case_insensitively():
+    assert _parse_target_langs("en", ["ja,JA", "ja", ""]) == ["ja"]
+
+
+def test_parse_target_langs_falls_back_to_single_target():
+    assert _parse_target_langs("ja", None) == ["ja"]
+    assert _parse_target_langs("", [" , "]) == [settings.DEFAULT_TARGET_LANG]
+
+
+def test_file_input_one_target_per_language():
+    entry = _file_input(
+        src_blob_sas_url="https://acct/input/jobs/j1/input/a.docx?sas",
+        source_lang="auto",
+        targets=[("ja", "https://acct/output/jobs/j1/input/a.docx?sas", "https://g/ja.tsv"),
+                 ("ko", "https://acct/output/jobs/j2/input/a.docx?sas", None)],
+    )
+    assert entry["storageType"] == "File"
+    assert "language" not in entry["source"]  # auto → deteksi oleh Translator
+    ja, ko = entry["targets"]
+    assert ja["language"] == "ja" and ja["glossaries"] == [{"glossaryUrl": "https://g/ja.tsv", "format": "TSV"}]
+    assert ko["language"] == "ko" and "glossaries" not in ko
+    assert ko["targetUrl"].startswith("https://acct/output/jobs/j2/")
+
+
+def test_folder_input_keeps_prefix_filter_and_source_language():
+    entry = _folder_input(
+        src_container_sas_url="https://acct/input?sas", src_prefix="jobs/j1/input/",
+        dst_container_sas_url="https://acct/output?sas", source_lang="en", target_lang="ja",
+    )
+    assert entry["source"] == {"sourceUrl": "https://acct/input?sas", "filter": {"prefix": "jobs/j1/input/"},
+                               "language": "en"}
+    assert entry["targets"] == [{"targetUrl": "https://acct/output?sas", "language": "ja"}]
+
+
+def test_output_name_per_language():
+    assert _output_name("jobs/j1/input/report.docx", "JA") == ("jobs/j1/input/report_ja.docx", "report_ja.docx", ".docx")
+    assert _output_name("jobs/j2/input/report.docx", "ko")[0] == "jobs/j2/input/report_ko.docx"
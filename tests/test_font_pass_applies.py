@@ -0,0 +1,32 @@
+# tests/test_font_pass_applies.py
+"""user-012: output yang tidak disentuh font pass → copy server-side (font_pass_applies False)."""
+import io
+
+import pytest
+
+from app.services.office_fonts import font_pass, font_pass_applies
+
+
+@pytest.mark.parametrize("name", ["a.docx", "deck.PPTX", "book.xlsx", "macro.xlsm", "docx", ".pptx",
+                                  "jobs/j/input/x.docx"])
+def test_ooxml_packages_apply(name):
+    assert font_pass_applies(name)
+
+
+@pytest.mark.parametrize("name", ["a.pdf", "a.txt", "legacy.doc", "legacy.ppt", "a.html", "", "pdf", "a.docx.pdf"])
+def test_other_formats_do_not_apply(name):
+    assert not font_pass_applies(name)
+
+
+def test_font_pass_leaves_non_ooxml_untouched():
+    data = b"%PDF-1.7 not an office package"
+    out, report = font_pass("a.pdf", data, "ja")
+    assert out is data
+    assert report == {"handler": None, "skipped": True, "runs_changed": 0}
+
+
+def test_font_pass_file_like_is_rewound():
+    fp = io.BytesIO(b"plain text")
+    fp.read()
+    out, report = font_pass("a.txt", fp, "ja")
+    assert out is fp and fp.tell() == 0 and report["handler"] is None
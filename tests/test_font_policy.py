@@ -0,0 +1,130 @@
+# tests/test_font_policy.py
+"""user-024: kebijakan font per slot script (latin/ea/cs) + pemecahan run campuran."""
+import json
+
+import pytest
+from lxml import etree
+
+from app.services import font_policy
+from app.services.font_policy import LATIN_LANG, FontSpec, is_mixed, resolve, split_scripts
+from app.services.ooxml_fonts import A_NS, W_NS, FontSetter
+
+W = f"{{{W_NS}}}"
+A = f"{{{A_NS}}}"
+
+
+@pytest.mark.parametrize("lang, ea, tag", [
+    ("ja", "Meiryo UI", "ja-JP"),
+    ("JP", "Meiryo UI", "ja-JP"),
+    ("ja_JP", "Meiryo UI", "ja-JP"),
+    ("zh", "Microsoft YaHei", "zh-CN"),
+    ("zh-Hans-CN", "Microsoft YaHei", "zh-CN"),
+    ("zh-Hant-TW", "Microsoft JhengHei", "zh-TW"),
+    ("zh-TW", "Microsoft JhengHei", "zh-TW"),
+    ("ko-KR", "Malgun Gothic", "ko-KR"),
+])
+def test_resolve_east_asian(lang, ea, tag):
+    spec = resolve(lang, "docx")
+    assert (spec.latin, spec.ea, spec.cs, spec.lang, spec.split) == ("Calibri", ea, None, tag, True)
+    assert spec.script == "ea" and spec.primary == ea
+
+
+def test_resolve_complex_script_and_fallback():
+    ar = resolve("ar-EG", "pptx")
+    assert (ar.cs, ar.ea, ar.script) == ("Arial", None, "cs")
+    assert resolve("iw").lang == "he-IL"
+    for lang in ("fr", "en-US", "", None):
+        assert resolve(lang, "xlsx") == FontSpec("Calibri", None, None, None, False)
+    assert resolve("ja", "pdf") == resolve("ja", "docx")
+
+
+def test_policy_file_override(monkeypatch, tmp_path):
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps({
+        "languages": {"ja": {"ea": "Yu Gothic"}},
+        "aliases": {"nihongo": "ja"},
+        "doc_types": {"pptx": {"ja": {"latin": "Segoe UI"}}},
+    }))
+    monkeypatch.setenv("FONT_POLICY_FILE", str(path))
+    table, aliases = font_policy._compile(font_policy._load_policy())
+    assert table[("ja", "docx")] == FontSpec("Calibri", "Yu Gothic", None, "ja-JP", True)
+    assert table[("ja", "pptx")].latin == "Segoe UI"
+    assert aliases["nihongo"] == "ja"
+
+
+def test_unreadable_policy_file_keeps_defaults(monkeypatch, tmp_path):
+    monkeypatch.setenv("FONT_POLICY_FILE", str(tmp_path / "missing.json"))
+    assert font_policy._load_policy() == font_policy.DEFAULT_POLICY
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Hello 世界 2024", [("latin", "Hello "), ("ea", "世界 2024")]),
+    ("  東京タワー!", [("ea", "  東京タワー!")]),
+    ("2024 年 report", [("ea", "2024 年"), ("latin", " report")]),
+    ("مرحبا world", [("cs", "مرحبا"), ("latin", " world")]),
+    ("123 - 456", [("latin", "123 - 456")]),
+    ("", []),
+])
+def test_split_scripts(text, expected):
+    assert split_scripts(text) == expected
+    assert "".join(s for _, s in expected) == text
+
+
+def test_is_mixed():
+    assert is_mixed("Hello 世界")
+    assert not is_mixed("世界 2024")
+    assert not is_mixed("Hello world")
+
+
+# ----------------------------- FontSetter: slot & split -----------------------------
+def _w_doc(*runs: str) -> etree._Element:
+    body = "".join(f"<w:r><w:rPr><w:b/></w:rPr><w:t>{t}</w:t></w:r>" for t in runs)
+    return etree.fromstring(f'<w:document xmlns:w="{W_NS}"><w:body><w:p>{body}</w:p></w:body></w:document>')
+
+
+def _a_sld(*runs: str) -> etree._Element:
+    body = "".join(f'<a:r><a:rPr sz="1200"/><a:t>{t}</a:t></a:r>' for t in runs)
+    return etree.fromstring(f'<a:p xmlns:a="{A_NS}">{body}</a:p>')
+
+
+def test_docx_slots_follow_spec_and_theme_fonts_dropped():
+    root = etree.fromstring(
+        f'<w:p xmlns:w="{W_NS}"><w:r><w:rPr><w:rFonts w:asciiTheme="minorHAnsi" w:cs="Tahoma"/></w:rPr>'
+        f'<w:t>x</w:t></w:r></w:p>'
+    )
+    FontSetter(resolve("ja")).apply(root)
+    rf = root.find(f"{W}r/{W}rPr/{W}rFonts")
+    assert rf.get(f"{W}ascii") == rf.get(f"{W}hAnsi") == "Calibri"
+    assert rf.get(f"{W}eastAsia") == "Meiryo UI"
+    assert rf.get(f"{W}cs") == "Tahoma"  # slot di luar spec tidak disentuh
+    assert rf.get(f"{W}asciiTheme") is None
+
+
+def test_docx_mixed_run_is_split_with_east_asian_hint():
+    root = _w_doc("Hello 世界", "only latin")
+    assert FontSetter(resolve("ja")).apply(root) > 0
+    runs = root.findall(f".//{W}r")
+    assert [r.findtext(f"{W}t") for r in runs] == ["Hello ", "世界", "only latin"]
+    hints = [r.find(f"{W}rPr/{W}rFonts").get(f"{W}hint") for r in runs]
+    assert hints == [None, "eastAsia", None]
+    assert all(r.find(f"{W}rPr/{W}b") is not None for r in runs)  # format run asli ikut disalin
+    assert FontSetter(resolve("ja")).apply(root) == 0
+
+
+def test_uniform_spec_does_not_split():
+    root = _w_doc("Hello 世界")
+    FontSetter(FontSpec.uniform("Arial")).apply(root)
+    assert len(root.findall(f".//{W}r")) == 1
+
+
+def test_pptx_mixed_run_gets_lang_per_segment():
+    root = _a_sld("Deck 資料", "表紙")
+    FontSetter(resolve("ja", "pptx")).apply(root)
+    rPrs = root.findall(f"{A}r/{A}rPr")
+    assert [r.getparent().findtext(f"{A}t") for r in rPrs] == ["Deck ", "資料", "表紙"]
+    assert [r.get("lang") for r in rPrs] == [LATIN_LANG, "ja-JP", None]
+    for rPr in rPrs:
+        assert rPr.get("sz") == "1200"
+        assert rPr.find(f"{A}latin").get("typeface") == "Calibri"
+        assert rPr.find(f"{A}ea").get("typeface") == "Meiryo UI"
+        assert rPr.find(f"{A}cs") is None
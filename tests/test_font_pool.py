@@ -0,0 +1,103 @@
+# tests/test_font_pool.py
+"""user-022: process pool font pass — dibuat hanya di main thread, hasil sama dengan serial, pool rusak → serial."""
+import io
+import threading
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.services import office_fonts, ooxml_fonts
+from app.services.font_policy import FontSpec
+from app.services.ooxml_fonts import rewrite_package, shutdown_font_pool, start_font_pool
+
+
+@pytest.fixture(autouse=True)
+def _no_pool(monkeypatch):
+    monkeypatch.setattr(ooxml_fonts, "FONT_POOL_WORKERS", 2)
+    monkeypatch.setattr(ooxml_fonts, "_pool_broken", False)
+    shutdown_font_pool()
+    yield
+    shutdown_font_pool()
+
+
+def _docx(paragraphs=5) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Paragraph {i}")
+    for section in doc.sections:
+        section.header.paragraphs[0].text = "Header"
+        section.footer.paragraphs[0].text = "Footer"
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _parts(data: bytes) -> dict:
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        return {i.filename: z.read(i) for i in z.infolist()}
+
+
+def test_start_off_main_thread_is_noop():
+    got = []
+    t = threading.Thread(target=lambda: got.append(start_font_pool()))
+    t.start()
+    t.join()
+    assert got == [None] and ooxml_fonts.font_pool() is None
+
+
+def test_start_on_main_thread_creates_and_reuses_pool():
+    pool = start_font_pool()
+    assert pool is not None and ooxml_fonts.font_pool() is pool
+    assert start_font_pool() is pool
+    shutdown_font_pool(broken=True)
+    assert ooxml_fonts.font_pool() is None
+    # pool rusak tidak di-fork ulang: sisa umur proses jalan serial
+    assert start_font_pool() is None
+
+
+def test_disabled_pool(monkeypatch):
+    monkeypatch.setattr(ooxml_fonts, "FONT_POOL_WORKERS", 0)
+    assert start_font_pool() is None
+
+
+def test_pooled_rewrite_matches_serial(monkeypatch):
+    monkeypatch.setattr(ooxml_fonts, "POOL_MIN_PARTS", 1)
+    data, spec = _docx(), FontSpec.uniform("Meiryo UI")
+    serial, pooled = io.BytesIO(), io.BytesIO()
+    s1 = rewrite_package(io.BytesIO(data), serial, spec, kind="docx")
+    s2 = rewrite_package(io.BytesIO(data), pooled, spec, kind="docx", pool=start_font_pool())
+    assert s2["pooled"] == s2["parts"] > 0 and s1["pooled"] == 0
+    assert s1["runs_changed"] == s2["runs_changed"]
+    assert _parts(serial.getvalue()) == _parts(pooled.getvalue())
+    with zipfile.ZipFile(pooled) as z:
+        assert z.testzip() is None
+
+
+class _BrokenPool:
+    _max_workers = 1
+
+    def __init__(self):
+        self.shut = False
+
+    def submit(self, *a, **kw):
+        raise BrokenProcessPool("child killed")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut = True
+
+
+def test_broken_pool_falls_back_to_serial_and_is_discarded(monkeypatch):
+    monkeypatch.setattr(ooxml_fonts, "POOL_MIN_PARTS", 1)
+    broken = _BrokenPool()
+    monkeypatch.setattr(ooxml_fonts, "_pool", broken)
+    data = _docx()
+    out, report = office_fonts._stream_fonts(data, FontSpec.uniform("Arial"), "docx")
+    assert report["runs_changed"] > 0 and not report["skipped"]
+    assert broken.shut and ooxml_fonts.font_pool() is None and start_font_pool() is None
+    expected = io.BytesIO()
+    rewrite_package(io.BytesIO(data), expected, FontSpec.uniform("Arial"), kind="docx")
+    assert _parts(out) == _parts(expected.getvalue())
+
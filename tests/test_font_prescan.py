@@ -0,0 +1,61 @@
+# tests/test_font_prescan.py
+"""user-023: pre-scan murah — font pass jadi no-op kalau semua run sudah memakai font target."""
+import io
+
+from app.services.font_policy import FontSpec, resolve
+from app.services.office_fonts import font_pass
+from app.services.ooxml_fonts import rewrite_package, scan_package
+
+
+def _docx(paragraphs=4) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Paragraph {i}").add_run(" tail").italic = True
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _rewrite(data: bytes, spec: FontSpec) -> bytes:
+    out = io.BytesIO()
+    rewrite_package(io.BytesIO(data), out, spec, kind="docx")
+    return out.getvalue()
+
+
+def test_scan_counts_until_compliant():
+    spec = FontSpec.uniform("Arial")
+    data = _docx()
+    assert scan_package(io.BytesIO(data), spec, kind="docx") == 1  # limit=1: berhenti di temuan pertama
+    total = scan_package(io.BytesIO(data), spec, kind="docx", limit=None)
+    assert total > 1
+    assert scan_package(io.BytesIO(data), spec, kind="docx", limit=3) == 3
+    assert scan_package(io.BytesIO(_rewrite(data, spec)), spec, kind="docx", limit=None) == 0
+
+
+def test_other_font_is_not_compliant():
+    done = _rewrite(_docx(), FontSpec.uniform("Arial"))
+    assert scan_package(io.BytesIO(done), FontSpec.uniform("Meiryo UI"), kind="docx") == 1
+
+
+def test_font_pass_reports_runs_then_skips_on_second_pass():
+    first, report = font_pass("a.docx", _docx(), "ja")
+    assert report["handler"] == "docx" and not report["skipped"] and report["runs_changed"] > 0
+    second, report = font_pass("a.docx", first, "ja")
+    assert report == {"handler": "docx", "skipped": True, "runs_changed": 0}
+    assert second is first
+
+
+def test_skip_returns_same_file_object_rewound():
+    compliant = _rewrite(_docx(), resolve("en", "docx"))
+    fp = io.BytesIO(compliant)
+    fp.seek(7)
+    out, report = font_pass("a.docx", fp, "en")
+    assert report["skipped"] and out is fp and fp.tell() == 0
+
+
+def test_non_office_file_is_skipped_without_handler():
+    data = b"%PDF-1.7"
+    out, report = font_pass("a.pdf", data, "ja")
+    assert out is data and report == {"handler": None, "skipped": True, "runs_changed": 0}
@@ -0,0 +1,129 @@
+# tests/test_glossary_cache.py
+"""user-015: term pairs LLM di-cache per SimHash sampel (near-duplicate → hit, bahasa lain → miss)."""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base
+from app.models import GlossaryCacheEntry
+from app.services import glossary_cache
+from app.services.glossary_cache import GlossaryCache, _bands, simhash
+
+REPORT = " ".join(
+    f"The quarterly maintenance report for plant {i} lists pump inspections, valve replacements "
+    f"and safety audits scheduled by the operations team." for i in range(30)
+)
+
+
+def _distance(a: str, b: str) -> int:
+    return bin(simhash(a) ^ simhash(b)).count("1")
+
+
+def test_simhash_is_deterministic_and_case_insensitive():
+    assert simhash(REPORT) == simhash(REPORT.upper()) != 0
+    assert simhash("") == 0 and simhash("123 456") == 0
+
+
+def test_simhash_near_duplicates_are_close_and_unrelated_texts_are_far():
+    edited = REPORT.replace("plant 7 ", "plant 70 ", 1)
+    assert _distance(REPORT, edited) <= 3
+    other = " ".join(f"Le contrat de location numéro {i} précise le loyer et la durée du bail." for i in range(30))
+    assert _distance(REPORT, other) > 10
+
+
+def test_simhash_cjk_is_split_per_character():
+    assert simhash("東京都の会議資料") != 0
+    assert _distance("東京都の会議資料です", "東京都の会議資料です。") == 0
+
+
+def test_bands_cover_all_bits():
+    h = 0x0123_4567_89AB_CDEF
+    assert _bands(h) == [0xCDEF, 0x89AB, 0x4567, 0x0123]
+
+
+@pytest.fixture
+def run_db(monkeypatch):
+    """Jalankan coroutine dengan GlossaryCache memakai SQLite in-memory."""
+    def run(fn):
+        async def main():
+            engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+            monkeypatch.setattr(glossary_cache, "AsyncSessionLocal", maker)
+            try:
+                return await fn(maker)
+            finally:
+                await engine.dispose()
+        return asyncio.run(main())
+    return run
+
+
+def test_lookup_hits_near_duplicate_for_same_language_pair(run_db):
+    cache = GlossaryCache()
+    pairs = [("pump", "ポンプ"), ("valve", "バルブ")]
+
+    async def fn(maker):
+        await cache.store("EN", "ja", REPORT, pairs)
+        return (
+            await cache.lookup("en", "JA", REPORT.replace("plant 7 ", "plant 70 ", 1)),
+            await cache.lookup("en", "ko", REPORT),
+            await cache.lookup("en", "ja", "Completely different lease agreement text about rent and tenants."),
+        )
+
+    near, other_lang, unrelated = run_db(fn)
+    assert near == pairs
+    assert other_lang is None and unrelated is None
+    assert cache.metrics["hits"] == 1 and cache.metrics["misses"] == 2 and cache.metrics["stores"] == 1
+
+
+def test_empty_pairs_are_not_stored(run_db):
+    cache = GlossaryCache()
+
+    async def fn(maker):
+        await cache.store("en", "ja", REPORT, [])
+        async with maker() as s:
+            return (await s.execute(select(GlossaryCacheEntry))).scalars().all()
+
+    assert run_db(fn) == []
+
+
+def test_sweep_drops_expired_then_oldest_over_capacity(run_db):
+    cache = GlossaryCache(ttl_s=1000, max_entries=2)
+    now = int(time.time())
+
+    async def fn(maker):
+        async with maker() as s:
+            for i, last in enumerate([now - 5000, now - 30, now - 20, now - 10]):
+                s.add(GlossaryCacheEntry(id=f"e{i}", source_lang="en", target_lang="ja", simhash="0" * 16,
+                                         band0=0, band1=0, band2=0, band3=0, pairs_json="[]",
+                                         hits=0, created_at=last, last_hit=last))
+            await s.commit()
+        n = await cache.sweep()
+        async with maker() as s:
+            left = sorted(e.id for e in (await s.execute(select(GlossaryCacheEntry))).scalars())
+        return n, left
+
+    assert run_db(fn) == (2, ["e2", "e3"])
+
+
+def test_hot_entry_still_expires_by_creation_time(run_db):
+    cache = GlossaryCache(ttl_s=1000)
+    now = int(time.time())
+
+    async def fn(maker):
+        await cache.store("en", "ja", REPORT, [("pump", "ポンプ")])
+        async with maker() as s:
+            # entry lama tapi baru saja kena hit: last_hit tidak boleh memperpanjang TTL
+            e = (await s.execute(select(GlossaryCacheEntry))).scalar_one()
+            e.created_at, e.last_hit = now - 5000, now
+            await s.commit()
+        found = await cache.lookup("en", "ja", REPORT)
+        n = await cache.sweep()
+        return found, n
+
+    assert run_db(fn) == (None, 1)
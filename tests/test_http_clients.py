@@ -0,0 +1,81 @@
+# tests/test_http_clients.py
+"""user-019: satu httpx.AsyncClient long-lived per layanan, per event loop."""
+import asyncio
+
+import httpx
+
+from app.services.http import HttpxClients
+
+
+def test_one_client_per_service_reused_within_a_loop():
+    reg = HttpxClients()
+
+    async def run():
+        try:
+            a, b, g = reg.get("translator"), reg.get("translator"), reg.get("graph")
+            return a, b, g
+        finally:
+            await reg.aclose()
+
+    a, b, g = asyncio.run(run())
+    assert a is b and a is not g
+    assert a.is_closed and g.is_closed
+
+
+def test_service_defaults_applied():
+    reg = HttpxClients()
+
+    async def run():
+        try:
+            return reg.get("openai"), reg.get("unknown")
+        finally:
+            await reg.aclose()
+
+    openai, other = asyncio.run(run())
+    assert openai.timeout == httpx.Timeout(30.0, connect=10.0)
+    assert other.timeout == httpx.Timeout(60.0, connect=10.0)
+
+
+def test_new_loop_gets_new_clients():
+    reg = HttpxClients()
+
+    async def grab():
+        return reg.get("blob")
+
+    first = asyncio.run(grab())
+    second = asyncio.run(grab())
+    assert first is not second
+    asyncio.run(reg.aclose())
+
+
+def test_closed_client_is_recreated():
+    reg = HttpxClients()
+
+    async def run():
+        c = reg.get("graph")
+        await c.aclose()
+        d = reg.get("graph")
+        await reg.aclose()
+        return c, d
+
+    c, d = asyncio.run(run())
+    assert c is not d
+
+
+def test_clients_of_previous_loop_are_closed_on_loop_change():
+    reg = HttpxClients()
+
+    async def grab():
+        return reg.get("translator"), reg.get("graph")
+
+    old = asyncio.run(grab())
+    assert not any(c.is_closed for c in old)
+
+    async def next_loop():
+        c = reg.get("translator")
+        await asyncio.sleep(0.01)  # penutupan client lama dijadwalkan di loop ini
+        await reg.aclose()
+        return c
+
+    new = asyncio.run(next_loop())
+    assert all(c.is_closed for c in old) and new not in old
@@ -0,0 +1,196 @@
+# tests/test_large_translation.py
+"""user-020: split → translate → merge untuk dokumen di atas batas Translator."""
+import asyncio
+import json
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+import pytest
+from pypdf import PdfReader
+
+import worker.worker as w
+from app.services import blob_aio, large_translation
+from app.services.large_translation import (
+    LargeTranslation,
+    LargeTranslationError,
+    group_batches,
+    merge_pdfs,
+    split_pdf_by_size,
+    to_pdf,
+)
+
+
+def _make_pdf(path: Path, pages: int, lines: int = 40) -> Path:
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        for j in range(lines):
+            page.insert_text((36, 36 + j * 18), f"Page {i} line {j} " + "lorem ipsum dolor " * 4)
+    path.write_bytes(doc.tobytes())
+    return path
+
+
+def _pages(path: Path) -> int:
+    return len(PdfReader(str(path)).pages)
+
+
+def test_split_pdf_respects_size_and_keeps_every_page(tmp_path):
+    src = _make_pdf(tmp_path / "src.pdf", 30)
+    limit = src.stat().st_size // 4
+    parts = split_pdf_by_size(src, tmp_path / "parts", limit)
+    assert len(parts) >= 4
+    assert all(p.stat().st_size <= limit for p in parts)
+    assert sum(_pages(p) for p in parts) == 30
+    assert [p.name for p in parts] == [f"part_{i:03d}.pdf" for i in range(1, len(parts) + 1)]
+
+
+def test_split_pdf_small_document_is_one_part(tmp_path):
+    src = _make_pdf(tmp_path / "src.pdf", 3)
+    parts = split_pdf_by_size(src, tmp_path / "parts", src.stat().st_size * 10)
+    assert len(parts) == 1 and _pages(parts[0]) == 3
+
+
+def test_merge_pdfs_in_order(tmp_path):
+    a = _make_pdf(tmp_path / "a.pdf", 2)
+    b = _make_pdf(tmp_path / "b.pdf", 3)
+    out = merge_pdfs([a, b], tmp_path / "m.pdf")
+    assert _pages(out) == 5
+
+
+def _sized(tmp_path, sizes):
+    out = []
+    for i, s in enumerate(sizes):
+        p = tmp_path / f"p{i}"
+        p.write_bytes(b"x" * s)
+        out.append(p)
+    return out
+
+
+def test_group_batches_caps_bytes_and_documents(tmp_path):
+    parts = _sized(tmp_path, [40, 40, 40, 10, 10, 10, 10])
+    assert [[p.name for p in b] for b in group_batches(parts, max_bytes=100, max_docs=3)] == [
+        ["p0", "p1"], ["p2", "p3", "p4"], ["p5", "p6"],
+    ]
+    # satu part melebihi batas byte tetap dikirim sendirian
+    assert [len(b) for b in group_batches(_sized(tmp_path, [500, 10]), max_bytes=100)] == [1, 1]
+
+
+def test_to_pdf_passthrough_and_unsupported(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    assert asyncio.run(to_pdf(pdf)) == pdf
+    with pytest.raises(LargeTranslationError):
+        asyncio.run(to_pdf(tmp_path / "a.txt"))
+
+
+def test_match_by_source_path_and_language():
+    docs = [
+        {"sourcePath": "https://acct/input/large/r1/parts/part_001.pdf?sig", "to": "ja", "status": "Succeeded"},
+        {"sourcePath": "https://acct/input/large/r1/parts/part_001.pdf?sig", "to": "ko", "status": "Failed"},
+    ]
+    assert LargeTranslation._match(docs, "large/r1/parts/part_001.pdf", "KO")["status"] == "Failed"
+    assert LargeTranslation._match(docs, "large/r1/parts/part_002.pdf", "ja") is None
+
+
+# ----------------------------- engine end-to-end (storage & Translator palsu) -----------------------------
+class _Store:
+    def __init__(self):
+        self.blobs = {}  # (container, name) → bytes
+
+    async def stream(self, container, name):
+        yield self.blobs[(container, name)]
+
+    async def put_bytes(self, container, name, data, **kw):
+        self.blobs[(container, name)] = data.read() if hasattr(data, "read") else data
+        return name
+
+    async def delete_prefix(self, container, prefix):
+        for k in [k for k in self.blobs if k[0] == container and k[1].startswith(prefix)]:
+            del self.blobs[k]
+        return {}
+
+
+def _blob_of(url):
+    container, _, name = unquote(urlparse(url).path).lstrip("/").partition("/")
+    return container, name
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    store = _Store()
+    for n in ("stream", "put_bytes", "delete_prefix"):
+        monkeypatch.setattr(blob_aio, n, getattr(store, n))
+    fail_langs = set()
+    submitted = []
+
+    def sas(container, name, minutes=None, permission=None):
+        return f"https://acct/{container}/{name}?sig"
+
+    monkeypatch.setattr(large_translation, "generate_blob_sas_url", sas)
+
+    async def submit(inputs):
+        submitted.append(inputs)
+        for entry in inputs:
+            src = _blob_of(entry["source"]["sourceUrl"])
+            for t in entry["targets"]:
+                if t["language"] not in fail_langs:
+                    store.blobs[_blob_of(t["targetUrl"])] = store.blobs[src]
+        return f"batch-{len(submitted)}"
+
+    async def wait(batch_id):
+        return {"status": "Succeeded"}
+
+    async def documents(batch_id):
+        inputs = submitted[int(batch_id.split("-")[1]) - 1]
+        return [{"sourcePath": e["source"]["sourceUrl"], "to": t["language"],
+                 "status": "Failed" if t["language"] in fail_langs else "Succeeded", "error": "boom"}
+                for e in inputs for t in e["targets"]]
+
+    eng = LargeTranslation(submit=submit, wait=wait, documents=documents, file_input=w._file_input,
+                           input_container="input", output_container="output",
+                           max_batch_docs=2, max_parallel=2)
+    return eng, store, submitted, fail_langs
+
+
+def test_engine_translates_all_parts_and_merges_per_language(engine, tmp_path):
+    eng, store, submitted, fail_langs = engine
+    fail_langs.add("ko")
+    src = _make_pdf(tmp_path / "big.pdf", 24)
+    store.blobs[("input", "jobs/j1/input/big.pdf")] = src.read_bytes()
+    eng.max_doc_bytes = src.stat().st_size // 4
+
+    res = asyncio.run(eng.run("jobs/j1/input/big.pdf", run_id="r1", source_lang="en", targets=[
+        ("j1", "ja", None, "jobs/j1/input/big_ja.pdf"),
+        ("j2", "ko", None, "jobs/j2/input/big_ko.pdf"),
+    ]))
+
+    assert res["j1"]["status"] == "Succeeded" and res["j1"]["parts"] >= 4
+    assert res["j2"]["status"] == "Failed" and "boom" in res["j2"]["error"]
+    assert len(submitted) == -(-res["j1"]["parts"] // 2)  # max_batch_docs=2
+    out = tmp_path / "out.pdf"
+    out.write_bytes(store.blobs[("output", "jobs/j1/input/big_ja.pdf")])
+    assert _pages(out) == 24
+    # file kerja di bawah large/<run_id>/ sudah dibersihkan
+    assert not [k for k in store.blobs if k[1].startswith("large/")]
+
+
+def test_engine_raises_before_submit_for_unsupported_input(engine):
+    eng, store, submitted, _ = engine
+    store.blobs[("input", "a.txt")] = b"text"
+    with pytest.raises(LargeTranslationError):
+        asyncio.run(eng.run("a.txt", run_id="r2", source_lang="en", targets=[("j", "ja", None, "a_ja.pdf")]))
+    assert submitted == []
+
+
+def test_needs_split():
+    eng = LargeTranslation(submit=None, wait=None, documents=None, file_input=None,
+                           input_container="i", output_container="o", max_doc_bytes=100)
+    assert eng.needs_split(101) and not eng.needs_split(100)
+
+
+def test_large_output_is_pdf_with_format_note():
+    assert w._output_name("jobs/j/input/deck.pptx", "ja", large=True) == (
+        "jobs/j/input/deck_ja.pdf", "deck_ja.pdf", ".pdf")
+    note = json.loads(w._format_note("jobs/j/input/deck.pptx", ".pdf"))
+    assert note["input_format"] == ".pptx" and note["output_format"] == ".pdf" and "PDF" in note["message"]
+    assert w._format_note("jobs/j/input/scan.pdf", ".pdf") == ""
@@ -0,0 +1,160 @@
+# tests/test_ooxml_stream.py
+"""user-021: font pass streaming langsung di ZIP (tanpa object model), entry lain disalin mentah."""
+import io
+import zipfile
+
+import pytest
+from lxml import etree
+
+from app.services import ooxml_fonts
+from app.services.font_policy import FontSpec
+from app.services.office_fonts import set_docx_font, set_pptx_font
+from app.services.ooxml_fonts import A_NS, W_NS, FontSetter, rewrite_package, rewrite_part, rewrite_small_part
+
+W = f"{{{W_NS}}}"
+A = f"{{{A_NS}}}"
+
+
+def _docx(paragraphs=3) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    for i in range(paragraphs):
+        p = doc.add_paragraph(f"Paragraph {i} ")
+        p.add_run("bold").bold = True
+    doc.sections[0].header.paragraphs[0].text = "Header text"
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _pptx(slides=2) -> bytes:
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    for i in range(slides):
+        s = prs.slides.add_slide(prs.slide_layouts[6])
+        s.shapes.add_textbox(Inches(1), Inches(1), Inches(4), Inches(1)).text_frame.text = f"Slide {i}"
+    buf = io.BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
+
+
+def _part(data: bytes, name: str) -> etree._Element:
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        return etree.fromstring(z.read(name))
+
+
+def _rewrite(data: bytes, kind: str, spec: FontSpec) -> bytes:
+    out = io.BytesIO()
+    rewrite_package(io.BytesIO(data), out, spec, kind=kind)
+    return out.getvalue()
+
+
+def test_docx_every_run_gets_the_font_and_package_stays_valid():
+    out = _rewrite(_docx(), "docx", FontSpec.uniform("Meiryo UI"))
+    for part in ("word/document.xml", "word/header1.xml"):
+        runs = _part(out, part).iter(f"{W}r")
+        for r in runs:
+            rf = r.find(f"{W}rPr/{W}rFonts")
+            assert rf is not None
+            assert {rf.get(f"{W}{a}") for a in ("ascii", "hAnsi", "eastAsia", "cs")} == {"Meiryo UI"}
+    from docx import Document
+    assert "Paragraph 0" in Document(io.BytesIO(out)).paragraphs[0].text
+
+
+def test_entries_outside_the_pattern_are_copied_byte_for_byte():
+    src = _docx()
+    out = _rewrite(src, "docx", FontSpec.uniform("Arial"))
+    with zipfile.ZipFile(io.BytesIO(src)) as a, zipfile.ZipFile(io.BytesIO(out)) as b:
+        assert [i.filename for i in a.infolist()] == [i.filename for i in b.infolist()]
+        for info in a.infolist():
+            if not ooxml_fonts.PART_PATTERNS["docx"].fullmatch(info.filename):
+                assert b.getinfo(info.filename).CRC == info.CRC
+        assert b.testzip() is None
+
+
+def test_pptx_runs_get_latin_ea_cs():
+    out = _rewrite(_pptx(), "pptx", FontSpec.uniform("Meiryo UI"))
+    rPrs = list(_part(out, "ppt/slides/slide1.xml").iter(f"{A}rPr"))
+    assert rPrs
+    for rPr in rPrs:
+        assert [rPr.find(f"{A}{s}").get("typeface") for s in ("latin", "ea", "cs")] == ["Meiryo UI"] * 3
+
+
+def test_streaming_and_in_memory_rewrites_agree():
+    xml = _docx(20)
+    with zipfile.ZipFile(io.BytesIO(xml)) as z:
+        part = z.read("word/document.xml")
+    setter = FontSetter(FontSpec.uniform("Arial"))
+    a, b = io.BytesIO(), io.BytesIO()
+    n_stream = rewrite_part(io.BytesIO(part), a, setter.apply)
+    n_small = rewrite_small_part(io.BytesIO(part), b, setter.apply)
+    assert n_stream == n_small > 0
+    canon = lambda x: etree.tostring(etree.fromstring(x.getvalue()), method="c14n")  # noqa: E731
+    assert canon(a) == canon(b)
+
+
+def test_large_parts_use_the_streaming_path(monkeypatch):
+    monkeypatch.setattr(ooxml_fonts, "STREAM_PART_BYTES", 256)
+    out = _rewrite(_docx(30), "docx", FontSpec.uniform("Arial"))
+    for r in _part(out, "word/document.xml").iter(f"{W}r"):
+        assert r.find(f"{W}rPr/{W}rFonts").get(f"{W}ascii") == "Arial"
+
+
+def test_rewrite_is_idempotent():
+    spec = FontSpec.uniform("Arial")
+    once = _rewrite(_docx(), "docx", spec)
+    out = io.BytesIO()
+    assert rewrite_package(io.BytesIO(once), out, spec, kind="docx")["runs_changed"] == 0
+
+
+def test_public_helpers_keep_bytes_and_file_like_contract():
+    data = _docx()
+    assert isinstance(set_docx_font(data, "Arial"), bytes)
+    res = set_pptx_font(io.BytesIO(_pptx()), "Arial")
+    assert hasattr(res, "read") and res.tell() == 0
+
+
+@pytest.mark.parametrize("payload", [b"not a zip at all", b"PK\x03\x04 broken"])
+def test_corrupt_input_is_returned_unchanged(payload):
+    assert set_docx_font(payload, "Arial") == payload
+
+
+def _entries(data: bytes) -> dict:
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        assert z.testzip() is None
+        return {i.filename: (i.compress_type, z.read(i)) for i in z.infolist()}
+
+
+def test_public_zipfile_fallback_matches_raw_copy(monkeypatch):
+    src, spec = _docx(), FontSpec.uniform("Arial")
+    raw = _rewrite(src, "docx", spec)
+    monkeypatch.setattr(ooxml_fonts, "_can_write_raw", lambda zout: False)
+    public = _rewrite(src, "docx", spec)
+    assert _entries(public) == _entries(raw)
+
+
+def test_pooled_parts_use_fallback_without_zipfile_internals(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    src, spec = _docx(), FontSpec.uniform("Arial")
+    raw = _rewrite(src, "docx", spec)
+    monkeypatch.setattr(ooxml_fonts, "_can_write_raw", lambda zout: False)
+    monkeypatch.setattr(ooxml_fonts, "POOL_MIN_PARTS", 1)
+    out = io.BytesIO()
+    with ThreadPoolExecutor(2) as pool:
+        stats = rewrite_package(io.BytesIO(src), out, spec, kind="docx", pool=pool)
+    assert stats["pooled"] > 0
+    assert _entries(out.getvalue()) == _entries(raw)
+
+
+def test_raw_write_requires_zipfile_internals():
+    with zipfile.ZipFile(io.BytesIO(), "w") as z:
+        assert ooxml_fonts._can_write_raw(z)
+
+    class _Stripped:
+        fp = None
+
+    assert not ooxml_fonts._can_write_raw(_Stripped())
@@ -0,0 +1,97 @@
+# tests/test_presubmit_stages.py
+"""user-016: stage pra-submit dengan budget waktu; glossary fallback ditandai tidak lengkap."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import worker.worker as w
+from app.services import glossary
+
+
+def _job(jid="j1", src="en", tgt="ja"):
+    return SimpleNamespace(id=jid, source_lang=src, target_lang=tgt)
+
+
+@pytest.fixture
+def compose(monkeypatch):
+    calls = []
+
+    def install(delay=0.0, complete=True):
+        async def fake(src, tgt, sample="", *, cache=None):
+            calls.append(sample)
+            if sample:
+                await asyncio.sleep(delay)
+                return b"full", complete
+            return b"static", True
+        monkeypatch.setattr(w, "compose_glossary", fake)
+        return calls
+    return install
+
+
+def test_glossary_within_budget_is_complete(compose, monkeypatch):
+    compose(delay=0.0)
+    monkeypatch.setattr(w, "GLOSSARY_BUDGET_S", 1.0)
+    assert asyncio.run(w._compose_within_budget(_job(), "sample")) == (b"full", True)
+
+
+def test_late_glossary_falls_back_to_static_and_keeps_running(compose, monkeypatch):
+    calls = compose(delay=0.2)
+    monkeypatch.setattr(w, "GLOSSARY_BUDGET_S", 0.01)
+
+    async def run():
+        res = await w._compose_within_budget(_job(), "sample")
+        pending = list(w._background)
+        await asyncio.gather(*pending)  # LLM tetap selesai di background (mengisi glossary cache)
+        return res, pending
+
+    res, pending = asyncio.run(run())
+    assert res == (b"static", False)
+    assert len(pending) == 1 and calls == ["sample", ""]
+    assert not w._background
+
+
+def test_no_sample_uses_static_glossary(compose):
+    calls = compose()
+    assert asyncio.run(w._compose_within_budget(_job(), "")) == (b"static", True)
+    assert calls == [""]
+
+
+def test_build_glossary_error_is_incomplete(compose, monkeypatch):
+    compose()
+
+    async def boom(*a, **kw):
+        raise OSError("storage down")
+
+    monkeypatch.setattr(w.blob_aio, "put_bytes", boom)
+    assert asyncio.run(w._build_glossary(_job(), "")) == (None, False)
+
+
+def test_compose_glossary_reports_llm_failure(monkeypatch):
+    async def llm_down(sample, tgt):
+        raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(glossary, "build_auto_pairs_with_openai", llm_down)
+    tsv, complete = asyncio.run(glossary.compose_glossary("en", "ja", "some sample"))
+    assert complete is False and isinstance(tsv, bytes)
+    assert asyncio.run(glossary.compose_glossary("en", "ja", ""))[1] is True
+
+
+def test_stage_enforces_budget():
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(w._stage("preflight", "j1", slow(), 0.01))
+
+
+def test_cancel_skips_finished_and_missing_tasks():
+    async def run():
+        done = asyncio.ensure_future(asyncio.sleep(0))
+        await done
+        pending = asyncio.ensure_future(asyncio.sleep(10))
+        w._cancel(done, pending, None)
+        await asyncio.sleep(0)
+        return done.cancelled(), pending.cancelled()
+
+    assert asyncio.run(run()) == (False, True)
@@ -0,0 +1,78 @@
+# tests/test_put_stream.py
+"""user-007: put_stream → stage_block per chunk, satu commit_block_list, batas ukuran tanpa commit."""
+import asyncio
+import base64
+import hashlib
+import io
+
+import pytest
+
+from app.services import blob_aio
+from app.services.blob import UploadTooLargeError, put_stream
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self._buf = io.BytesIO(data)
+
+    async def read(self, n: int) -> bytes:
+        return self._buf.read(n)
+
+
+class _FakeBlockBlob:
+    def __init__(self):
+        self.staged = {}
+        self.committed = None
+        self.metadata = None
+        self.active = 0
+        self.peak = 0
+
+    async def stage_block(self, block_id, chunk):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0)
+        self.staged[block_id] = chunk
+        self.active -= 1
+
+    async def commit_block_list(self, blocks, content_settings=None, metadata=None):
+        self.committed = [b.id for b in blocks]
+        self.metadata = metadata
+
+
+@pytest.fixture
+def bc(monkeypatch):
+    fake = _FakeBlockBlob()
+
+    async def ensure_container(name):
+        pass
+
+    class _Client:
+        def get_blob_client(self, container, name):
+            return fake
+
+    monkeypatch.setattr(blob_aio, "ensure_container", ensure_container)
+    monkeypatch.setattr(blob_aio, "client", lambda: _Client())
+    return fake
+
+
+def test_stages_blocks_in_order_and_commits_once(bc):
+    data = bytes(range(256)) * 40  # 10240 bytes → 3 blok @4096
+    res = asyncio.run(put_stream("input", "jobs/j/input/a.bin", _Reader(data), block_size=4096, max_concurrency=2))
+
+    assert res == {"blob_name": "jobs/j/input/a.bin", "size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+    assert [base64.b64decode(b).decode() for b in bc.committed] == ["00000000", "00000001", "00000002"]
+    assert b"".join(bc.staged[b] for b in bc.committed) == data
+    assert bc.metadata == {"sha256": res["sha256"]}
+    assert bc.peak <= 2
+
+
+def test_too_large_raises_without_commit(bc):
+    with pytest.raises(UploadTooLargeError) as ei:
+        asyncio.run(put_stream("input", "big.bin", _Reader(b"x" * 10000), block_size=4096, max_bytes=5000))
+    assert ei.value.limit == 5000 and ei.value.name == "big.bin"
+    assert bc.committed is None
+
+
+def test_empty_stream_commits_empty_blob(bc):
+    res = asyncio.run(put_stream("input", "empty.bin", _Reader(b"")))
+    assert res["size"] == 0 and bc.committed == []
@@ -0,0 +1,116 @@
+# tests/test_queue_consumer.py
+"""user-001: consumer async dengan prefetch terbatas — slot diisi ulang begitu satu job selesai."""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import worker.worker as w
+
+
+class _Queue:
+    """QueueClient aio palsu: receive_messages async generator, update/delete dicatat."""
+
+    def __init__(self, job_ids):
+        self.pending = [SimpleNamespace(id=f"m-{j}", pop_receipt="r0", dequeue_count=1,
+                                        content=json.dumps({"job_id": j})) for j in job_ids]
+        self.deleted = []
+        self.released = []
+
+    async def receive_messages(self, messages_per_page=None, max_messages=None, visibility_timeout=None):
+        take, self.pending = self.pending[:max_messages], self.pending[max_messages:]
+        for m in take:
+            yield m
+
+    async def update_message(self, msg_id, pop_receipt, visibility_timeout=None):
+        if visibility_timeout is not None and visibility_timeout < 60:
+            self.released.append((msg_id, visibility_timeout))
+        return SimpleNamespace(pop_receipt=pop_receipt)
+
+    async def delete_message(self, msg_id, pop_receipt):
+        self.deleted.append(msg_id)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def consumer(monkeypatch):
+    monkeypatch.setenv("WORKER_CONCURRENCY", "2")
+    monkeypatch.setenv("WORKER_PREFETCH", "2")
+    monkeypatch.setenv("WORKER_POLL_WAIT", "1")
+    monkeypatch.setenv("WORKER_RETRY_DELAY", "7")
+    monkeypatch.setenv("WORKER_SHUTDOWN_GRACE", "2")
+    monkeypatch.setattr(w, "start_font_pool", lambda: None)
+
+    async def _noop(*a, **kw):
+        return 0
+
+    monkeypatch.setattr(w, "_queue_bind", _noop)
+    monkeypatch.setattr(w, "expire_direct_uploads", _noop)
+    monkeypatch.setattr(w._result_cache, "sweep", _noop)
+    monkeypatch.setattr(w._glossary_cache, "sweep", _noop)
+
+    def run(job_ids, process, until):
+        q = _Queue(job_ids)
+        monkeypatch.setattr(w, "_qc", q)
+        monkeypatch.setattr(w, "process_jobs", process)
+        stop_box = []
+        monkeypatch.setattr(w, "_install_stop_handlers", stop_box.append)
+
+        async def main():
+            monkeypatch.setattr(w, "engine", create_async_engine("sqlite+aiosqlite://"))
+            task = asyncio.ensure_future(w.main())
+            deadline = time.monotonic() + 10
+            while not (stop_box and until(q)) and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            stop_box[0].set()
+            await task
+            await w.engine.dispose()
+
+        asyncio.run(main())
+        return q
+
+    return run
+
+
+def test_slow_job_does_not_block_refill_and_concurrency_is_capped(consumer):
+    running, peak, finished = set(), [0], []
+
+    async def process(job_ids, lease=None):
+        running.add(job_ids[0])
+        peak[0] = max(peak[0], len(running))
+        await asyncio.sleep(0.6 if job_ids[0] == "slow" else 0.02)
+        running.discard(job_ids[0])
+        finished.append(job_ids[0])
+
+    jobs = ["slow", "a", "b", "c", "d", "e"]
+    q = consumer(jobs, process, lambda q: len(q.deleted) == len(jobs))
+    assert sorted(q.deleted) == sorted(f"m-{j}" for j in jobs)
+    assert peak[0] == 2
+    # satu slot terus berputar selama job lambat berjalan (bukan batch-and-gather per halaman)
+    assert finished[-1] == "slow" and finished[:5] == ["a", "b", "c", "d", "e"]
+
+
+def test_failed_job_is_released_with_retry_delay(consumer):
+    async def process(job_ids, lease=None):
+        if job_ids[0] == "bad":
+            raise RuntimeError("boom")
+
+    q = consumer(["ok", "bad"], process, lambda q: q.deleted and q.released)
+    assert q.deleted == ["m-ok"]
+    assert ("m-bad", 7) in q.released
+
+
+def test_stop_returns_in_flight_message_to_queue(consumer):
+    started = []
+
+    async def process(job_ids, lease=None):
+        started.append(job_ids[0])
+        await asyncio.sleep(30)
+
+    q = consumer(["long"], process, lambda q: started)
+    assert q.deleted == [] and ("m-long", 0) in q.released
@@ -0,0 +1,111 @@
+# tests/test_queue_lease.py
+"""user-002: heartbeat visibility timeout per pesan — renew, pop receipt terbaru, complete/release, lease hilang."""
+import asyncio
+from types import SimpleNamespace
+
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+from app.services.queue_lease import LeaseManager
+
+
+class _Queue:
+    """QueueClient async palsu: setiap update_message mengeluarkan pop receipt baru."""
+
+    def __init__(self, fail_with=None):
+        self.fail_with = list(fail_with or [])
+        self.updates = []
+        self.deleted = []
+        self.n = 0
+
+    async def update_message(self, msg_id, pop_receipt, visibility_timeout=None):
+        self.updates.append((msg_id, pop_receipt, visibility_timeout))
+        if self.fail_with:
+            raise self.fail_with.pop(0)
+        self.n += 1
+        return SimpleNamespace(pop_receipt=f"r{self.n}")
+
+    async def delete_message(self, msg_id, pop_receipt):
+        self.deleted.append((msg_id, pop_receipt))
+
+
+def _msg(i="m1"):
+    return SimpleNamespace(id=i, pop_receipt="r0", content="{}", dequeue_count=1)
+
+
+def test_heartbeat_renews_with_latest_pop_receipt_then_completes():
+    q = _Queue()
+    lm = LeaseManager(q, visibility=30, renew_every=0.01)
+
+    async def run():
+        lease = lm.acquire(_msg())
+        await asyncio.sleep(0.05)
+        ok = await lm.complete(lease)
+        renewals = len(q.updates)
+        await asyncio.sleep(0.03)  # heartbeat sudah berhenti
+        return lease, ok, renewals
+
+    lease, ok, renewals = asyncio.run(run())
+    assert ok and renewals >= 2 and len(q.updates) == renewals
+    assert [u[1] for u in q.updates] == [f"r{i}" for i in range(renewals)]  # tiap renew pakai receipt terbaru
+    assert all(u[2] == 30 for u in q.updates)
+    assert q.deleted == [("m1", lease.pop_receipt)]
+    assert lm.stats()["renewed"] == lease.renewals == renewals and lm.stats()["active"] == 0
+
+
+def test_rejected_pop_receipt_marks_lease_lost():
+    q = _Queue(fail_with=[ResourceNotFoundError("message not found")])
+    lm = LeaseManager(q, visibility=30, renew_every=0.01)
+
+    async def run():
+        lease = lm.acquire(_msg())
+        await asyncio.sleep(0.05)
+        return lease, await lm.complete(lease)
+
+    lease, ok = asyncio.run(run())
+    assert lease.lost and not ok
+    assert q.deleted == [] and len(q.updates) == 1  # setelah lost tidak di-renew lagi
+    assert lm.metrics["lost"] == 1
+
+
+def test_transient_renew_error_is_retried():
+    q = _Queue(fail_with=[HttpResponseError("server busy")])
+    lm = LeaseManager(q, visibility=30, renew_every=0.01)
+
+    async def run():
+        lease = lm.acquire(_msg())
+        ok = await lm._renew(lease)
+        ok2 = await lm._renew(lease)
+        await lm.release(lease)
+        return lease, ok, ok2
+
+    lease, ok, ok2 = asyncio.run(run())
+    assert not ok and ok2 and not lease.lost
+    assert lm.metrics["renew_errors"] == 1 and lm.metrics["renewed"] == 1
+
+
+def test_renew_failure_after_visibility_expired_is_lost():
+    q = _Queue(fail_with=[HttpResponseError("timeout")])
+    lm = LeaseManager(q, visibility=30, renew_every=60)
+
+    async def run():
+        lease = lm.acquire(_msg())
+        lease.visible_until = 0  # window sudah lewat
+        await lm._renew(lease)
+        await lm.release(lease)
+        return lease
+
+    assert asyncio.run(run()).lost
+
+
+def test_release_all_makes_messages_visible_again():
+    q = _Queue()
+    lm = LeaseManager(q, visibility=30, renew_every=60)
+
+    async def run():
+        lm.acquire(_msg("a"))
+        lm.acquire(_msg("b"))
+        return await lm.release_all(delay=5)
+
+    assert asyncio.run(run()) == 2
+    assert sorted(q.updates) == [("a", "r0", 5), ("b", "r0", 5)]
+    assert lm.stats()["active"] == 0 and lm.metrics["released"] == 2
@@ -0,0 +1,136 @@
+# tests/test_rate_governor.py
+"""user-018: governor bersama — token bucket, Retry-After, klasifikasi retry (idempoten vs POST /batches)."""
+import asyncio
+import email.utils
+import time
+
+import httpx
+import pytest
+
+import worker.worker as w
+from app.services.rate_governor import (
+    RateGovernor,
+    TokenBucket,
+    retry_after_s,
+    retry_exceptions,
+    should_retry_status,
+)
+
+
+@pytest.mark.parametrize("status, headers, idempotent, expected", [
+    (429, None, True, True),
+    (500, None, True, True),
+    (504, None, True, True),
+    (400, None, True, False),
+    (404, None, True, False),
+    (429, None, False, True),
+    (500, None, False, False),
+    (502, None, False, False),
+    (504, None, False, False),
+    (503, None, False, False),
+    (503, {"Retry-After": "2"}, False, True),
+])
+def test_should_retry_status(status, headers, idempotent, expected):
+    assert should_retry_status(status, headers, idempotent=idempotent) is expected
+
+
+def test_non_idempotent_retries_connect_errors_only():
+    req = httpx.Request("POST", "https://t/batches")
+    assert isinstance(httpx.ConnectError("x", request=req), retry_exceptions(False))
+    assert isinstance(httpx.ConnectTimeout("x", request=req), retry_exceptions(False))
+    assert not isinstance(httpx.ReadTimeout("x", request=req), retry_exceptions(False))
+    assert isinstance(httpx.ReadTimeout("x", request=req), retry_exceptions(True))
+
+
+def test_retry_after_formats():
+    assert retry_after_s({"Retry-After": "3"}) == 3.0
+    assert retry_after_s({"retry-after-ms": "250"}) == 0.25
+    assert retry_after_s({"x-ms-retry-after-ms": "1500", "Retry-After": "9"}) == 1.5
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= retry_after_s({"Retry-After": date}) <= 31
+    assert retry_after_s({"Retry-After": "soon"}) is None
+    assert retry_after_s(None) is None
+
+
+def test_token_bucket_queues_instead_of_failing():
+    b = TokenBucket(rate=10, burst=2)
+    assert b.reserve() == 0 and b.reserve() == 0
+    assert b.reserve() == pytest.approx(0.1, abs=0.02)
+    assert TokenBucket(rate=0, burst=1).reserve(100) == 0
+
+
+def test_retry_delay_uses_retry_after_and_gives_up():
+    g = RateGovernor("t", max_retries=2, base_delay=1.0, max_delay=5.0)
+    assert 0.5 <= g.retry_delay(0) <= 1.0
+    assert 5.0 <= g.retry_delay(1, retry_after=30) <= 5.25  # Retry-After dibatasi max_delay
+    assert g.retry_delay(2) is None
+    assert g.metrics["retries"] == 2 and g.metrics["gave_up"] == 1
+
+
+def _governor():
+    return RateGovernor("t", requests_per_s=0, max_retries=3, base_delay=0.0)
+
+
+def _responses(*statuses, headers=None):
+    seq = list(statuses)
+    calls = []
+
+    async def send():
+        calls.append(1)
+        s = seq.pop(0)
+        if isinstance(s, Exception):
+            raise s
+        return httpx.Response(s, headers=headers or {})
+    return send, calls
+
+
+def test_call_retries_idempotent_5xx_then_succeeds():
+    send, calls = _responses(500, 502, 200)
+    assert asyncio.run(_governor().call(send)).status_code == 200
+    assert len(calls) == 3
+
+
+def test_call_non_idempotent_returns_5xx_without_retry():
+    send, calls = _responses(500, 200)
+    assert asyncio.run(_governor().call(send, idempotent=False)).status_code == 500
+    assert len(calls) == 1
+
+
+def test_call_non_idempotent_does_not_retry_read_timeout():
+    req = httpx.Request("POST", "https://t/batches")
+    send, calls = _responses(httpx.ReadTimeout("slow", request=req), 201)
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(_governor().call(send, idempotent=False))
+    assert len(calls) == 1
+
+
+def test_call_non_idempotent_retries_connect_error_and_429():
+    req = httpx.Request("POST", "https://t/batches")
+    send, calls = _responses(httpx.ConnectError("refused", request=req), 429, 201)
+    g = _governor()
+    assert asyncio.run(g.call(send, idempotent=False)).status_code == 201
+    assert len(calls) == 3 and g.metrics["throttled"] == 1
+
+
+def test_throttle_pauses_other_callers():
+    g = RateGovernor("t", requests_per_s=0)
+    g.note_throttle(0.2)
+    t0 = time.monotonic()
+    asyncio.run(g.acquire())
+    assert time.monotonic() - t0 >= 0.15
+    assert g.metrics["queued"] == 1
+
+
+def test_worker_batch_submit_is_not_retried_on_5xx(monkeypatch):
+    calls = []
+
+    class _Client:
+        async def post(self, url, headers=None, json=None):
+            calls.append(url)
+            return httpx.Response(500, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(w, "_translator_client", lambda: _Client())
+    monkeypatch.setattr(w, "translator_governor", _governor())
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(w._translator_submit([{"source": {}}]))
+    assert len(calls) == 1
@@ -0,0 +1,124 @@
+# tests/test_result_cache.py
+"""user-006: key content-addressed + ResultCache (lookup/TTL, store, sweep TTL → LRU)."""
+import asyncio
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import blob_aio
+from app.services.result_cache import ResultCache, cache_key
+
+
+def _key(**over):
+    args = dict(content_sha256="ab" * 32, source_lang="auto", target_lang="ja", glossary="g1", fonts="4-x", fmt=".docx")
+    args.update(over)
+    sha, src, tgt = args.pop("content_sha256"), args.pop("source_lang"), args.pop("target_lang")
+    return cache_key(sha, src, tgt, **args)
+
+
+def test_cache_key_is_stable_and_language_case_insensitive():
+    assert _key() == _key()
+    assert _key(target_lang="JA", source_lang="AUTO") == _key()
+    assert _key(source_lang="") == _key(source_lang="auto")
+
+
+@pytest.mark.parametrize("part", [
+    {"content_sha256": "cd" * 32},
+    {"source_lang": "en"},
+    {"target_lang": "ko"},
+    {"glossary": "g2"},
+    {"fonts": "5-y"},
+    {"fmt": ".pdf"},
+])
+def test_cache_key_changes_with_every_component(part):
+    assert _key(**part) != _key()
+
+
+def test_cache_key_parts_are_separated():
+    # "a"+"bc" dan "ab"+"c" tidak boleh menghasilkan key yang sama
+    assert _key(glossary="a", fonts="bc") != _key(glossary="ab", fonts="c")
+
+
+class _FakeBlobs:
+    def __init__(self):
+        self.blobs = {}    # name → (size, metadata, last_modified)
+        self.copies = []
+
+    async def properties(self, container, name):
+        if name not in self.blobs:
+            return None
+        size, meta, lm = self.blobs[name]
+        return {"size": size, "metadata": dict(meta), "last_modified": lm}
+
+    async def set_metadata(self, container, name, metadata):
+        size, _, lm = self.blobs[name]
+        self.blobs[name] = (size, dict(metadata), lm)
+
+    async def copy(self, src_container, src_name, dst_container, dst_name, metadata=None, **kw):
+        self.copies.append((src_container, src_name, dst_container, dst_name))
+        self.blobs[dst_name] = (1, dict(metadata or {}), datetime.now(timezone.utc))
+        return dst_name
+
+    async def ensure_container(self, name):
+        pass
+
+    async def list_blobs(self, container, prefix, *, metadata=False):
+        return [SimpleNamespace(name=n, size=s, metadata=m, last_modified=lm)
+                for n, (s, m, lm) in self.blobs.items() if n.startswith(prefix)]
+
+    async def delete_blob(self, container, name):
+        return self.blobs.pop(name, None) is not None
+
+
+@pytest.fixture
+def blobs(monkeypatch):
+    fake = _FakeBlobs()
+    for name in ("properties", "set_metadata", "copy", "ensure_container", "list_blobs", "delete_blob"):
+        monkeypatch.setattr(blob_aio, name, getattr(fake, name))
+    return fake
+
+
+def test_lookup_hit_miss_and_ttl(blobs):
+    cache = ResultCache(container="output", ttl_s=100)
+    now = time.time()
+    blobs.blobs["cache/fresh"] = (10, {"last_hit": str(int(now - 10))}, None)
+    blobs.blobs["cache/stale"] = (10, {"last_hit": str(int(now - 1000))}, None)
+
+    async def run():
+        return await cache.lookup("fresh"), await cache.lookup("stale"), await cache.lookup("absent")
+
+    assert asyncio.run(run()) == ("cache/fresh", None, None)
+    assert cache.metrics["hits"] == 1 and cache.metrics["misses"] == 2
+    assert int(blobs.blobs["cache/fresh"][1]["last_hit"]) >= int(now)  # hit memperbarui urutan LRU
+
+
+def test_disabled_cache_never_hits_or_stores(blobs):
+    cache = ResultCache(container="output", enabled=False)
+    blobs.blobs["cache/k"] = (10, {"last_hit": str(int(time.time()))}, None)
+    assert asyncio.run(cache.lookup("k")) is None
+    asyncio.run(cache.store("k2", "output", "jobs/j/out.docx"))
+    assert blobs.copies == []
+
+
+def test_store_copies_result_under_prefix(blobs):
+    cache = ResultCache(container="output")
+    asyncio.run(cache.store("k", "output", "jobs/j/out_ja.docx"))
+    assert blobs.copies == [("output", "jobs/j/out_ja.docx", "output", "cache/k")]
+    assert "last_hit" in blobs.blobs["cache/k"][1]
+    assert cache.metrics["stores"] == 1
+
+
+def test_sweep_drops_expired_then_least_recently_used(blobs):
+    cache = ResultCache(container="output", ttl_s=1000, max_bytes=25)
+    now = int(time.time())
+    blobs.blobs.update({
+        "cache/expired": (5, {"last_hit": str(now - 5000)}, None),
+        "cache/old": (10, {"last_hit": str(now - 300)}, None),
+        "cache/mid": (10, {"last_hit": str(now - 200)}, None),
+        "cache/new": (10, {"last_hit": str(now - 100)}, None),
+        "other/untouched": (999, {}, None),
+    })
+    assert asyncio.run(cache.sweep()) == 2
+    assert set(blobs.blobs) == {"cache/mid", "cache/new", "other/untouched"}
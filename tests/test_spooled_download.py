@@ -0,0 +1,97 @@
+# tests/test_spooled_download.py
+"""user-013: download ke SpooledTemporaryFile dengan batas RAM, sha256 dihitung dari isi (bukan metadata)."""
+import asyncio
+import hashlib
+import io
+from types import SimpleNamespace
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+import worker.worker as w
+from app.services import blob_aio
+
+
+class _FakeDownloader:
+    def __init__(self, data: bytes, metadata=None):
+        self.data = data
+        self.properties = SimpleNamespace(
+            size=len(data), content_settings=SimpleNamespace(content_type="application/pdf"),
+            metadata=metadata or {},
+        )
+
+    async def readinto(self, fp):
+        fp.write(self.data)
+        return len(self.data)
+
+
+@pytest.fixture
+def blobs(monkeypatch):
+    store = {}
+    calls = []
+
+    class _BlobClient:
+        def __init__(self, name):
+            self.name = name
+
+        async def download_blob(self, max_concurrency=1):
+            calls.append((self.name, max_concurrency))
+            if self.name not in store:
+                raise ResourceNotFoundError("missing")
+            return _FakeDownloader(*store[self.name])
+
+    monkeypatch.setattr(blob_aio, "client", lambda: SimpleNamespace(get_blob_client=lambda c, n: _BlobClient(n)))
+    return store, calls
+
+
+def test_small_blob_stays_in_memory(blobs):
+    store, calls = blobs
+    store["a.pdf"] = (b"x" * 100, {"k": "v"})
+    fp, info = asyncio.run(blob_aio.open_spooled("input", "a.pdf", spill_bytes=1024, parallel=3))
+    try:
+        assert not fp._rolled and fp.tell() == 0 and fp.read() == b"x" * 100
+        assert info == {"size": 100, "content_type": "application/pdf", "metadata": {"k": "v"}}
+        assert calls == [("a.pdf", 3)]
+    finally:
+        fp.close()
+
+
+def test_large_blob_spills_to_disk(blobs):
+    store, _ = blobs
+    store["big.pdf"] = (b"y" * 5000, None)
+    fp, info = asyncio.run(blob_aio.open_spooled("input", "big.pdf", spill_bytes=1024))
+    try:
+        assert fp._rolled and info["size"] == 5000 and fp.read() == b"y" * 5000
+    finally:
+        fp.close()
+
+
+def test_missing_blob_returns_none(blobs):
+    assert asyncio.run(blob_aio.open_spooled("input", "nope")) == (None, None)
+
+
+def test_file_sha256_streams_and_rewinds():
+    data = b"abc" * 1_000_000
+    fp = io.BytesIO(data)
+    fp.seek(10)
+    assert w._file_sha256(fp) == hashlib.sha256(data).hexdigest()
+    assert fp.tell() == 0
+
+
+def test_inspect_input_hashes_content_not_client_metadata(blobs, monkeypatch):
+    store, _ = blobs
+    data = b"%PDF-1.4 hello"
+    store["jobs/j/input/a.pdf"] = (data, {"sha256": "0" * 64})  # metadata bisa ditulis client lewat SAS
+    monkeypatch.setattr(w, "extract_sample", lambda fp: "sample")
+    res = asyncio.run(w._inspect_input("jobs/j/input/a.pdf"))
+    assert res == {"size": len(data), "sha256": hashlib.sha256(data).hexdigest(), "sample": "sample"}
+
+
+def test_open_blob_falls_back_to_basename(blobs):
+    store, calls = blobs
+    store["a.pdf"] = (b"data", None)
+    fp, info = asyncio.run(w._open_blob("input", "jobs/j/input/a.pdf"))
+    try:
+        assert fp.read() == b"data" and [c[0] for c in calls] == ["jobs/j/input/a.pdf", "a.pdf"]
+    finally:
+        fp.close()
@@ -0,0 +1,78 @@
+# tests/test_stage_metrics.py
+"""user-017: span per stage → histogram (p50/p95/p99), format Prometheus, endpoint lokal."""
+import asyncio
+import json
+
+import pytest
+
+from app.services.stage_metrics import Histogram, StageMetrics
+
+
+def test_histogram_quantiles_and_window():
+    h = Histogram(window=100)
+    for ms in range(1, 201):
+        h.observe(float(ms), ok=ms % 50 != 0)
+    snap = h.snapshot()
+    assert snap["count"] == 200 and snap["errors"] == 4
+    assert snap["max"] == 200.0 and snap["mean"] == 100.5
+    # reservoir hanya 100 sampel terakhir (101..200)
+    assert (snap["p50"], snap["p95"], snap["p99"]) == (151.0, 196.0, 200.0)
+
+
+def test_empty_histogram():
+    assert Histogram().snapshot() == {"count": 0, "errors": 0, "mean": 0.0, "max": 0.0,
+                                      "p50": 0.0, "p95": 0.0, "p99": 0.0}
+
+
+def test_span_records_success_and_failure():
+    m = StageMetrics(log_spans=False)
+
+    async def run():
+        async with m.span("fetch", job_id="j1"):
+            pass
+        with pytest.raises(ValueError):
+            async with m.span("fetch", job_id="j1"):
+                raise ValueError("boom")
+
+    asyncio.run(run())
+    snap = m.snapshot()["fetch"]
+    assert snap["count"] == 2 and snap["errors"] == 1
+
+
+def test_render_prometheus_summary():
+    m = StageMetrics(log_spans=False)
+    m.observe("db", 12.0)
+    m.observe("db", 30.0, ok=False)
+    text = m.render()
+    assert '# TYPE worker_stage_ms summary' in text
+    assert 'worker_stage_ms{stage="db",quantile="0.5"} 30.0' in text
+    assert 'worker_stage_ms_sum{stage="db"} 42.0' in text
+    assert 'worker_stage_ms_count{stage="db"} 2' in text
+    assert 'worker_stage_errors_total{stage="db"} 1' in text
+
+
+def test_serve_metrics_endpoints():
+    m = StageMetrics(log_spans=False)
+    m.observe("submit", 5.0)
+
+    async def get(port, path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+        head, _, body = data.partition(b"\r\n\r\n")
+        return head.split(b"\r\n")[0].decode(), body
+
+    async def run():
+        await m.serve(0)
+        port = m._server.sockets[0].getsockname()[1]
+        try:
+            return await get(port, "/metrics"), await get(port, "/metrics.json?x=1"), await get(port, "/nope")
+        finally:
+            await m.close()
+
+    (s1, text), (s2, js), (s3, _) = asyncio.run(run())
+    assert s1.endswith("200 OK") and b'stage="submit"' in text
+    assert s2.endswith("200 OK") and json.loads(js)["submit"]["count"] == 1
+    assert s3.endswith("404 Not Found")
@@ -0,0 +1,92 @@
+# tests/test_text_sample.py
+"""user-014: sampel teks glossary per format (DOCX/PPTX/XLSX/PDF/teks), unik, dibatasi budget."""
+import io
+import zipfile
+
+import pytest
+
+from app.services.text_sample import extract_sample
+
+
+def _docx(paragraphs):
+    from docx import Document
+
+    doc = Document()
+    for p in paragraphs:
+        doc.add_paragraph(p)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf
+
+
+def _pptx(slides):
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    for text in slides:
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        slide.shapes.add_textbox(Inches(1), Inches(1), Inches(4), Inches(1)).text_frame.text = text
+    buf = io.BytesIO()
+    prs.save(buf)
+    return buf
+
+
+def _xlsx_shared_strings(strings):
+    ns = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    sst = "".join(f"<si><t>{s}</t></si>" for s in strings)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("xl/workbook.xml", f'<workbook xmlns="{ns}"/>')
+        zf.writestr("xl/sharedStrings.xml", f'<sst xmlns="{ns}">{sst}</sst>')
+    return buf
+
+
+def test_docx_paragraphs_in_order_without_duplicates():
+    fp = _docx(["Quarterly revenue report", "Quarterly revenue report", "  Net   margin  ", "42", "ok"])
+    assert extract_sample(fp) == "Quarterly revenue report\nNet margin"
+    assert fp.tell() == 0
+
+
+def test_pptx_slides_in_slide_order():
+    fp = _pptx([f"Slide title {i}" for i in range(1, 12)])
+    assert extract_sample(fp).split("\n") == [f"Slide title {i}" for i in range(1, 12)]
+
+
+def test_xlsx_shared_strings():
+    assert extract_sample(_xlsx_shared_strings(["Invoice total", "Customer name"])) == "Invoice total\nCustomer name"
+
+
+def test_xlsx_inline_strings():
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.active["A1"] = "Delivery schedule"
+    wb.active["A2"] = "Warehouse code"
+    buf = io.BytesIO()
+    wb.save(buf)
+    sample = extract_sample(buf)
+    assert "Delivery schedule" in sample and "Warehouse code" in sample
+
+
+def test_pdf_first_pages_only():
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    for i in range(4):
+        doc.new_page().insert_text((72, 72), f"Page heading {i}")
+    fp = io.BytesIO(doc.tobytes())
+    sample = extract_sample(fp, pdf_pages=2)
+    assert "Page heading 0" in sample and "Page heading 1" in sample
+    assert "Page heading 2" not in sample
+
+
+def test_plain_text_and_budget():
+    lines = [f"line number {i}" for i in range(100)]
+    sample = extract_sample(io.BytesIO("\n".join(lines).encode()), budget_bytes=60)
+    assert sample.split("\n") == lines[:len(sample.split("\n"))]
+    assert len(sample.encode()) <= 60
+
+
+def test_corrupt_package_returns_empty_string():
+    fp = io.BytesIO(b"PK\x03\x04 truncated zip")
+    assert extract_sample(fp) == "" and fp.tell() == 0
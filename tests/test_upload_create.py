@@ -0,0 +1,112 @@
+# tests/test_upload_create.py
+"""user-009: /upload/create — upload paralel, satu INSERT, enqueue per file, bersih-bersih kalau gagal."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.models import Job
+from app.routers import upload
+from app.services import blob_aio
+from app.services.blob import UploadTooLargeError
+
+
+def _file(name, size=10):
+    return SimpleNamespace(filename=name, size=size, content_type="application/octet-stream")
+
+
+@pytest.fixture
+def env(monkeypatch):
+    state = SimpleNamespace(put=[], deleted=[], sent=[], fail=set(), active=0, peak=0)
+
+    async def put_stream(container, name, reader, **kw):
+        state.active += 1
+        state.peak = max(state.peak, state.active)
+        await asyncio.sleep(0.01)
+        state.active -= 1
+        if reader.filename in state.fail:
+            raise UploadTooLargeError(name, kw["max_bytes"])
+        state.put.append(name)
+        return {"blob_name": name, "size": 10, "sha256": ""}
+
+    async def delete_blob(container, name):
+        state.deleted.append(name)
+        return True
+
+    async def enqueue_job(payload, *, visibility_timeout=None):
+        state.sent.append(payload)
+
+    monkeypatch.setattr(upload, "put_stream", put_stream)
+    monkeypatch.setattr(upload, "enqueue_job", enqueue_job)
+    monkeypatch.setattr(blob_aio, "delete_blob", delete_blob)
+    return state
+
+
+def _create(session, files, **over):
+    args = dict(request=SimpleNamespace(headers={}), files=files, file=None, target_lang="ja",
+                target_langs=None, source_lang="auto", user_id=None, session=session)
+    args.update(over)
+    return upload.create_jobs(**args)
+
+
+def test_create_uploads_in_parallel_and_enqueues_one_message_per_file(make_session, env):
+    async def run():
+        async with make_session() as session:
+            res = await _create(session, [_file("a.docx"), _file("b.pptx")], target_langs=["ja,ko"])
+            jobs = (await session.execute(select(Job))).scalars().all()
+            return res, jobs
+
+    res, jobs = asyncio.run(run())
+    assert res["count"] == 4 and res["target_langs"] == ["ja", "ko"]
+    assert env.peak == 2
+    assert len(env.put) == 2 and len(env.sent) == 2
+    for msg in env.sent:
+        group = [j for j in jobs if j.id in msg["job_ids"]]
+        assert msg["job_id"] == msg["job_ids"][0]
+        assert {j.target_lang for j in group} == {"ja", "ko"}
+        assert len({j.result_blob for j in group}) == 1  # input dipakai bersama per file
+    assert {j.status for j in jobs} == {"QUEUED"}
+
+
+def test_create_rejects_declared_oversize_before_upload(make_session, env, monkeypatch):
+    monkeypatch.setattr(upload.settings, "MAX_UPLOAD_MB", 1)
+
+    async def run():
+        async with make_session() as session:
+            await _create(session, [_file("a.docx", size=2 * 1024 * 1024)])
+
+    with pytest.raises(HTTPException) as ei:
+        asyncio.run(run())
+    assert ei.value.status_code == 413 and env.put == []
+
+
+def test_failed_upload_discards_committed_blobs(make_session, env):
+    env.fail.add("big.pdf")
+
+    async def run():
+        async with make_session() as session:
+            with pytest.raises(HTTPException) as ei:
+                await _create(session, [_file("a.docx"), _file("big.pdf")])
+            jobs = (await session.execute(select(Job))).scalars().all()
+            return ei.value, jobs
+
+    err, jobs = asyncio.run(run())
+    assert err.status_code == 413 and "big.pdf" in err.detail
+    assert env.deleted == env.put and len(env.put) == 1
+    assert jobs == [] and env.sent == []
+
+
+def test_failed_insert_discards_all_blobs(make_session, env):
+    async def run():
+        async with make_session() as session:
+            async def boom(*a, **kw):
+                raise RuntimeError("db down")
+            session.execute = boom
+            with pytest.raises(RuntimeError):
+                await _create(session, [_file("a.docx"), _file("b.docx")])
+
+    asyncio.run(run())
+    assert sorted(env.deleted) == sorted(env.put) and len(env.put) == 2
+    assert env.sent == []
@@ -0,0 +1,145 @@
+# tests/test_xlsx_fonts.py
+"""user-025: font pass XLSX streaming — styles.xml + rich text sharedStrings; sheet disalin mentah."""
+import io
+import zipfile
+
+import pytest
+from lxml import etree
+
+from app.services.font_policy import FontSpec
+from app.services.office_fonts import font_pass, set_xlsx_font
+from app.services.ooxml_fonts import S_NS, rewrite_package, scan_package
+
+S = f"{{{S_NS}}}"
+_SX = f'xmlns="{S_NS}"'
+_R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG = "http://schemas.openxmlformats.org/package/2006"
+_CT = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+
+
+def _xlsx(rows=20) -> bytes:
+    files = {
+        "[Content_Types].xml": (
+            f'<Types xmlns="{_PKG}/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{_CT}.sheet.main+xml"/>'
+            f'<Override PartName="/xl/worksheets/sheet1.xml" ContentType="{_CT}.worksheet+xml"/>'
+            f'<Override PartName="/xl/styles.xml" ContentType="{_CT}.styles+xml"/>'
+            f'<Override PartName="/xl/sharedStrings.xml" ContentType="{_CT}.sharedStrings+xml"/></Types>'
+        ),
+        "_rels/.rels": (
+            f'<Relationships xmlns="{_PKG}/relationships"><Relationship Id="rId1" '
+            f'Type="{_REL}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+        ),
+        "xl/workbook.xml": f'<workbook {_SX} {_R}><sheets><sheet name="S" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        "xl/_rels/workbook.xml.rels": (
+            f'<Relationships xmlns="{_PKG}/relationships">'
+            f'<Relationship Id="rId1" Type="{_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+            f'<Relationship Id="rId2" Type="{_REL}/styles" Target="styles.xml"/>'
+            f'<Relationship Id="rId3" Type="{_REL}/sharedStrings" Target="sharedStrings.xml"/></Relationships>'
+        ),
+        "xl/styles.xml": (
+            f'<styleSheet {_SX}><fonts count="2">'
+            '<font><sz val="11"/><color theme="1"/><name val="Calibri"/><family val="2"/><scheme val="minor"/></font>'
+            '<font><b/><sz val="11"/><name val="Arial"/><charset val="0"/></font></fonts>'
+            '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+            '<borders count="1"><border/></borders><cellStyleXfs count="1"><xf/></cellStyleXfs>'
+            '<cellXfs count="2"><xf fontId="0"/><xf fontId="1" applyFont="1"/></cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '<dxfs count="1"><dxf><font><b/><color rgb="FFFF0000"/></font></dxf></dxfs></styleSheet>'
+        ),
+        "xl/sharedStrings.xml": (
+            f'<sst {_SX} count="{rows + 1}" uniqueCount="{rows + 1}"><si>'
+            '<r><rPr><b/><sz val="11"/><rFont val="Calibri"/><family val="2"/><scheme val="minor"/></rPr>'
+            '<t xml:space="preserve">bold </t></r><r><t>plain 日本</t></r></si>'
+            + "".join(f"<si><t>row {i} 行</t></si>" for i in range(rows)) + "</sst>"
+        ),
+        "xl/worksheets/sheet1.xml": (
+            f'<worksheet {_SX}><sheetData>'
+            + "".join(f'<row r="{i + 1}"><c r="A{i + 1}" t="s" s="{i % 2}"><v>{i}</v></c></row>' for i in range(rows + 1))
+            + "</sheetData></worksheet>"
+        ),
+    }
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, xml in files.items():
+            z.writestr(name, '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' + xml)
+    return buf.getvalue()
+
+
+def _part(data: bytes, name: str) -> etree._Element:
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        return etree.fromstring(z.read(name))
+
+
+@pytest.fixture(scope="module")
+def rewritten():
+    src = _xlsx()
+    out = io.BytesIO()
+    stats = rewrite_package(io.BytesIO(src), out, FontSpec.uniform("Meiryo UI"), kind="xlsx")
+    return src, out.getvalue(), stats
+
+
+def test_styles_fonts_get_name_and_lose_theme_scheme(rewritten):
+    _, out, stats = rewritten
+    assert stats["parts"] == 2 and stats["runs_changed"] >= 3
+    fonts = _part(out, "xl/styles.xml").findall(f"{S}fonts/{S}font")
+    assert [f.find(f"{S}name").get("val") for f in fonts] == ["Meiryo UI", "Meiryo UI"]
+    assert all(f.find(f"{S}scheme") is None and f.find(f"{S}charset") is None for f in fonts)
+    assert fonts[0].find(f"{S}sz").get("val") == "11"  # properti lain dipertahankan
+
+
+def test_dxf_font_stays_partial_override(rewritten):
+    _, out, _ = rewritten
+    dxf_font = _part(out, "xl/styles.xml").find(f"{S}dxfs/{S}dxf/{S}font")
+    assert dxf_font.find(f"{S}name") is None
+    assert dxf_font.find(f"{S}b") is not None
+
+
+def test_shared_strings_rich_text_gets_rfont(rewritten):
+    _, out, _ = rewritten
+    sst = _part(out, "xl/sharedStrings.xml")
+    rPr = sst.find(f"{S}si/{S}r/{S}rPr")
+    assert rPr.find(f"{S}rFont").get("val") == "Meiryo UI"
+    assert rPr.find(f"{S}scheme") is None and rPr.find(f"{S}b") is not None
+    assert [si.findtext(f"{S}t") for si in sst.findall(f"{S}si")[1:3]] == ["row 0 行", "row 1 行"]
+
+
+def test_sheets_and_other_entries_copied_raw(rewritten):
+    src, out, _ = rewritten
+    with zipfile.ZipFile(io.BytesIO(src)) as a, zipfile.ZipFile(io.BytesIO(out)) as b:
+        assert a.namelist() == b.namelist()
+        for name in ("xl/worksheets/sheet1.xml", "xl/workbook.xml", "[Content_Types].xml"):
+            assert a.getinfo(name).CRC == b.getinfo(name).CRC
+        assert b.testzip() is None
+
+
+def test_scan_is_clean_after_rewrite(rewritten):
+    src, out, _ = rewritten
+    spec = FontSpec.uniform("Meiryo UI")
+    assert scan_package(io.BytesIO(src), spec, kind="xlsx") == 1
+    assert scan_package(io.BytesIO(out), spec, kind="xlsx", limit=None) == 0
+
+
+def test_output_opens_in_openpyxl(rewritten):
+    openpyxl = pytest.importorskip("openpyxl")
+    ws = openpyxl.load_workbook(io.BytesIO(rewritten[1])).active
+    assert ws["A2"].value == "row 0 行"
+    assert ws["A2"].font.name == "Meiryo UI"
+
+
+def test_font_pass_routes_xlsx_and_xlsm():
+    out, report = font_pass("book.xlsm", _xlsx(), "ja")
+    assert report["handler"] == "xlsx" and report["runs_changed"] > 0
+    assert font_pass("book.xlsx", out, "ja")[1]["skipped"]
+    assert isinstance(set_xlsx_font(_xlsx(), "Arial"), bytes)
+
+
+def test_corrupt_xlsx_has_no_object_model_fallback():
+    data = b"PK\x03\x04 broken"
+    out, report = font_pass("book.xlsx", data, "ja")
+    assert out is data and report["handler"] is None
+    with pytest.raises(Exception):
+        set_xlsx_font(data, "Arial")
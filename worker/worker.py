@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import os, sys, io, json, zipfile, asyncio, datetime as dt, platform, socket, shutil
+import os, sys, io, json, zipfile, asyncio, signal, hashlib, datetime as dt, platform, socket, shutil
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict
+from typing import BinaryIO, Optional, Tuple, List, Dict
 from urllib.parse import quote
 
 import httpx
-from azure.storage.queue import QueueClient
+from azure.storage.queue.aio import QueueClient
 from azure.storage.blob import ContainerSasPermissions, BlobSasPermissions, generate_blob_sas
 from sqlalchemy import select
 
@@ -33,17 +33,28 @@ for root in CANDIDATES:
 
 # ---------- project imports ----------
 from app.config import settings
-from app.db import AsyncSessionLocal
-from app.models import Job
+from app.db import AsyncSessionLocal, engine, Base
+from app.models import Job, upgrade_schema
 from app.services.blob import (
     _blob,
-    put_bytes as blob_put_bytes,
     generate_container_sas_url,
     generate_blob_sas_url,
 )
-from app.services.office_fonts import enforce_fonts_by_lang
+from app.services import blob_aio
+from app.services.office_fonts import font_pass, font_pass_applies, FONT_PASS_VERSION
+from app.services.ooxml_fonts import start_font_pool, shutdown_font_pool
 from app.services.onedrive import upload_bytes_to_user_onedrive
-from app.services.blob import clear_prefix
+from app.services.queue_lease import LeaseManager, MessageLease
+from app.services.batch_tracker import BatchTracker
+from app.services.batch_coalescer import BatchCoalescer
+from app.services.result_cache import ResultCache, cache_key
+from app.services.text_sample import extract_sample
+from app.services.glossary_cache import GlossaryCache
+from app.services.stage_metrics import StageMetrics
+from app.services.rate_governor import translator_governor
+from app.services.http import httpx_clients
+from app.services.large_translation import LargeTranslation
+from app.services.direct_upload import expire_direct_uploads
 # ---------- logging ----------
 try:
     from app.logger_setup import setup_logging
@@ -55,10 +66,13 @@ except Exception:
     logger = logging.getLogger("worker")
 
 try:
-    from app.services.glossary import compose_glossary_tsv
+    from app.services.glossary import compose_glossary, glossary_fingerprint
 except Exception:
-    async def compose_glossary_tsv(src, tgt, sample):  # fallback dummy
-        return b""
+    async def compose_glossary(src, tgt, sample, *, cache=None):  # fallback dummy
+        return b"", True
+
+    def glossary_fingerprint(src, tgt):
+        return ""
 
 TRANSLATOR_DOC_ENDPOINT = os.getenv("AZURE_TRANSLATOR_DOC_ENDPOINT", "").rstrip("/")
 TRANSLATOR_KEY = os.getenv("AZURE_TRANSLATOR_KEY", "") or getattr(settings, "AZURE_TRANSLATOR_KEY", "")
@@ -70,24 +84,29 @@ OUTPUT_CONTAINER = os.getenv("AZURE_OUTPUT_CONTAINER", "output")
 _ACCOUNT_NAME = _blob.account_name
 _ACCOUNT_KEY  = os.getenv("AZURE_STORAGE_ACCOUNT_KEY", "") or getattr(settings, "AZURE_STORAGE_ACCOUNT_KEY", "")
 
-# ---------- Azure Queue ----------
+# ---------- Azure Queue (async) ----------
+# Client async: receive/delete tidak lagi memblokir event loop (polling job lain tetap jalan).
 _qc = QueueClient.from_connection_string(
     os.getenv("AZURE_STORAGE_CONNECTION_STRING"),
     os.getenv("AZURE_STORAGE_QUEUE_NAME", "translation-jobs"),
 )
 
-try:
-    _qc.create_queue()
-    props = _qc.get_queue_properties()
-    from urllib.parse import urlparse
-    acc = urlparse(_qc.url).netloc  # contoh: mystorage.queue.core.windows.net
-    logger.info("queue.binding", extra={
-        "account": acc,
-        "queue": _qc.queue_name,
-        "approx_count": getattr(props, "approximate_message_count", None)
-    })
-except Exception as e:
-    logger.warning("queue.init_warn", extra={"error": str(e)})
+async def _queue_bind() -> None:
+    try:
+        await _qc.create_queue()
+    except Exception:
+        pass  # sudah ada
+    try:
+        props = await _qc.get_queue_properties()
+        from urllib.parse import urlparse
+        acc = urlparse(_qc.url).netloc  # contoh: mystorage.queue.core.windows.net
+        logger.info("queue.binding", extra={
+            "account": acc,
+            "queue": _qc.queue_name,
+            "approx_count": getattr(props, "approximate_message_count", None)
+        })
+    except Exception as e:
+        logger.warning("queue.init_warn", extra={"error": str(e)})
 
 # ==================== utils ====================
 import unicodedata
@@ -155,8 +174,11 @@ def _generate_blob_sas_read(container: str, blob_name: str, minutes: int = 120)
     )
     return f"https://{_ACCOUNT_NAME}.blob.core.windows.net/{container}/{blob_name}?{sas}"
 
-async def _fetch_blob_bytes(container: str, name: str) -> Tuple[Optional[bytes], Optional[str]]:
-    loop = asyncio.get_event_loop()
+async def _open_blob(container: str, name: str) -> Tuple[Optional[BinaryIO], Optional[dict]]:
+    """
+    Blob → SpooledTemporaryFile (RAM terbatas, spill ke disk; range GET paralel untuk blob besar).
+    Coba path lengkap lalu basename. Caller wajib close() file-nya.
+    """
     candidates = [name]
     base = os.path.basename(name)
     if base != name:
@@ -168,16 +190,39 @@ async def _fetch_blob_bytes(container: str, name: str) -> Tuple[Optional[bytes],
             continue
         seen.add(cand)
         try:
-            bc = _blob.get_blob_client(container=container, blob=cand)
-            dl = await loop.run_in_executor(None, bc.download_blob)
-            data = await loop.run_in_executor(None, dl.readall)
-            props = getattr(dl, "properties", None)
-            ctype = getattr(getattr(props, "content_settings", None), "content_type", None)
-            return data, ctype
+            fp, info = await blob_aio.open_spooled(container, cand)
         except Exception:
             continue
+        if fp is not None:
+            if info["size"]:
+                return fp, info
+            fp.close()
     return None, None
 
+def _file_sha256(fp: BinaryIO) -> str:
+    h = hashlib.sha256()
+    fp.seek(0)
+    for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+        h.update(chunk)
+    fp.seek(0)
+    return h.hexdigest()
+
+async def _inspect_input(name: str) -> Optional[dict]:
+    """
+    Size, sha256 dan sampel teks input, tanpa menampung file utuh di RAM.
+    sha256 selalu dihitung di sini: metadata blob bisa ditulis client lewat SAS upload langsung,
+    jadi tidak boleh jadi dasar key result cache.
+    """
+    fp, info = await _open_blob(INPUT_CONTAINER, name)
+    if fp is None:
+        return None
+    try:
+        sha = await asyncio.to_thread(_file_sha256, fp)
+        sample = await asyncio.to_thread(extract_sample, fp)
+    finally:
+        fp.close()
+    return {"size": info["size"], "sha256": sha, "sample": sample}
+
 # ==================== Translator (Document Translation) ====================
 BATCHES_URL = f"{TRANSLATOR_DOC_ENDPOINT}/translator/text/batch/v1.0/batches"
 
@@ -190,12 +235,23 @@ def _common_headers_json() -> Dict[str, str]:
     }
 
 async def _assert_head_ok(url: str, label: str) -> None:
-    async with httpx.AsyncClient(timeout=30.0) as c:
-        r = await c.head(url)
-        r.raise_for_status()
+    r = await httpx_clients.get("blob").head(url)
+    r.raise_for_status()
+
+async def _preflight(blob_name: str) -> None:
+    sas_src = generate_blob_sas_url(INPUT_CONTAINER, blob_name, minutes=30)
+    await _assert_head_ok(sas_src, "Source blob SAS")
+
+async def _clean_output(job_id: str, prefixes: List[str]) -> None:
+    async def _one(dst_prefix: str) -> None:  # contoh: "jobs/<job_id>/input/"
+        try:
+            res = await blob_aio.delete_prefix(OUTPUT_CONTAINER, dst_prefix)
+            logger.info("clean_output_prefix", extra={"job_id": job_id, "prefix": dst_prefix, **res})
+        except Exception as e:
+            logger.warning("clean_output_prefix_error", extra={"job_id": job_id, "prefix": dst_prefix, "error": str(e)})
+    await asyncio.gather(*(_one(p) for p in prefixes))
 
-async def _translator_start(
-    client: httpx.AsyncClient,
+def _folder_input(
     *,
     src_container_sas_url: str,
     src_prefix: str,
@@ -203,7 +259,8 @@ async def _translator_start(
     source_lang: str,
     target_lang: str,
     glossary_url: Optional[str] = None,
-) -> str:
+) -> Dict[str, object]:
+    """Satu entry `inputs` (container + filter prefix per job)."""
     source: Dict[str, object] = {
         "sourceUrl": src_container_sas_url,
         "filter": {"prefix": src_prefix},
@@ -214,228 +271,625 @@ async def _translator_start(
     target: Dict[str, object] = {"targetUrl": dst_container_sas_url, "language": target_lang or "en"}
     if glossary_url:
         target["glossaries"] = [{"glossaryUrl": glossary_url, "format": "TSV"}]
+    return {"source": source, "targets": [target]}
 
-    payload = {"inputs": [{"source": source, "targets": [target]}]}
-    r = await client.post(BATCHES_URL, headers=_common_headers_json(), json=payload)
+def _file_input(
+    *,
+    src_blob_sas_url: str,
+    source_lang: str,
+    targets: List[Tuple[str, str, Optional[str]]],
+) -> Dict[str, object]:
+    """Entry `inputs` satu file → beberapa target: [(language, target_blob_sas_url, glossary_url)]."""
+    source: Dict[str, object] = {"sourceUrl": src_blob_sas_url}
+    if (source_lang or "").lower() not in ("", "auto"):
+        source["language"] = source_lang
+    tlist: List[Dict[str, object]] = []
+    for lang, url, glossary_url in targets:
+        t: Dict[str, object] = {"targetUrl": url, "language": lang or "en"}
+        if glossary_url:
+            t["glossaries"] = [{"glossaryUrl": glossary_url, "format": "TSV"}]
+        tlist.append(t)
+    return {"storageType": "File", "source": source, "targets": tlist}
+
+def _translator_client() -> httpx.AsyncClient:
+    return httpx_clients.get("translator")
+
+async def _translator_submit(inputs: List[Dict[str, object]]) -> str:
+    # 429/503 saat ramai → antre + retry (Retry-After) di governor, bukan langsung FAILED.
+    # Non-idempoten: 5xx / read timeout tidak di-retry (batch mungkin sudah terbuat → batch ganda)
+    r = await translator_governor.call(
+        lambda: _translator_client().post(BATCHES_URL, headers=_common_headers_json(), json={"inputs": inputs}),
+        idempotent=False,
+    )
     r.raise_for_status()
     data = r.json() if r.headers.get("content-type", "").lower().startswith("application/json") else {}
     return data.get("id") or r.headers.get("operation-location", "")
 
-async def _translator_poll(client: httpx.AsyncClient, batch_id_or_loc: str, *, timeout_s: int = 3600, interval_s: int = 3) -> dict:
-    headers = _common_headers_json()
-    status_url = batch_id_or_loc if "/batches/" in batch_id_or_loc else f"{BATCHES_URL}/{batch_id_or_loc}"
-    deadline = dt.datetime.utcnow() + dt.timedelta(seconds=timeout_s)
-    while dt.datetime.utcnow() < deadline:
-        r = await client.get(status_url, headers=headers)
+async def _translator_documents(batch_id_or_loc: str) -> List[dict]:
+    """Status per dokumen dalam batch (ikuti @nextLink)."""
+    base, _, query = _batch_status_url(batch_id_or_loc).partition("?")
+    url: Optional[str] = f"{base}/documents" + (f"?{query}" if query else "")
+    docs: List[dict] = []
+    while url:
+        r = await translator_governor.call(lambda: _translator_client().get(url, headers=_common_headers_json()))
         r.raise_for_status()
         data = r.json()
-        state = (data.get("status") or "").lower()
-        if state in ("succeeded", "failed", "validationfailed", "cancelled"):
-            return data
-        await asyncio.sleep(interval_s)
-    raise TimeoutError("Translator polling timeout")
+        docs.extend(data.get("value") or [])
+        url = data.get("@nextLink")
+    return docs
+
+def _batch_status_url(batch_id_or_loc: str) -> str:
+    return batch_id_or_loc if "/batches/" in batch_id_or_loc else f"{BATCHES_URL}/{batch_id_or_loc}"
+
+# Span per stage → histogram p50/p95/p99 (heartbeat + GET /metrics kalau WORKER_METRICS_PORT di-set)
+_metrics = StageMetrics(
+    window=int(os.getenv("WORKER_METRICS_WINDOW", "2048")),
+    log_spans=os.getenv("WORKER_METRICS_LOG_SPANS", "1") == "1",
+)
+# waktu antre di rate governor Translator ikut jadi histogram
+translator_governor.observe = lambda ms: _metrics.observe("translator_queue_wait", ms, True)
+
+async def _timed_submit(inputs: List[Dict[str, object]]) -> str:
+    async with _metrics.span("submit", documents=len(inputs)):
+        return await _translator_submit(inputs)
+
+async def _timed_wait(batch_id: str) -> dict:
+    async with _metrics.span("translate_wait", batch_id=batch_id):
+        return await _tracker.wait(batch_id, timeout_s=3600)
+
+# Satu poller status bersama untuk semua batch yang sedang berjalan (bukan loop per job)
+_tracker = BatchTracker(
+    status_url=_batch_status_url,
+    headers=_common_headers_json,
+    min_interval=float(os.getenv("WORKER_POLL_MIN_S", "2")),
+    max_interval=float(os.getenv("WORKER_POLL_MAX_S", "15")),
+    governor=translator_governor,
+    client=lambda: httpx_clients.get("translator"),
+)
+
+# Job dengan pasangan bahasa sama yang datang berdekatan → satu batch (beberapa `inputs`).
+# Glossary tetap per-input, jadi tidak perlu masuk signature.
+_coalescer = BatchCoalescer(
+    submit=_timed_submit,
+    wait=_timed_wait,
+    documents=_translator_documents,
+    source_container=INPUT_CONTAINER,
+    window_s=int(os.getenv("WORKER_COALESCE_WINDOW_MS", "1500")) / 1000.0,
+    max_docs=int(os.getenv("WORKER_COALESCE_MAX_DOCS", "25")),
+    max_bytes=int(float(os.getenv("WORKER_COALESCE_MAX_MB", "200")) * 1024 * 1024),
+)
+
+# Input di atas batas dokumen Translator (40 MB) → split → batch paralel → merge
+_large = LargeTranslation(
+    submit=_timed_submit,
+    wait=_timed_wait,
+    documents=_translator_documents,
+    file_input=_file_input,
+    input_container=INPUT_CONTAINER,
+    output_container=OUTPUT_CONTAINER,
+)
 
 # ==================== Core job ====================
+_result_cache = ResultCache(
+    container=OUTPUT_CONTAINER,
+    prefix=os.getenv("WORKER_CACHE_PREFIX", "cache/"),
+    ttl_s=float(os.getenv("WORKER_CACHE_TTL_DAYS", "14")) * 86400,
+    max_bytes=int(float(os.getenv("WORKER_CACHE_MAX_GB", "20")) * 1024 ** 3),
+    enabled=os.getenv("WORKER_RESULT_CACHE", "1") == "1",
+)
+# Term pairs LLM per sampel dokumen (near-duplicate lewat SimHash) → compose_glossary_tsv tanpa LLM
+_glossary_cache = GlossaryCache(
+    ttl_s=float(os.getenv("GLOSSARY_CACHE_TTL_DAYS", "30")) * 86400,
+    max_entries=int(os.getenv("GLOSSARY_CACHE_MAX_ENTRIES", "5000")),
+    max_distance=int(os.getenv("GLOSSARY_CACHE_MAX_DISTANCE", "3")),
+    enabled=os.getenv("GLOSSARY_CACHE", "1") == "1",
+)
+
 async def _set_job_status(session, job: Job, status: str, detail: str = "", **extra):
     job.status = status
     job.detail = detail
     for k, v in extra.items():
         setattr(job, k, v)
     job.updated_at = int(dt.datetime.utcnow().timestamp())
+    async with _metrics.span("db", job_id=job.id, status=status):
+        await session.commit()
+
+async def _fail_all(session, jobs: List[Job], detail: str) -> None:
+    for j in jobs:
+        j.status = "FAILED"
+        j.detail = detail
+        j.updated_at = int(dt.datetime.utcnow().timestamp())
     await session.commit()
 
-async def process_job(job_id: str) -> bool:
+# Budget per stage sebelum submit (detik). Stage independen jalan bersamaan:
+#   inspect input ─┬─ glossary (LLM; telat → glossary statis) ─┐
+#   preflight HEAD ┼─ cleanup prefix output ───────────────────┼─ entry → submit
+#   SAS container ─┘                                           ┘
+GLOSSARY_BUDGET_S = float(os.getenv("WORKER_GLOSSARY_BUDGET_S", "8"))
+PREFLIGHT_BUDGET_S = float(os.getenv("WORKER_PREFLIGHT_BUDGET_S", "15"))
+CLEANUP_BUDGET_S = float(os.getenv("WORKER_CLEANUP_BUDGET_S", "30"))
+
+# task LLM glossary yang melewati budget tetap jalan (hasilnya masuk glossary cache) → simpan referensinya
+_background: set = set()
+
+async def _stage(name: str, job_id: str, coro, budget_s: Optional[float]):
+    """Jalankan satu stage dengan batas waktu (span metrics). TimeoutError/exception diteruskan ke caller."""
+    async with _metrics.span(name, job_id=job_id):
+        return await asyncio.wait_for(coro, timeout=budget_s)
+
+def _cancel(*tasks: Optional[asyncio.Task]) -> None:
+    for t in tasks:
+        if t is not None and not t.done():
+            t.cancel()
+
+async def _compose_within_budget(job: Job, sample_text: str) -> Tuple[bytes, bool]:
+    """
+    Glossary lengkap (LLM/cache) kalau selesai dalam budget; kalau telat → glossary statis (_always_pairs).
+    Return (tsv, complete); complete=False → glossary fallback, hasil terjemahan tidak boleh masuk result cache.
+    """
+    src, tgt = job.source_lang or "auto", job.target_lang or "en"
+    if not sample_text:
+        return await compose_glossary(src, tgt, "")
+    full = asyncio.ensure_future(compose_glossary(src, tgt, sample_text, cache=_glossary_cache))
+    try:
+        return await asyncio.wait_for(asyncio.shield(full), timeout=GLOSSARY_BUDGET_S)
+    except asyncio.TimeoutError:
+        _background.add(full)
+        full.add_done_callback(_background.discard)
+        logger.warning("glossary_late_static_fallback", extra={"job_id": job.id, "budget_s": GLOSSARY_BUDGET_S})
+        return (await compose_glossary(src, tgt, ""))[0], False
+
+async def _build_glossary(job: Job, sample_text: str) -> Tuple[Optional[str], bool]:
+    """Glossary per job (per target language). Return (SAS URL atau None, complete)."""
+    try:
+        glossary_bytes, complete = await _compose_within_budget(job, sample_text)
+        glossary_blob_name = f"jobs/{job.id}/glossary.tsv"
+        await blob_aio.put_bytes(INPUT_CONTAINER, glossary_blob_name, glossary_bytes, content_type="text/tab-separated-values")
+        glossary_sas = generate_blob_sas_url(INPUT_CONTAINER, glossary_blob_name, minutes=180)
+        logger.info("glossary_ready", extra={
+            "job_id": job.id, "blob_name": glossary_blob_name, "bytes": len(glossary_bytes), "complete": complete,
+        })
+        return glossary_sas, complete
+    except Exception as e:
+        logger.warning("glossary_failed", extra={"job_id": job.id, "error": str(e)})
+        return None, False
+
+async def process_job(job_id: str, lease: Optional[MessageLease] = None) -> bool:
+    return await process_jobs([job_id], lease=lease)
+
+async def process_jobs(job_ids: List[str], lease: Optional[MessageLease] = None) -> bool:
+    """
+    Satu input blob → satu atau beberapa job (satu per target language).
+    Input di-fetch, di-preflight dan di-submit SEKALI; hasil per bahasa difinalisasi per job.
+    """
     async with AsyncSessionLocal() as session:
-        res = await session.execute(select(Job).where(Job.id == job_id))
-        job: Optional[Job] = res.scalar_one_or_none()
-        if not job:
-            logger.warning("job_not_found", extra={"job_id": job_id})
+        res = await session.execute(select(Job).where(Job.id.in_(job_ids)))
+        found = {j.id: j for j in res.scalars()}
+        for jid in job_ids:
+            if jid not in found:
+                logger.warning("job_not_found", extra={"job_id": jid})
+        jobs: List[Job] = [found[jid] for jid in dict.fromkeys(job_ids) if jid in found]
+        if not jobs:
             return True
+        job = jobs[0]
+        job_id = job.id
+        # mode input (folder vs per-file) & path output ditentukan dari grup asli, bukan dari sisa job
+        # setelah cache hit — kalau tidak, sisa satu job akan membersihkan folder job pertama
+        multi = len(jobs) > 1
 
         # 1) pakai path blob dari DB apa adanya
         src_blob_name = job.result_blob or job.filename
         if not src_blob_name or not src_blob_name.strip():
-            await _set_job_status(session, job, "FAILED", "Source blob name not set")
+            await _fail_all(session, jobs, "Source blob name not set")
             logger.error("job_fail_no_src_blob", extra={"job_id": job_id})
             return True
 
-        # 2) cek eksistensi
-        data, ctype = await _fetch_blob_bytes(INPUT_CONTAINER, src_blob_name)
-        if not data:
-            await _set_job_status(session, job, "FAILED", f"Input blob not found: {src_blob_name}")
+        # 2) cek eksistensi (preflight HEAD SAS sudah jalan paralel selama input di-download)
+        preflight = asyncio.create_task(_stage("preflight", job_id, _preflight(src_blob_name), PREFLIGHT_BUDGET_S))
+        src = await _stage("fetch", job_id, _inspect_input(src_blob_name), None)
+        if not src:
+            _cancel(preflight)
+            await _fail_all(session, jobs, f"Input blob not found: {src_blob_name}")
             logger.error("job_fail_src_not_found", extra={"job_id": job_id, "blob_name": src_blob_name})
             return True
 
-        try:
-            sample_text = data[:32768].decode("utf-8", errors="ignore")
-        except Exception:
-            sample_text = ""
+        # 2b) result cache: dokumen + bahasa + glossary statis + versi font pass + format output sama
+        #     → pakai hasil lama. Dokumen besar selalu keluar PDF → key berbeda dari hasil format asli.
+        content_sha = src["sha256"]
+        src_dir, src_base = _split_dir_base(src_blob_name)
+        large = _large.needs_split(src["size"])
+        out_fmt = ".pdf" if large else os.path.splitext(src_base)[1].lower()
+        cache_keys: Dict[str, Optional[str]] = {
+            j.id: cache_key(
+                content_sha, j.source_lang or "auto", j.target_lang or "en",
+                glossary=glossary_fingerprint(j.source_lang or "auto", j.target_lang or "en"),
+                fonts=FONT_PASS_VERSION,
+                fmt=out_fmt,
+            )
+            for j in jobs
+        }
+        hits = dict(zip(
+            [j.id for j in jobs],
+            await asyncio.gather(*(_result_cache.lookup(cache_keys[j.id]) for j in jobs)),
+        ))
+        delivered: List[str] = []  # output job yang sudah dilayani cache → jangan ikut dibersihkan
+        if any(hits.values()):
+            served = []
+            for j in jobs:
+                if hits[j.id]:
+                    raw = src_blob_name if j.id == job_id else f"jobs/{j.id}/input/{src_base}"
+                    if await _serve_cached(session, j, hits[j.id], raw, large=large):
+                        served.append(j.id)
+                        delivered.append(_output_name(raw, j.target_lang or "en", large=large)[0])
+            jobs = [j for j in jobs if j.id not in served]
+            if not jobs:
+                _cancel(preflight)
+                return True
+            job = jobs[0]
+            job_id = job.id
 
-        # 3) glossary (optional)
-        try:
-            glossary_bytes = await compose_glossary_tsv(job.source_lang or "auto", job.target_lang or "en", sample_text)
-            glossary_blob_name = f"jobs/{job_id}/glossary.tsv"
-            blob_put_bytes(INPUT_CONTAINER, glossary_blob_name, glossary_bytes, content_type="text/tab-separated-values")
-            glossary_sas = generate_blob_sas_url(INPUT_CONTAINER, glossary_blob_name, minutes=180)
-            logger.info("glossary_ready", extra={"job_id": job_id, "blob_name": glossary_blob_name, "bytes": len(glossary_bytes)})
-        except Exception as e:
-            logger.warning("glossary_failed", extra={"job_id": job_id, "error": str(e)})
-            glossary_sas = None
+        sample_text = src["sample"]
 
-        # 4) SAS container + prefix (dari folder file sumber)
+        # 3) SAS container + prefix (dari folder file sumber) — lokal, tanpa I/O
         try:
-            src_container_sas = generate_container_sas_url(
-                INPUT_CONTAINER,
-                minutes=180,
-                permission=ContainerSasPermissions(read=True, list=True),
-            )
-            dst_container_sas = generate_container_sas_url(
-                OUTPUT_CONTAINER,
-                minutes=180,
-                permission=ContainerSasPermissions(write=True, create=True, add=True, list=True, read=True),
-            )
+            async with _metrics.span("sas", job_id=job_id):
+                src_container_sas = generate_container_sas_url(
+                    INPUT_CONTAINER,
+                    minutes=180,
+                    permission=ContainerSasPermissions(read=True, list=True),
+                )
+                dst_container_sas = generate_container_sas_url(
+                    OUTPUT_CONTAINER,
+                    minutes=180,
+                    permission=ContainerSasPermissions(write=True, create=True, add=True, list=True, read=True),
+                )
         except Exception as e:
-            await _set_job_status(session, job, "FAILED", f"Cannot create container SAS: {e}")
+            _cancel(preflight)
+            await _fail_all(session, jobs, f"Cannot create container SAS: {e}")
             logger.error("sas_container_fail", extra={"job_id": job_id, "error": str(e)})
             return True
 
-        src_dir, _ = _split_dir_base(src_blob_name)
         src_prefix = f"{src_dir}/" if src_dir else ""
-
-        # Preflight HEAD (optional)
-        try:
-            sas_src = generate_blob_sas_url(INPUT_CONTAINER, src_blob_name, minutes=30)
-            await _assert_head_ok(sas_src, "Source blob SAS")
-            logger.info("preflight_ok", extra={"job_id": job_id, "blob_name": src_blob_name})
-        except Exception as e:
-            await _set_job_status(session, job, "FAILED", f"Preflight source SAS failed: {e}")
-            logger.error("preflight_fail", extra={"job_id": job_id, "blob_name": src_blob_name, "error": str(e)})
+        if multi:
+            clean_prefixes = [f"jobs/{j.id}/input/" for j in jobs]
+        else:
+            clean_prefixes = [src_prefix]
+        clean_prefixes = [p for p in clean_prefixes if not any(o.startswith(p) for o in delivered)]
+
+        # 4) glossary (LLM, per target language) ∥ preflight HEAD ∥ cleanup output — masing-masing dengan budget
+        if os.getenv("WORKER_CLEAN_OUTPUT_BEFORE_SUBMIT", "1") == "1":
+            cleanup = _stage("clean", job_id, _clean_output(job_id, clean_prefixes), CLEANUP_BUDGET_S)
+        else:
+            cleanup = asyncio.sleep(0)
+        glossary_res, preflight_res, cleanup_res = await asyncio.gather(
+            _stage("glossary", job_id, asyncio.gather(*(_build_glossary(j, sample_text) for j in jobs)), None),
+            preflight,
+            cleanup,
+            return_exceptions=True,
+        )
+        if isinstance(preflight_res, BaseException):
+            err = str(preflight_res) or type(preflight_res).__name__
+            await _fail_all(session, jobs, f"Preflight source SAS failed: {err}")
+            logger.error("preflight_fail", extra={"job_id": job_id, "blob_name": src_blob_name, "error": err})
+            return True
+        logger.info("preflight_ok", extra={"job_id": job_id, "blob_name": src_blob_name})
+        if isinstance(cleanup_res, BaseException):
+            # best effort seperti sebelumnya: submit tetap jalan
+            logger.warning("clean_output_prefix_error", extra={"job_id": job_id, "error": str(cleanup_res) or type(cleanup_res).__name__})
+        if isinstance(glossary_res, BaseException):
+            glossary_res = [(None, False)] * len(jobs)
+        glossaries = {j.id: url for j, (url, _) in zip(jobs, glossary_res)}
+        # key cache = glossary lengkap; hasil dengan glossary fallback/tanpa glossary tidak disimpan
+        for j, (_, complete) in zip(jobs, glossary_res):
+            if not complete and cache_keys.get(j.id):
+                cache_keys[j.id] = None
+                logger.info("result_cache_skip_degraded_glossary", extra={"job_id": j.id})
+
+        # 4b) input terlalu besar untuk satu dokumen Translator → engine split-translate-merge
+        if large:
+            if lease is not None and lease.lost:
+                logger.warning("translator_skip_lease_lost", extra={"job_id": job_id})
+                return False
+            await _process_large(session, jobs, src_blob_name, glossaries, cache_keys)
             return True
 
-        # 5) submit → poll
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            
+        # 5) entry `inputs`: 1 target → filter prefix folder (seperti biasa);
+        #    >1 target → storageType File, satu targetUrl blob per job/bahasa.
+        src_lang = job.source_lang or "auto"
+        if not multi:
+            tgt_lang = job.target_lang or "en"
+            raw_out = {job_id: src_blob_name}
+            signature: tuple = (src_lang.lower(), tgt_lang.lower())
+            entry = _folder_input(
+                src_container_sas_url=src_container_sas,
+                src_prefix=src_prefix,
+                dst_container_sas_url=dst_container_sas,
+                source_lang=src_lang,
+                target_lang=tgt_lang,
+                glossary_url=glossaries[job_id],
+            )
+        else:
+            raw_out = {j.id: f"jobs/{j.id}/input/{src_base}" for j in jobs}
+            signature = ("multi", src_lang.lower(), tuple(sorted((j.target_lang or "en").lower() for j in jobs)))
             try:
-                logger.info("translator_start", extra={
-                    "job_id": job_id, "src_prefix": src_prefix, "src_lang": job.source_lang or "auto", "tgt_lang": job.target_lang or "en"
-                })
-
-                dst_prefix = src_prefix  # contoh: "jobs/<job_id>/input/"
-
-                if os.getenv("WORKER_CLEAN_OUTPUT_BEFORE_SUBMIT", "1") == "1":
-                    try:
-                        deleted = clear_prefix(OUTPUT_CONTAINER, dst_prefix)
-                        logger.info(
-                            "clean_output_prefix",
-                            extra={"job_id": job_id, "prefix": dst_prefix, "deleted": deleted}
+                entry = _file_input(
+                    src_blob_sas_url=generate_blob_sas_url(INPUT_CONTAINER, src_blob_name, minutes=180),
+                    source_lang=src_lang,
+                    targets=[
+                        (
+                            j.target_lang or "en",
+                            generate_blob_sas_url(
+                                OUTPUT_CONTAINER, raw_out[j.id], minutes=180,
+                                permission=BlobSasPermissions(read=True, write=True, create=True),
+                            ),
+                            glossaries[j.id],
                         )
-                    except Exception as e:
-                        logger.warning(
-                            "clean_output_prefix_error",
-                            extra={"job_id": job_id, "prefix": dst_prefix, "error": str(e)}
-                        )
-
-                batch_id = await _translator_start(
-                    client,
-                    src_container_sas_url=src_container_sas,
-                    src_prefix=src_prefix,
-                    dst_container_sas_url=dst_container_sas,
-                    source_lang=(job.source_lang or "auto"),
-                    target_lang=(job.target_lang or "en"),
-                    glossary_url=glossary_sas,
-                )
-                logger.info("translator_batch", extra={"job_id": job_id, "batch_id": batch_id})
-            except httpx.HTTPStatusError as e:
-                err = e.response.text if e.response is not None else str(e)
-                await _set_job_status(session, job, "FAILED", detail=f"Translator start error: {err}")
-                logger.error("translator_start_error", extra={"job_id": job_id, "error": err})
-                return True
-
-            if not batch_id:
-                await _set_job_status(session, job, "FAILED", detail="Failed to start document translation (no batch id)")
-                logger.error("translator_no_batch_id", extra={"job_id": job_id})
-                return True
-
-            result = await _translator_poll(client, batch_id, timeout_s=3600, interval_s=3)
-            logger.info("translator_result", extra={"job_id": job_id, "status": result.get("status")})
-
-        if (result.get("status") or "").lower() != "succeeded":
-            await _set_job_status(session, job, "FAILED", detail=json.dumps(result)[:4000])
-            logger.error("translator_failed", extra={"job_id": job_id, "detail_snippet": json.dumps(result)[:500]})
-            return True
-
-        # 6) ambil hasil dari OUTPUT container (path sama)
-        data_out, ctype_out = await _fetch_blob_bytes(OUTPUT_CONTAINER, src_blob_name)
-        if not data_out:
-            base = os.path.basename(src_blob_name)
-            data_out, ctype_out = await _fetch_blob_bytes(OUTPUT_CONTAINER, base)
-            if not data_out:
-                await _set_job_status(
-                    session, job, "FAILED",
-                    detail=f"Translated file not found in output container (tried '{src_blob_name}' and '{base}')",
+                        for j in jobs
+                    ],
                 )
-                logger.error("output_not_found", extra={"job_id": job_id, "tried": [src_blob_name, base]})
+            except Exception as e:
+                await _fail_all(session, jobs, f"Cannot create blob SAS: {e}")
+                logger.error("sas_blob_fail", extra={"job_id": job_id, "error": str(e)})
                 return True
-            src_blob_name = base  # translator mungkin menaruh di root
-
-        # 7) rename output → <original>_<tgt>.<ext>
-        src_dir, src_base = _split_dir_base(src_blob_name)
-        src_base_clean = _safe_basename_for_blob(src_base)
-        name_noext, ext = os.path.splitext(src_base_clean)
-        tgt = (job.target_lang or "en").lower()
 
-        out_base = _safe_basename_for_blob(f"{name_noext}_{tgt}{ext or '.pdf'}")
-        out_blob_name = f"{src_dir}/{out_base}" if src_dir else out_base
+        # 6) submit (via coalescer) → tunggu batch
+        if lease is not None and lease.lost:
+            # pesan sudah bisa diambil worker lain → jangan submit batch ganda
+            logger.warning("translator_skip_lease_lost", extra={"job_id": job_id})
+            return False
 
-        # 8) fonts pass (optional)
+        logger.info("translator_start", extra={
+            "job_id": job_id, "job_ids": [j.id for j in jobs], "src_prefix": src_prefix,
+            "src_lang": src_lang, "tgt_langs": [j.target_lang or "en" for j in jobs],
+        })
         try:
-            data_out = enforce_fonts_by_lang(job.filename or src_base_clean, data_out, tgt)
+            # submit + translate_wait punya span sendiri per batch; ini total per job (termasuk jendela coalesce)
+            async with _metrics.span("translate", job_id=job_id):
+                outcome = await _coalescer.translate(
+                    signature,
+                    entry,
+                    [(j.id, src_blob_name, j.target_lang or "en") for j in jobs],
+                    size=src["size"],
+                )
+        except httpx.HTTPStatusError as e:
+            err = e.response.text if e.response is not None else str(e)
+            await _fail_all(session, jobs, f"Translator start error: {err}")
+            logger.error("translator_start_error", extra={"job_id": job_id, "error": err})
+            return True
         except Exception as e:
-            logger.warning("font_pass_error", extra={"job_id": job_id, "error": str(e)})
+            await _fail_all(session, jobs, f"Translator error: {e}")
+            logger.error("translator_error", extra={"job_id": job_id, "error": str(e)})
+            return True
 
-        # 9) simpan hasil
-        blob_put_bytes(OUTPUT_CONTAINER, out_blob_name, data_out, content_type=ctype_out)
+    # 7) finalisasi per job (session sendiri-sendiri, paralel antar bahasa)
+    await asyncio.gather(*(
+        _finalize_job(j.id, outcome, raw_out[j.id], cache_keys[j.id]) for j in jobs
+    ))
+    return True
+
+async def _process_large(session, jobs: List[Job], src_blob_name: str,
+                         glossaries: Dict[str, Optional[str]], cache_keys: Dict[str, Optional[str]]) -> None:
+    """
+    Dokumen > batas Translator: hasil selalu PDF gabungan per bahasa → _deliver seperti jalur biasa,
+    plus catatan perubahan format untuk user (cache key-nya sudah memakai format ".pdf").
+    """
+    job_id = jobs[0].id
+    outs: Dict[str, Tuple[str, str]] = {}
+    for j in jobs:
+        out_blob_name, out_base, _ = _output_name(src_blob_name, j.target_lang or "en", large=True)
+        outs[j.id] = (out_blob_name, out_base)
+    note = _format_note(src_blob_name, ".pdf")
+
+    logger.info("translator_start_large", extra={
+        "job_id": job_id, "job_ids": [j.id for j in jobs], "blob_name": src_blob_name,
+        "tgt_langs": [j.target_lang or "en" for j in jobs],
+    })
+    try:
+        async with _metrics.span("translate_large", job_id=job_id):
+            results = await _large.run(
+                src_blob_name,
+                run_id=job_id,
+                source_lang=jobs[0].source_lang or "auto",
+                targets=[(j.id, j.target_lang or "en", glossaries.get(j.id), outs[j.id][0]) for j in jobs],
+            )
+    except Exception as e:
+        await _fail_all(session, jobs, f"Large translation error: {e}")
+        logger.error("translator_large_error", extra={"job_id": job_id, "error": str(e)})
+        return
+
+    for j in jobs:
+        res = results[j.id]
+        if res["status"] != "Succeeded":
+            await _set_job_status(session, j, "FAILED", detail=(res["error"] or "")[:4000])
+            logger.error("translator_large_failed", extra={"job_id": j.id, "error": res["error"]})
+            continue
+        out_blob_name, out_base = outs[j.id]
+        await _deliver(session, j, out_blob_name, out_base, ".pdf", None, note=note)
+        if cache_keys.get(j.id):
+            await _result_cache.store(cache_keys[j.id], OUTPUT_CONTAINER, out_blob_name)
+
+async def _locate_output(raw_blob_name: str) -> Optional[str]:
+    """Nama blob hasil Translator yang benar-benar ada (path sama, fallback basename di root)."""
+    for cand in dict.fromkeys([raw_blob_name, os.path.basename(raw_blob_name)]):
+        try:
+            props = await blob_aio.properties(OUTPUT_CONTAINER, cand)
+        except Exception:
+            props = None
+        if props and props["size"]:
+            return cand
+    return None
+
+def _output_name(raw_blob_name: str, target_lang: str, *, large: bool = False) -> Tuple[str, str, str]:
+    """Path hasil final → (<dir>/<original>_<tgt>.<ext>, basename, ext); large=True → selalu .pdf."""
+    src_dir, src_base = _split_dir_base(raw_blob_name)
+    name_noext, ext = os.path.splitext(_safe_basename_for_blob(src_base))
+    if large:
+        ext = ".pdf"
+    out_base = _safe_basename_for_blob(f"{name_noext}_{(target_lang or 'en').lower()}{ext or '.pdf'}")
+    return (f"{src_dir}/{out_base}" if src_dir else out_base), out_base, ext
+
+def _format_note(src_blob_name: str, out_ext: str) -> str:
+    """detail job (JSON) kalau format hasil berbeda dari format input; "" kalau sama."""
+    in_ext = os.path.splitext(src_blob_name)[1].lower()
+    if not in_ext or in_ext == out_ext:
+        return ""
+    return json.dumps({
+        "message": f"The document exceeds the Translator size limit, so the translation is delivered as "
+                   f"{out_ext.lstrip('.').upper()} instead of {in_ext.lstrip('.').upper()}.",
+        "input_format": in_ext,
+        "output_format": out_ext,
+    })
 
-        # 10) SAS download
-        sas_url = generate_blob_sas_url(OUTPUT_CONTAINER, out_blob_name, minutes=180)
+async def _deliver(session, job: Job, out_blob_name: str, out_base: str, ext: str, data_out: Optional[BinaryIO],
+                   *, note: str = "") -> None:
+    """SAS download + OneDrive (optional) + status SUCCEEDED (note → detail, mis. perubahan format)."""
+    sas_url = generate_blob_sas_url(OUTPUT_CONTAINER, out_blob_name, minutes=180)
 
-        # 11) OneDrive (optional)
-        onedrive_item_id, onedrive_url = (None, None)
-        try:
-            if job.user_id:
-                safe_onedrive_name = out_base if "." in out_base else (out_base + (ext or ".pdf"))
+    onedrive_item_id, onedrive_url = (None, None)
+    own = None
+    try:
+        if job.user_id:
+            if data_out is None:
+                own, _ = await _open_blob(OUTPUT_CONTAINER, out_blob_name)
+                data_out = own
+            safe_onedrive_name = out_base if "." in out_base else (out_base + (ext or ".pdf"))
+            data_out.seek(0)
+            async with _metrics.span("onedrive", job_id=job.id):
                 onedrive_item_id, onedrive_url = await upload_bytes_to_user_onedrive(
                     session, job.user_id, safe_onedrive_name, data_out
                 )
-                logger.info("onedrive_ok", extra={"job_id": job_id, "item_id": onedrive_item_id, "url": onedrive_url})
-        except Exception as e:
-            logger.warning("onedrive_fail", extra={"job_id": job_id, "error": str(e)})
-
-        # 12) update DB
-        await _set_job_status(
-            session, job, "SUCCEEDED", detail="",
-            result_blob=out_blob_name,
-            download_url=sas_url,
-            onedrive_item_id=onedrive_item_id or "",
-            onedrive_url=onedrive_url or "",
-        )
-        logger.info("job_succeeded", extra={
-            "job_id": job_id, "result_blob": out_blob_name, "download_url": sas_url, "tgt": tgt
+            logger.info("onedrive_ok", extra={"job_id": job.id, "item_id": onedrive_item_id, "url": onedrive_url})
+    except Exception as e:
+        logger.warning("onedrive_fail", extra={"job_id": job.id, "error": str(e)})
+    finally:
+        if own is not None:
+            own.close()
+
+    await _set_job_status(
+        session, job, "SUCCEEDED", detail=note,
+        result_blob=out_blob_name,
+        download_url=sas_url,
+        onedrive_item_id=onedrive_item_id or "",
+        onedrive_url=onedrive_url or "",
+    )
+    logger.info("job_succeeded", extra={
+        "job_id": job.id, "result_blob": out_blob_name, "download_url": sas_url, "tgt": (job.target_lang or "en").lower()
+    })
+
+async def _serve_cached(session, job: Job, cached_blob: str, raw_blob_name: str, *, large: bool = False) -> bool:
+    """Cache hit → copy server-side ke path output job, tanpa Translator. False → proses normal."""
+    out_blob_name, out_base, ext = _output_name(raw_blob_name, job.target_lang or "en", large=large)
+    try:
+        await _result_cache.materialize(cached_blob, OUTPUT_CONTAINER, out_blob_name)
+    except Exception as e:
+        logger.warning("result_cache_copy_error", extra={"job_id": job.id, "error": str(e)})
+        return False
+    logger.info("result_cache_hit", extra={"job_id": job.id, "cache_blob": cached_blob, "result_blob": out_blob_name})
+    await _deliver(session, job, out_blob_name, out_base, ext, None,
+                   note=_format_note(raw_blob_name, ext) if large else "")
+    return True
+
+async def _finalize_job(job_id: str, outcome: dict, raw_blob_name: str, cache_key_: Optional[str] = None) -> None:
+    async with AsyncSessionLocal() as session:
+        job: Optional[Job] = await session.get(Job, job_id)
+        if not job:
+            logger.warning("job_not_found", extra={"job_id": job_id})
+            return
+
+        batch_id = outcome["batch_id"]
+        job.batch_id = batch_id[-256:]
+        result = outcome["documents"].get(job_id) or outcome["status"]
+        logger.info("translator_result", extra={
+            "job_id": job_id, "batch_id": batch_id, "status": result.get("status"),
+            "batch_status": outcome["status"].get("status"),
         })
-        return True
 
-# ==================== Runner loop ====================
-async def main():
-    max_messages = int(os.getenv("WORKER_MAX_MESSAGES", "8"))
-    visibility   = int(os.getenv("WORKER_VISIBILITY_TIMEOUT", "300"))
-    poll_wait    = int(os.getenv("WORKER_POLL_WAIT", "60"))
-    concurrency  = int(os.getenv("WORKER_CONCURRENCY", "5"))
+        if (result.get("status") or "").lower() != "succeeded":
+            await _set_job_status(session, job, "FAILED", detail=json.dumps(result)[:4000])
+            logger.error("translator_failed", extra={"job_id": job_id, "detail_snippet": json.dumps(result)[:500]})
+            return
+
+        # 8) cari hasil di OUTPUT container (path sama; translator mungkin menaruh di root)
+        base = os.path.basename(raw_blob_name)
+        async with _metrics.span("locate_output", job_id=job_id):
+            src_blob_name = await _locate_output(raw_blob_name)
+        if not src_blob_name:
+            await _set_job_status(
+                session, job, "FAILED",
+                detail=f"Translated file not found in output container (tried '{raw_blob_name}' and '{base}')",
+            )
+            logger.error("output_not_found", extra={"job_id": job_id, "tried": [raw_blob_name, base]})
+            return
+
+        # 9) rename output → <original>_<tgt>.<ext>
+        src_base_clean = _safe_basename_for_blob(_split_dir_base(src_blob_name)[1])
+        tgt = (job.target_lang or "en").lower()
+        out_blob_name, out_base, ext = _output_name(src_blob_name, tgt)
+
+        # 10-11) font pass no-op (PDF, dll) → rename = copy server-side, byte tidak lewat worker.
+        #        Format yang memang diubah font pass → download, ubah, upload.
+        data_out: Optional[BinaryIO] = None
+        opened: List[BinaryIO] = []
+        copied = False
+        if not font_pass_applies(job.filename or src_base_clean):
+            try:
+                async with _metrics.span("copy_output", job_id=job_id):
+                    await blob_aio.copy(OUTPUT_CONTAINER, src_blob_name, OUTPUT_CONTAINER, out_blob_name)
+                copied = True
+                logger.info("output_copied", extra={"job_id": job_id, "src": src_blob_name, "dst": out_blob_name})
+            except Exception as e:
+                logger.warning("output_copy_error", extra={"job_id": job_id, "error": str(e)})
+        try:
+            if not copied:
+                # streaming: file temp (spill ke disk), bukan bytes utuh di RAM
+                async with _metrics.span("fetch_output", job_id=job_id):
+                    data_out, info = await _open_blob(OUTPUT_CONTAINER, src_blob_name)
+                if data_out is None:
+                    await _set_job_status(session, job, "FAILED", detail=f"Cannot read translated file '{src_blob_name}'")
+                    logger.error("output_read_error", extra={"job_id": job_id, "blob_name": src_blob_name})
+                    return
+                opened.append(data_out)
+                unchanged = False
+                try:
+                    async with _metrics.span("font_pass", job_id=job_id, size=info["size"]):
+                        # off event loop: thread mengoordinasi ZIP, rewrite per part di proses font pool
+                        data_out, report = await asyncio.to_thread(
+                            font_pass, job.filename or src_base_clean, data_out, tgt
+                        )
+                    opened.append(data_out)
+                    unchanged = report["skipped"]
+                    logger.info("font_pass_result", extra={"job_id": job_id, "tgt": tgt, **report})
+                except Exception as e:
+                    logger.warning("font_pass_error", extra={"job_id": job_id, "error": str(e)})
+                if unchanged:
+                    # pre-scan: semua run sudah memakai font target → rename server-side, tanpa upload ulang
+                    try:
+                        async with _metrics.span("copy_output", job_id=job_id):
+                            await blob_aio.copy(OUTPUT_CONTAINER, src_blob_name, OUTPUT_CONTAINER, out_blob_name)
+                    except Exception as e:
+                        logger.warning("output_copy_error", extra={"job_id": job_id, "error": str(e)})
+                        unchanged = False
+                if not unchanged:
+                    data_out.seek(0)
+                    async with _metrics.span("upload", job_id=job_id):
+                        await blob_aio.put_bytes(OUTPUT_CONTAINER, out_blob_name, data_out, content_type=info["content_type"])
+
+            # 12-14) SAS download, OneDrive (optional), update DB
+            await _deliver(session, job, out_blob_name, out_base, ext, data_out)
+        finally:
+            for fp in opened:
+                fp.close()
+
+    # 15) simpan ke result cache (copy server-side, di luar jalur kritis status job)
+    if cache_key_:
+        await _result_cache.store(cache_key_, OUTPUT_CONTAINER, out_blob_name)
 
-    # SERVICE_START facts
+# ==================== Runner loop ====================
+def _service_facts() -> dict:
     try:
         home_usage = shutil.disk_usage(str(Path.home()))
         tmp_usage  = shutil.disk_usage("/tmp") if os.path.isdir("/tmp") else None
-        facts = {
+        return {
             "python": platform.python_version(),
             "platform": platform.platform(),
             "hostname": socket.gethostname(),
@@ -449,70 +903,202 @@ async def main():
             "REGION_NAME": os.getenv("REGION_NAME"),
         }
     except Exception:
-        facts = {}
+        return {}
+
+def _install_stop_handlers(stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows / non-main thread
 
-    logger.info("SERVICE_START", extra={"facts": facts})
+_leases: Optional[LeaseManager] = None
+
+async def _handle(lease: MessageLease) -> None:
+    retry_delay = int(os.getenv("WORKER_RETRY_DELAY", "30"))
+    try:
+        body = json.loads(lease.content)
+        job_ids = [j for j in (body.get("job_ids") or [body.get("job_id")]) if j]
+        if not job_ids:
+            logger.warning("msg_missing_job_id")
+            await _leases.complete(lease)
+            return
+        job_id = lease.job_id = job_ids[0]
+        logger.info("msg_submit", extra={"job_id": job_id, "job_ids": job_ids, "dequeue_count": lease.dequeue_count})
+        async with _metrics.span("job", job_id=job_id, jobs=len(job_ids)):
+            await process_jobs(job_ids, lease=lease)
+        if await _leases.complete(lease):
+            logger.info("msg_done", extra={"job_id": job_id, "renewals": lease.renewals})
+    except asyncio.CancelledError:
+        await _leases.release(lease)
+        raise
+    except Exception as e:
+        logger.exception("msg_process_error", extra={"job_id": lease.job_id, "error": str(e)})
+        await _leases.release(lease, delay=retry_delay)
+
+async def main():
+    max_messages = max(1, min(int(os.getenv("WORKER_MAX_MESSAGES", "8")), 32))  # batas Azure: 32/receive
+    visibility   = int(os.getenv("WORKER_VISIBILITY_TIMEOUT", "300"))
+    poll_wait    = int(os.getenv("WORKER_POLL_WAIT", "60"))        # batas atas idle backoff (detik)
+    concurrency  = max(1, int(os.getenv("WORKER_CONCURRENCY", "5")))
+    prefetch     = max(1, int(os.getenv("WORKER_PREFETCH", str(concurrency))))
+    grace        = float(os.getenv("WORKER_SHUTDOWN_GRACE", "60"))
+
+    global _leases
+    logger.info("SERVICE_START", extra={"facts": _service_facts()})
+    start_font_pool()  # sekali: fork proses font pass sebelum thread/klien lain berjalan
+    await _queue_bind()
+    try:
+        async with engine.begin() as conn:  # tabel/kolom baru kalau API belum sempat membuatnya
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(upgrade_schema)
+    except Exception as e:
+        logger.warning("db_create_all_failed", extra={"error": str(e)})
+    _leases = LeaseManager(_qc, visibility=visibility)
+
+    # Prefetch buffer (bounded): receiver mengisi, dispatcher mengambil begitu ada slot kosong.
+    # Slot langsung diisi ulang setiap 1 job selesai — tidak menunggu seluruh halaman pesan.
+    buffer: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+    room = asyncio.Event()
+    slots = asyncio.Semaphore(concurrency)
+    active: set = set()
+    stop = asyncio.Event()
+    _install_stop_handlers(stop)
 
-    sem = asyncio.Semaphore(concurrency)
     logger.info("queue_listener_start", extra={
-        "concurrency": concurrency, "max_messages": max_messages, "visibility": visibility, "poll_wait": poll_wait
+        "concurrency": concurrency, "prefetch": prefetch, "max_messages": max_messages,
+        "visibility": visibility, "poll_wait": poll_wait,
     })
 
-    async def _handle(msg):
-        async with sem:
+    async def _receiver():
+        polls = 0
+        idle = 1.0
+        while True:
+            if buffer.full():
+                room.clear()
+                await room.wait()
+                continue
+            polls += 1
+            if polls % 10 == 0:
+                logger.info("heartbeat", extra={
+                    "polls": polls, "buffered": buffer.qsize(), "in_flight": len(active),
+                    "leases": _leases.stats(), "batches": _tracker.stats(),
+                    "coalescer": _coalescer.stats(), "result_cache": _result_cache.stats(),
+                    "glossary_cache": _glossary_cache.stats(), "translator_rate": translator_governor.stats(),
+                    "large": _large.stats(),
+                })
+            want = min(max_messages, buffer.maxsize - buffer.qsize())
+            got = 0
             try:
-                body = json.loads(msg.content)
-                job_id = body.get("job_id")
-                if not job_id:
-                    logger.warning("msg_missing_job_id")
-                    _qc.delete_message(msg.id, msg.pop_receipt)
-
-                    return
-                logger.info("msg_submit", extra={"job_id": job_id})
-                await process_job(job_id)
-                try:
-                    _qc.delete_message(msg.id, msg.pop_receipt)
-                    logger.info("msg_done", extra={"job_id": job_id})
-                except Exception as e:
-                    logger.warning("msg_delete_warn", extra={"job_id": job_id, "error": str(e)})
+                async for m in _qc.receive_messages(
+                    messages_per_page=want,
+                    max_messages=want,
+                    visibility_timeout=visibility,
+                ):
+                    # lease langsung diambil: pesan di buffer prefetch juga ikut di-renew
+                    await buffer.put(_leases.acquire(m))
+                    got += 1
             except Exception as e:
-                logger.exception("msg_process_error", extra={"error": str(e)})
-
-    loop_count = 0
-    while True:
+                logger.error("queue_receive_error", extra={"error": str(e)})
+                await asyncio.sleep(2.0)
+                continue
+            if got:
+                logger.info("messages_received", extra={
+                    "count": got, "buffered": buffer.qsize(), "in_flight": len(active),
+                })
+                idle = 1.0
+            else:
+                await asyncio.sleep(idle)
+                idle = min(idle * 2, max(1.0, float(poll_wait)))
+
+    def _slot_done(t: asyncio.Task) -> None:
+        active.discard(t)
+        slots.release()
+
+    async def _dispatcher():
+        while True:
+            await slots.acquire()
+            try:
+                lease = await buffer.get()
+            except BaseException:
+                slots.release()
+                raise
+            room.set()
+            t = asyncio.create_task(_handle(lease))
+            active.add(t)
+            t.add_done_callback(_slot_done)
+
+    async def _cache_sweeper():
+        every = float(os.getenv("WORKER_CACHE_SWEEP_S", "1800"))
+        while True:
+            try:
+                await _result_cache.sweep()
+            except Exception as e:
+                logger.warning("result_cache_sweep_error", extra={"error": str(e)})
+            try:
+                await _glossary_cache.sweep()
+            except Exception as e:
+                logger.warning("glossary_cache_sweep_error", extra={"error": str(e)})
+            try:
+                async with AsyncSessionLocal() as session:
+                    expired = await expire_direct_uploads(session)
+                if expired:
+                    logger.info("direct_upload_expired", extra={"jobs": expired})
+            except Exception as e:
+                logger.warning("direct_upload_sweep_error", extra={"error": str(e)})
+            await asyncio.sleep(every)
+
+    async def _metrics_dumper():
+        every = float(os.getenv("WORKER_METRICS_DUMP_S", "300"))
+        while True:
+            await asyncio.sleep(every)
+            if _metrics.stages:
+                logger.info("stage_metrics", extra={"stages": _metrics.snapshot()})
+
+    receiver = asyncio.create_task(_receiver())
+    dispatcher = asyncio.create_task(_dispatcher())
+    sweeper = asyncio.create_task(_cache_sweeper())
+    dumper = asyncio.create_task(_metrics_dumper())
+    metrics_port = int(os.getenv("WORKER_METRICS_PORT", "0"))
+    if metrics_port:
         try:
-            loop_count += 1
-            if loop_count % 10 == 0:
-                logger.info("heartbeat", extra={"polls": loop_count})
-
-            paged = _qc.receive_messages(
-                messages_per_page=max_messages,
-                visibility_timeout=visibility,
-                timeout=poll_wait,
-            )
-
-            got = False
-            tasks = []
-            for page in paged.by_page():
-                msgs = list(page)
-                if msgs:
-                    got = True
-                    logger.info("messages_received", extra={"count": len(msgs)})
-                for m in msgs:
-                    tasks.append(asyncio.create_task(_handle(m)))
-
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-
-            if not got:
-                await asyncio.sleep(1.0)
-
-        except Exception as e:
-            logger.error("queue_receive_error", extra={"error": str(e)})
-            await asyncio.sleep(2.0)
+            await _metrics.serve(metrics_port, host=os.getenv("WORKER_METRICS_HOST", "127.0.0.1"))
+        except OSError as e:
+            logger.warning("metrics_server_error", extra={"port": metrics_port, "error": str(e)})
+    try:
+        await stop.wait()
+    finally:
+        logger.info("queue_listener_stop", extra={"in_flight": len(active), "buffered": buffer.qsize()})
+        receiver.cancel()
+        dispatcher.cancel()
+        sweeper.cancel()
+        dumper.cancel()
+        await asyncio.gather(receiver, dispatcher, sweeper, dumper, return_exceptions=True)
+        # pesan yang belum sempat diproses → kembalikan ke queue sekarang juga
+        while not buffer.empty():
+            await _leases.release(buffer.get_nowait())
+        if active:
+            _, pending = await asyncio.wait(set(active), timeout=grace)
+            for t in pending:
+                t.cancel()
+            if pending:
+                await asyncio.wait(pending, timeout=10)
+        await _tracker.close()
+        await _metrics.close()
+        logger.info("stage_metrics", extra={"stages": _metrics.snapshot()})
+        await httpx_clients.aclose()
+        await blob_aio.close()
+        await asyncio.to_thread(shutdown_font_pool)
+        released = await _leases.release_all()
+        logger.info("queue_listener_stopped", extra={"released": released, "leases": _leases.stats()})
+        try:
+            await _qc.close()
+        except Exception:
+            pass
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        pass
\ No newline at end of file
+        pass